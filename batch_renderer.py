@@ -0,0 +1,208 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from invoice_generator import InvoiceGenerator
+from metrics import merge_changes, run_collecting
+
+
+def render_invoice_payload(payload, save_json=True):
+    """Render a single invoice payload (runs inside a worker process)
+
+    Never raises: failures are returned as a result dict so one bad invoice
+    cannot take down the rest of the batch.
+    """
+    started = time.perf_counter()
+    invoice_number = payload.get('invoice_number', '') if isinstance(payload, dict) else ''
+
+    try:
+        invoice = InvoiceGenerator.from_payload(payload)
+        pdf_filename = invoice.generate_pdf()
+        json_filename = invoice.save_invoice_data() if save_json else None
+
+        return {
+            'success': True,
+            'invoice_number': invoice.invoice_number,
+            'pdf_filename': pdf_filename,
+            'json_filename': json_filename,
+            'total': invoice.calculate_totals()['total'],
+            'seconds': time.perf_counter() - started
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'invoice_number': invoice_number,
+            'error': f"{type(e).__name__}: {str(e)}",
+            'seconds': time.perf_counter() - started
+        }
+
+
+def load_payloads(path):
+    """Yield invoice payloads from a JSON list or a JSON Lines file"""
+    if path.endswith('.jsonl') or path.endswith('.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = [data]
+        for payload in data:
+            yield payload
+
+
+class BatchReport:
+    """Summary of a batch rendering run"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.succeeded = 0
+        self.failed = 0
+        self.failures = []
+        self.render_seconds = 0.0
+        self.started_at = datetime.now()
+        self.elapsed = 0.0
+
+    @property
+    def total(self):
+        return self.succeeded + self.failed
+
+    @property
+    def throughput(self):
+        """Invoices per second (wall clock)"""
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def average_render_time(self):
+        return self.render_seconds / self.total if self.total else 0.0
+
+    def record(self, result):
+        self.render_seconds += result.get('seconds', 0.0)
+        if result['success']:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+            self.failures.append({
+                'invoice_number': result['invoice_number'],
+                'error': result['error']
+            })
+
+    def to_dict(self):
+        return {
+            'workers': self.workers,
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'invoices_per_second': round(self.throughput, 2),
+            'average_render_seconds': round(self.average_render_time, 4),
+            'failures': self.failures
+        }
+
+    def summary(self):
+        lines = [
+            f"Invoices processed: {self.total} ({self.succeeded} ok, {self.failed} failed)",
+            f"Workers: {self.workers}",
+            f"Elapsed: {self.elapsed:.2f}s",
+            f"Throughput: {self.throughput:.2f} invoices/s",
+            f"Average render time: {self.average_render_time * 1000:.1f} ms/invoice"
+        ]
+        for failure in self.failures[:10]:
+            lines.append(f"  ❌ {failure['invoice_number'] or '(no number)'}: {failure['error']}")
+        if len(self.failures) > 10:
+            lines.append(f"  ... and {len(self.failures) - 10} more failures")
+        return "\n".join(lines)
+
+
+class BatchRenderer:
+    """Render many invoices across a pool of worker processes
+
+    At most ``max_in_flight`` payloads are submitted to the pool at any time,
+    so arbitrarily large (even lazily generated) inputs use bounded memory.
+    """
+
+    def __init__(self, max_workers=None, max_in_flight=None, save_json=True):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.max_workers * 4
+        self.save_json = save_json
+
+    def render(self, payloads, progress_callback=None):
+        """Render every payload and return a BatchReport
+
+        ``progress_callback(result, report)`` is called in the parent process
+        after each invoice completes.
+        """
+        report = BatchReport(self.max_workers)
+        started = time.perf_counter()
+
+        if self.max_workers == 1:
+            # No pool: avoids process start-up cost for small runs and profiling
+            for payload in payloads:
+                self._complete(render_invoice_payload(payload, self.save_json), report, progress_callback)
+        else:
+            self._render_pool(payloads, report, progress_callback)
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _render_pool(self, payloads, report, progress_callback):
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+
+            try:
+                for payload in payloads:
+                    if len(pending) >= self.max_in_flight:
+                        self._drain(pending, report, progress_callback, FIRST_COMPLETED)
+
+                    future = executor.submit(run_collecting, render_invoice_payload, payload, self.save_json)
+                    pending[future] = payload
+
+                while pending:
+                    self._drain(pending, report, progress_callback, FIRST_COMPLETED)
+            except BaseException:
+                # e.g. a cancelled job raising from progress_callback: drop the
+                # renders that have not started instead of waiting for them
+                for future in pending:
+                    future.cancel()
+                raise
+
+    def _drain(self, pending, report, progress_callback, return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            payload = pending.pop(future)
+            try:
+                result, changes = future.result()
+                merge_changes(changes)
+            except Exception as e:
+                # Worker crashed or payload could not be pickled
+                result = {
+                    'success': False,
+                    'invoice_number': payload.get('invoice_number', '') if isinstance(payload, dict) else '',
+                    'error': f"{type(e).__name__}: {str(e)}",
+                    'seconds': 0.0
+                }
+            self._complete(result, report, progress_callback)
+
+    def _complete(self, result, report, progress_callback):
+        report.record(result)
+        if progress_callback:
+            progress_callback(result, report)
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python batch_renderer.py <payloads.json|payloads.jsonl> [workers]")
+        sys.exit(1)
+
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    renderer = BatchRenderer(max_workers=workers)
+    report = renderer.render(load_payloads(sys.argv[1]))
+    print(report.summary())
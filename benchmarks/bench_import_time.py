@@ -0,0 +1,79 @@
+# Benchmark: start-up import cost of the CLI entry points (python -X importtime)
+# Each module is imported in a fresh interpreter; the best cumulative time of
+# several runs is compared with its budget, and modules that must stay lazy
+# are checked not to be loaded at all. test_import_time.py enforces both.
+#
+#   python benchmarks/bench_import_time.py            # all entry points, 5 runs each
+#   python benchmarks/bench_import_time.py main 20    # one module, 20 runs
+
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies a plain CLI call must not load
+HEAVY_MODULES = ['fpdf', 'PIL', 'fontTools', 'numpy', 'smtplib', 'email.mime', 'flask', 'tkinter']
+
+# module -> (cumulative import budget in ms, modules it must not import)
+BUDGETS = {
+    'main': (50, HEAVY_MODULES + ['invoice_generator', 'invoice_exporter', 'email_sender', 'sqlite3']),
+    'invoice_exporter': (120, HEAVY_MODULES),
+    'invoice_generator': (150, ['fpdf', 'PIL', 'fontTools', 'numpy', 'smtplib', 'flask', 'tkinter']),
+}
+
+
+def parse_importtime(stderr):
+    """Map module name -> cumulative microseconds from ``-X importtime`` output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module, runs=5):
+    """Best cumulative import time of ``module`` in ms and the modules it pulled in"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    best = None
+    imported = set()
+    # Run outside the repo: some modules create their working directories on import
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(runs):
+            result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                    cwd=workdir, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+            times = parse_importtime(result.stderr)
+            imported = set(times)
+            best = times[module] if best is None else min(best, times[module])
+    return best / 1000, imported
+
+
+def check(module, runs=5):
+    """(ms, budget_ms, forbidden modules that were imported)"""
+    budget_ms, forbidden = BUDGETS[module]
+    ms, imported = measure(module, runs)
+    loaded = sorted(name for name in forbidden
+                    if name in imported or any(other.startswith(name + '.') for other in imported))
+    return ms, budget_ms, loaded
+
+
+def run(modules, runs):
+    failed = False
+    print(f"{'module':<20} {'best ms':>9} {'budget':>8}  heavy imports")
+    for module in modules:
+        ms, budget_ms, loaded = check(module, runs)
+        over = ms > budget_ms or loaded
+        failed = failed or over
+        print(f"{module:<20} {ms:>9.1f} {budget_ms:>8}  {', '.join(loaded) or '-'}{'  ❌' if over else ''}")
+    return failed
+
+
+if __name__ == "__main__":
+    modules = [arg for arg in sys.argv[1:] if not arg.isdigit()] or list(BUDGETS)
+    runs = next((int(arg) for arg in sys.argv[1:] if arg.isdigit()), 5)
+    sys.exit(1 if run(modules, runs) else 0)
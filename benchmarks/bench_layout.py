@@ -0,0 +1,132 @@
+# Benchmark: per-invoice render time, imperative drawing vs the compiled layout
+#
+#   python benchmarks/bench_layout.py          # 300 invoices of 5 items
+#   python benchmarks/bench_layout.py 1000 20  # 1000 invoices of 20 items
+
+import os
+import sys
+import time
+import warnings
+
+from fpdf import FPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from invoice_generator import InvoiceGenerator
+from invoice_layout import CompiledLayout
+from invoice_table import PagedTable
+
+
+def imperative_pdf(invoice):
+    """The cell-by-cell drawing generate_pdf used before the compiled layout"""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, 'INVOICE', 0, 1, 'C')
+    pdf.ln(10)
+
+    business, client = invoice.business_info, invoice.client_info
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 8, business['name'], 0, 1)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 6, business['address'], 0, 1)
+    pdf.cell(0, 6, f"Phone: {business['phone']}", 0, 1)
+    if business['email']:
+        pdf.cell(0, 6, f"Email: {business['email']}", 0, 1)
+    pdf.ln(10)
+
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(95, 6, f"Invoice Number: {invoice.invoice_number}", 0, 0)
+    pdf.cell(95, 6, "BILL TO:", 0, 1)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(95, 6, f"Invoice Date: {invoice.invoice_date}", 0, 0)
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(95, 6, client['name'], 0, 1)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(95, 6, "", 0, 0)
+    pdf.cell(95, 6, client['address'], 0, 1)
+    for label, key in (("Phone", 'phone'), ("Email", 'email')):
+        if client[key]:
+            pdf.cell(95, 6, "", 0, 0)
+            pdf.cell(95, 6, f"{label}: {client[key]}", 0, 1)
+    pdf.ln(10)
+
+    PagedTable(pdf).render(invoice._item_table_rows())
+
+    totals = invoice.calculate_totals()
+    pdf.ln(5)
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(135, 8, 'Subtotal:', 0, 0, 'R')
+    pdf.cell(30, 8, f"${totals['subtotal']:.2f}", 1, 1, 'R')
+    if invoice.discount > 0:
+        pdf.cell(135, 8, f'Discount ({invoice.discount}%):', 0, 0, 'R')
+        pdf.cell(30, 8, f"-${totals['discount_amount']:.2f}", 1, 1, 'R')
+    if invoice.tax_rate > 0:
+        pdf.cell(135, 8, f'Tax ({invoice.tax_rate}%):', 0, 0, 'R')
+        pdf.cell(30, 8, f"${totals['tax_amount']:.2f}", 1, 1, 'R')
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(135, 10, 'TOTAL:', 0, 0, 'R')
+    pdf.cell(30, 10, f"${totals['total']:.2f}", 1, 1, 'R')
+
+    if invoice.payment_terms:
+        pdf.ln(10)
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(0, 8, 'Payment Terms:', 0, 1)
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(0, 6, invoice.payment_terms, 0, 1)
+
+    pdf.ln(10)
+    pdf.set_font('Arial', 'I', 10)
+    pdf.cell(0, 6, 'Thank you for your business!', 0, 1, 'C')
+    return pdf
+
+
+def make_invoices(count, items):
+    invoices = []
+    for n in range(count):
+        invoice = InvoiceGenerator()
+        invoice.pdf_cache = None
+        invoice.set_business_info("Bench Studio", "12 Main Street", "(555) 123-4567", "billing@bench.test")
+        invoice.set_client_info(f"Client {n}", f"{n} Client Avenue", "(555) 765-4321", f"client{n}@bench.test")
+        invoice.set_invoice_details(f"BENCH-{n:05d}", "2025-06-01", tax_rate=8.5, discount=5,
+                                    payment_terms="Net 30")
+        for i in range(items):
+            invoice.add_item(f"Service line {i}", i % 4 + 1, 49.5 + i)
+        invoices.append(invoice)
+    return invoices
+
+
+def time_per_invoice(render, invoices):
+    start = time.perf_counter()
+    for invoice in invoices:
+        bytes(render(invoice).output())
+    return (time.perf_counter() - start) / len(invoices) * 1000
+
+
+def run(count, items):
+    warnings.simplefilter('ignore', DeprecationWarning)
+    invoices = make_invoices(count, items)
+
+    start = time.perf_counter()
+    layout = CompiledLayout()
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    def compiled_pdf(invoice):
+        return layout.render(invoice._layout_fields(), invoice._item_table_rows())
+
+    # Warm up fonts and imports for both paths
+    time_per_invoice(imperative_pdf, invoices[:5])
+    time_per_invoice(compiled_pdf, invoices[:5])
+
+    imperative_ms = time_per_invoice(imperative_pdf, invoices)
+    compiled_ms = time_per_invoice(compiled_pdf, invoices)
+
+    print(f"{count} invoices x {items} items (PDF build + output)")
+    print(f"  imperative drawing: {imperative_ms:.2f} ms/invoice")
+    print(f"  compiled layout:    {compiled_ms:.2f} ms/invoice  (one-off compile {compile_ms:.1f} ms)")
+    print(f"  speedup:            {imperative_ms / compiled_ms:.2f}x")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(args[0] if args else 300, args[1] if len(args) > 1 else 5)
@@ -0,0 +1,72 @@
+# Benchmark: building and serializing an invoice email with a large attachment,
+# whole-message MIMEBase + as_string() vs the streamed message
+#
+#   python benchmarks/bench_mime_stream.py      # 25 MB attachment
+#   python benchmarks/bench_mime_stream.py 50   # 50 MB attachment
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_sender import EmailSender
+
+
+def legacy_message_bytes(path):
+    """What SMTPSession handed to sendmail before streaming: one full-size string"""
+    msg = MIMEMultipart()
+    msg['From'] = "billing@bench.test"
+    msg['To'] = "client@bench.test"
+    msg['Subject'] = "Statement"
+    msg.attach(MIMEText("Please find your statement attached.", 'plain'))
+    with open(path, "rb") as attachment:
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(attachment.read())
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', 'attachment; filename=statement.pdf')
+        msg.attach(part)
+    # sendmail encodes the string and fixes line endings: two more copies
+    return len(msg.as_string().encode('ascii'))
+
+
+def streamed_message_bytes(path):
+    message = EmailSender().build_invoice_message(
+        "billing@bench.test", "client@bench.test", path, "STATEMENT", "Client", "Bench Co")
+    return sum(len(chunk) for chunk in message.iter_chunks())
+
+
+def measure(func, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        size = func(path)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "statement.pdf")
+        with open(path, 'wb') as f:
+            f.write(os.urandom(megabytes * 1024 * 1024))
+
+        print(f"Attachment: {megabytes} MB")
+        print(f"{'method':<10} {'message MB':>10} {'seconds':>8} {'peak MB':>8}")
+        for name, func in (("legacy", legacy_message_bytes), ("streamed", streamed_message_bytes)):
+            size, elapsed, peak = measure(func, path)
+            print(f"{name:<10} {size / 2 ** 20:>10.1f} {elapsed:>8.2f} {peak / 2 ** 20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
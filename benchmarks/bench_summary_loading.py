@@ -0,0 +1,99 @@
+# Benchmark: loading invoice summaries from JSON files
+# Compares the old one-file-at-a-time loop with invoice_loader.iter_load
+#
+#   python benchmarks/bench_summary_loading.py            # 1k, 10k and 100k files
+#   python benchmarks/bench_summary_loading.py 1000 5000  # custom sizes
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import invoice_loader
+from invoice_exporter import InvoiceExporter
+from invoice_index import InvoiceIndex
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def write_invoices(invoices_dir, count, items_per_invoice=10):
+    os.makedirs(invoices_dir, exist_ok=True)
+    for n in range(count):
+        data = {
+            'business_info': {'name': 'Bench Business', 'address': '1 Bench St', 'phone': '', 'email': ''},
+            'client_info': {'name': f'Client {n % 500}', 'address': f'{n} Client Road', 'phone': '', 'email': ''},
+            'invoice_number': f'BENCH-{n:06d}',
+            'invoice_date': f'2025-{n % 12 + 1:02d}-{n % 28 + 1:02d}',
+            'items': [
+                {'description': f'Line {i}', 'quantity': 2, 'unit_price': 12.5, 'total_price': 25.0}
+                for i in range(items_per_invoice)
+            ],
+            'tax_rate': 8.0,
+            'discount': 0.0,
+            'payment_terms': 'Net 30',
+            'totals': {'subtotal': 250.0, 'discount_amount': 0.0, 'tax_amount': 20.0, 'total': 270.0}
+        }
+        with open(os.path.join(invoices_dir, f"invoice_BENCH-{n:06d}.json"), 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+def sequential_summaries(exporter):
+    """The loop list views and exports used before: list, then open and parse each file"""
+    rows = []
+    for path in list(exporter.iter_invoice_files()):
+        with open(path, 'r') as f:
+            rows.append(InvoiceIndex.summary_from_data(json.load(f)))
+    return rows
+
+
+def parallel_summaries(exporter):
+    return invoice_loader.load_many(exporter.iter_invoice_files(), extract=InvoiceIndex.summary_from_data)
+
+
+def parallel_stdlib_summaries(exporter):
+    """Thread pool only, with the standard library decoder"""
+    backend, invoice_loader.orjson = invoice_loader.orjson, None
+    try:
+        return parallel_summaries(exporter)
+    finally:
+        invoice_loader.orjson = backend
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def run(sizes):
+    print(f"JSON backend: {invoice_loader.JSON_BACKEND}, loader threads: {invoice_loader.default_workers()}, "
+          f"CPUs: {os.cpu_count()}")
+    print(f"{'files':>8} {'sequential':>12} {'threads+json':>13} {'parallel':>12} {'speedup':>8}")
+
+    for count in sizes:
+        workdir = tempfile.mkdtemp(prefix='bench_invoices_')
+        try:
+            exporter = InvoiceExporter.__new__(InvoiceExporter)
+            exporter.invoices_dir = os.path.join(workdir, "invoices")
+            write_invoices(exporter.invoices_dir, count)
+
+            # Warm the page cache once so both variants read the same way
+            sequential_summaries(exporter)
+
+            seq_time, seq_rows = timed(sequential_summaries, exporter)
+            std_time, std_rows = timed(parallel_stdlib_summaries, exporter)
+            par_time, par_rows = timed(parallel_summaries, exporter)
+            assert len(seq_rows) == len(std_rows) == len(par_rows) == count
+
+            print(f"{count:>8} {seq_time:>11.3f}s {std_time:>12.3f}s {par_time:>11.3f}s "
+                  f"{seq_time / par_time:>7.2f}x")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,377 @@
+# Benchmark suite: rendering, totals, storage, export, email and web routes
+#
+# Generates a synthetic ledger, times each operation and writes the results
+# as JSON. When a baseline exists the best runs are compared against it and
+# the run fails if anything got slower than the threshold allows.
+#
+#   python benchmarks/run_benchmarks.py                       # 200 invoices x 10 items
+#   python benchmarks/run_benchmarks.py --invoices 2000 --items 40
+#   python benchmarks/run_benchmarks.py --only generate_pdf web_get_all_invoices
+#   python benchmarks/run_benchmarks.py --update-baseline     # store this run as the baseline
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+
+# A benchmark regressed when its best run is slower than the baseline's best
+# run by more than this fraction. The minimum is compared rather than the
+# median because it is the least affected by other load on the machine.
+DEFAULT_THRESHOLD = 0.35
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    """Register a benchmark
+
+    It receives the Ledger and returns ``(callable, ops per call)``, plus an
+    optional cleanup callable for anything it started.
+    """
+    BENCHMARKS.append(func)
+    return func
+
+
+class Ledger:
+    """Synthetic invoices, generated deterministically from a seed"""
+
+    CLIENTS = ["Acme Corp", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"]
+    TERMS = ["Net 15", "Net 30", "Net 60", "Due on receipt", ""]
+
+    def __init__(self, invoices, items, seed=42):
+        self.invoices = invoices
+        self.items = items
+        rng = random.Random(seed)
+        self.payloads = [self._payload(rng, n) for n in range(invoices)]
+
+    def _payload(self, rng, n):
+        return {
+            'business_name': "Benchmark Studio",
+            'business_address': "1 Timing Street",
+            'business_phone': "(555) 010-0000",
+            'business_email': "billing@bench.test",
+            'client_name': rng.choice(self.CLIENTS),
+            'client_address': f"{n} Client Avenue",
+            'client_email': f"client{n}@bench.test",
+            'invoice_number': f"BENCH-{n:06d}",
+            'invoice_date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'tax_rate': rng.choice([0, 5, 8.5, 20]),
+            'discount': rng.choice([0, 0, 5, 10]),
+            'payment_terms': rng.choice(self.TERMS),
+            'items': [
+                {'description': f"Service line {i}", 'quantity': rng.randint(1, 9),
+                 'unit_price': round(rng.uniform(5, 500), 2)}
+                for i in range(self.items)
+            ]
+        }
+
+    def invoice(self, n=0):
+        from invoice_generator import InvoiceGenerator
+        return InvoiceGenerator.from_payload(self.payloads[n])
+
+
+@benchmark
+def calculate_totals(ledger):
+    invoice = ledger.invoice()
+
+    def run():
+        for _ in range(1000):
+            invoice.calculate_totals()
+    return run, 1000
+
+
+@benchmark
+def generate_pdf(ledger):
+    invoices = [ledger.invoice(n) for n in range(min(ledger.invoices, 50))]
+    for invoice in invoices:
+        invoice.pdf_cache = None
+
+    def run():
+        for invoice in invoices:
+            invoice.generate_pdf()
+    return run, len(invoices)
+
+
+@benchmark
+def save_invoice_data(ledger):
+    invoices = [ledger.invoice(n) for n in range(ledger.invoices)]
+
+    def run():
+        for invoice in invoices:
+            invoice.save_invoice_data()
+    return run, len(invoices)
+
+
+@benchmark
+def index_rebuild(ledger):
+    from invoice_index import InvoiceIndex
+    return InvoiceIndex().rebuild, ledger.invoices
+
+
+@benchmark
+def get_all_invoices(ledger):
+    from invoice_exporter import InvoiceExporter
+
+    def run():
+        InvoiceExporter().get_all_invoices()
+    return run, 1
+
+
+@benchmark
+def export_all_invoices_to_csv(ledger):
+    from invoice_exporter import InvoiceExporter
+
+    def run():
+        os.remove(InvoiceExporter().export_all_invoices_to_csv())
+    return run, ledger.invoices
+
+
+@benchmark
+def email_send_many(ledger):
+    from email_sender import EmailSender
+    from smtp_stub import LocalSMTPStub
+
+    count = min(ledger.invoices, 50)
+    invoice = ledger.invoice(0)
+    invoice.pdf_cache = None
+    pdf_path = invoice.generate_pdf()
+    messages = [{
+        'recipient_email': payload['client_email'],
+        'invoice_pdf_path': pdf_path,
+        'invoice_number': payload['invoice_number'],
+        'client_name': payload['client_name'],
+        'business_name': payload['business_name']
+    } for payload in ledger.payloads[:count]]
+
+    stub = LocalSMTPStub()
+    stub.start()
+    sender = EmailSender(stub.host, stub.port, use_tls=False)
+
+    def run():
+        sender.send_many("billing@bench.test", "secret", messages)
+    return run, count, stub.stop
+
+
+def _web_client():
+    from web_app import app
+    return app.test_client()
+
+
+@benchmark
+def web_get_all_invoices(ledger):
+    client = _web_client()
+
+    def run():
+        for _ in range(20):
+            assert client.get('/api/get-all-invoices?limit=50&sort=total').status_code == 200
+    return run, 20
+
+
+@benchmark
+def web_get_invoice(ledger):
+    client = _web_client()
+    numbers = [payload['invoice_number'] for payload in ledger.payloads[:20]]
+
+    def run():
+        for number in numbers:
+            assert client.get(f'/api/get-invoice/{number}').status_code == 200
+    return run, len(numbers)
+
+
+@benchmark
+def web_reports(ledger):
+    client = _web_client()
+    reports = ['summary', 'by-client', 'by-month', 'by-tax-rate', 'outstanding']
+
+    def run():
+        for report in reports:
+            assert client.get(f'/api/reports/{report}').status_code == 200
+    return run, len(reports)
+
+
+@benchmark
+def web_create_invoice(ledger):
+    client = _web_client()
+    payloads = [dict(payload, invoice_number=f"WEB-{n:06d}") for n, payload in enumerate(ledger.payloads[:10])]
+
+    def run():
+        for payload in payloads:
+            assert client.post('/api/create-invoice?async=0', json=payload).status_code == 200
+    return run, len(payloads)
+
+
+def time_benchmark(func, ledger, repeat):
+    """Run one benchmark ``repeat`` times after a warm-up; returns its result dict"""
+    run, ops, *cleanup = func(ledger)
+    try:
+        run()
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            runs.append((time.perf_counter() - start) * 1000 / ops)
+    finally:
+        for callback in cleanup:
+            callback()
+    return {
+        'ops': ops,
+        'median_ms': statistics.median(runs),
+        'min_ms': min(runs),
+        'mean_ms': statistics.fmean(runs),
+        'runs_ms': runs
+    }
+
+
+def run_suite(invoices=200, items=10, repeat=7, seed=42, only=None, log=print):
+    """Run the selected benchmarks in a scratch directory; returns the results document"""
+    import invoice_loader
+
+    selected = [func for func in BENCHMARKS if not only or func.__name__ in only]
+    unknown = set(only or ()) - {func.__name__ for func in BENCHMARKS}
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    ledger = Ledger(invoices, items, seed)
+    results = {}
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="invoice-bench-")
+    os.chdir(workdir)
+    # Time real renders, not copies from the PDF cache
+    previous_cache = os.environ.get('INVOICE_PDF_CACHE')
+    os.environ['INVOICE_PDF_CACHE'] = '0'
+    # Per-message INFO logging would dominate the email timings
+    logging.disable(logging.INFO)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            # Populate the ledger so read benchmarks have data regardless of selection
+            for n in range(invoices):
+                ledger.invoice(n).save_invoice_data()
+
+            for func in selected:
+                results[func.__name__] = time_benchmark(func, ledger, repeat)
+                log(f"  {func.__name__:<28} {results[func.__name__]['median_ms']:10.3f} ms/op")
+    finally:
+        logging.disable(logging.NOTSET)
+        if previous_cache is None:
+            os.environ.pop('INVOICE_PDF_CACHE', None)
+        else:
+            os.environ['INVOICE_PDF_CACHE'] = previous_cache
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'json_backend': invoice_loader.JSON_BACKEND,
+            'invoices': invoices,
+            'items': items,
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare best runs with a baseline document
+
+    Returns a list of ``(name, current_ms, baseline_ms, ratio, regressed)``
+    for benchmarks present in both.
+    """
+    rows = []
+    for name, result in results['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        ratio = result['min_ms'] / base['min_ms'] if base['min_ms'] else 1.0
+        rows.append((name, result['min_ms'], base['min_ms'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_json(path, document):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Invoice generator benchmark suite")
+    parser.add_argument("--invoices", type=int, default=200, help="Invoices in the synthetic ledger")
+    parser.add_argument("--items", type=int, default=10, help="Line items per invoice")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", help="Run just these benchmarks")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before a benchmark counts as a regression (0.35 = 35%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for func in BENCHMARKS:
+            print(func.__name__)
+        return 0
+
+    print(f"⏱️  Benchmarking {args.invoices} invoices x {args.items} items, {args.repeat} runs each")
+    results = run_suite(args.invoices, args.items, args.repeat, args.seed, args.only)
+    save_json(args.output, results)
+    print(f"\n💾 Results saved to {args.output}")
+
+    if args.update_baseline:
+        save_json(args.baseline, results)
+        print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️  No baseline to compare against (run with --update-baseline to create one)")
+        return 0
+
+    baseline = load_json(args.baseline)
+    base_meta = baseline.get('meta', {})
+    if (base_meta.get('invoices'), base_meta.get('items')) != (args.invoices, args.items):
+        print(f"⚠️  Baseline was recorded with {base_meta.get('invoices')} invoices x "
+              f"{base_meta.get('items')} items; per-op times may not be comparable")
+
+    rows = compare(results, baseline, args.threshold)
+    print(f"\n📊 Compared with baseline (threshold +{args.threshold:.0%}):")
+    for name, current, base, ratio, regressed in rows:
+        marker = "❌" if regressed else "✅"
+        print(f"  {marker} {name:<28} {current:10.3f} ms vs {base:10.3f} ms  ({ratio:.2f}x)")
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
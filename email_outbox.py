@@ -0,0 +1,374 @@
+import json
+import logging
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+
+from email_sender import EmailSender
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    sent_at REAL,
+    owner TEXT,
+    claimed_by TEXT,
+    claimed_until REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS outbox_owners (
+    owner TEXT PRIMARY KEY,
+    alive_until REAL NOT NULL
+);
+"""
+
+# Columns added after the first release, for outbox databases created before them
+ADDED_COLUMNS = (('owner', 'TEXT'), ('claimed_by', 'TEXT'), ('claimed_until', 'REAL'))
+
+# Statuses a worker may pick up
+PENDING_STATUSES = ('queued', 'retrying')
+
+# A job is claimable when it is due, or when it is stuck in 'sending' after its
+# lease ran out, and its owner (the process holding the password) is this
+# outbox or no longer alive
+CLAIM_QUERY = """
+SELECT outbox.* FROM outbox LEFT JOIN outbox_owners ON outbox_owners.owner = outbox.owner
+WHERE ((status IN ('queued', 'retrying') AND next_attempt_at <= :now)
+       OR (status = 'sending' AND COALESCE(claimed_until, 0) < :now))
+  AND (outbox.owner = :me OR outbox.owner IS NULL OR COALESCE(alive_until, 0) < :now)
+ORDER BY next_attempt_at LIMIT 1
+"""
+
+
+class PermanentSendError(Exception):
+    """A send failure that retrying cannot fix (bad credentials, bad recipient...)"""
+
+
+class EmailOutbox:
+    """Persistent email queue drained by background worker threads
+
+    Jobs are stored in SQLite so queued mail survives a restart. SMTP
+    passwords are deliberately *not* written to disk: they are held in memory
+    only, by the outbox that queued the job (its ``owner``). Several
+    processes may share one database: each only claims its own jobs, and
+    keeps an ``outbox_owners`` heartbeat while its workers run. A job whose
+    owner has stopped (or has not been heard from for ``owner_timeout``
+    seconds) is claimed by whoever sees it and fails with a clear message,
+    since nobody has its password any more; it has to be resubmitted.
+
+    A claimed job carries a lease of ``lease_seconds``. It is only taken
+    over if it is still 'sending' after the lease ran out (its worker died
+    mid-send), so starting another outbox never sends a message twice.
+    Each worker keeps its SMTP session open between jobs for the same
+    sender account.
+    """
+
+    def __init__(self, db_path=os.path.join("outbox", "outbox.sqlite3"), email_sender=None,
+                 workers=2, max_attempts=5, base_backoff=2.0, max_backoff=300.0, poll_interval=1.0,
+                 lease_seconds=600.0, owner_timeout=120.0):
+        self.db_path = db_path
+        self.email_sender = email_sender or EmailSender(debug_level=0)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.owner_timeout = owner_timeout
+        self.owner_id = uuid.uuid4().hex
+
+        self._secrets = {}
+        self._secrets_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            existing = {row['name'] for row in conn.execute("PRAGMA table_info(outbox)")}
+            for name, column_type in ADDED_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE outbox ADD COLUMN {name} {column_type}")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _heartbeat(self, conn):
+        """Record that this outbox (and the passwords it holds) is alive"""
+        conn.execute("INSERT OR REPLACE INTO outbox_owners (owner, alive_until) VALUES (?, ?)",
+                     (self.owner_id, time.time() + self.owner_timeout))
+
+    def start(self):
+        """Start the worker threads (safe to call more than once; replaces dead workers)"""
+        with self._start_lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if len(self._threads) >= self.workers:
+                return self
+            self._stopping.clear()
+            running = {thread.name for thread in self._threads}
+            for n in range(self.workers):
+                if f"email-outbox-{n}" in running:
+                    continue
+                thread = threading.Thread(target=self._worker_loop, name=f"email-outbox-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=10):
+        """Stop the workers; jobs this outbox still owns are failed by the next outbox to look"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM outbox_owners WHERE owner = ?", (self.owner_id,))
+        finally:
+            conn.close()
+
+    def enqueue(self, message, sender_password, idempotency_key=None):
+        """Queue an invoice email; returns ``(status_dict, created)``
+
+        ``message`` holds the keyword arguments of send_invoice_email except
+        the password. Resubmitting with an ``idempotency_key`` that is already
+        known returns the existing job instead of queueing a second send.
+        """
+        now = time.time()
+        email_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            try:
+                self._heartbeat(conn)
+                conn.execute(
+                    "INSERT INTO outbox (id, idempotency_key, status, payload, next_attempt_at, created_at, "
+                    "updated_at, owner) VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                    (email_id, idempotency_key, json.dumps(message), now, now, now, self.owner_id)
+                )
+                created = True
+            except sqlite3.IntegrityError:
+                email_id = conn.execute(
+                    "SELECT id FROM outbox WHERE idempotency_key = ?", (idempotency_key,)
+                ).fetchone()['id']
+                created = False
+        finally:
+            conn.close()
+
+        if created:
+            with self._secrets_lock:
+                self._secrets[email_id] = sender_password
+            self._wakeup.set()
+
+        return self.get_status(email_id), created
+
+    def get_status(self, email_id):
+        """Public view of a job (never includes credentials), or None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM outbox WHERE id = ?", (email_id,)).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+
+        payload = json.loads(row['payload'])
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'invoice_number': payload.get('invoice_number'),
+            'recipient_email': payload.get('recipient_email'),
+            'attempts': row['attempts'],
+            'last_error': row['last_error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'sent_at': row['sent_at'],
+            'next_attempt_at': row['next_attempt_at'] if row['status'] in PENDING_STATUSES else None
+        }
+
+    def _claim_next(self):
+        """Atomically move the next claimable job (see CLAIM_QUERY) to 'sending' under a lease"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            self._heartbeat(conn)
+            row = conn.execute(CLAIM_QUERY, {'now': now, 'me': self.owner_id}).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE outbox SET status = 'sending', attempts = attempts + 1, updated_at = ?, "
+                    "claimed_by = ?, claimed_until = ? WHERE id = ?",
+                    (now, self.owner_id, now + self.lease_seconds, row['id'])
+                )
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            # Never let a failing ROLLBACK replace the original error
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error as e:
+                    logger.warning(f"Outbox rollback failed: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, email_id, status, error=None, next_attempt_at=None):
+        """Settle a job this outbox claimed and drop its lease (a no-op if the lease was taken over)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE outbox SET status = ?, last_error = ?, updated_at = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at), sent_at = ?, claimed_by = NULL, "
+                "claimed_until = NULL WHERE id = ? AND claimed_by = ?",
+                (status, error, now, next_attempt_at, now if status == 'sent' else None, email_id, self.owner_id)
+            )
+        finally:
+            conn.close()
+
+        if status in ('sent', 'failed'):
+            with self._secrets_lock:
+                self._secrets.pop(email_id, None)
+
+    def backoff_delay(self, attempts):
+        """Exponential backoff with +/-10% jitter"""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.9, 1.1)
+
+    def _worker_loop(self):
+        """Claim and send jobs until stopped
+
+        An unexpected error (a locked or corrupt database, a bug in a send
+        step) is logged and the loop carries on after an exponential backoff,
+        so one bad iteration never silently ends the worker.
+        """
+        sessions = {}
+        failures = 0
+        try:
+            while not self._stopping.is_set():
+                job = None
+                try:
+                    job = self._claim_next()
+                    if job is None:
+                        failures = 0
+                        self._wakeup.wait(self.poll_interval)
+                        self._wakeup.clear()
+                        continue
+                    self._process(job, sessions)
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    delay = self.backoff_delay(failures)
+                    logger.exception(f"Email outbox worker error, retrying in {delay:.1f}s")
+                    self._close_sessions(sessions)
+                    if job is not None:
+                        self._release(job, e, delay)
+                    self._stopping.wait(delay)
+        finally:
+            self._close_sessions(sessions)
+
+    @staticmethod
+    def _close_sessions(sessions):
+        for session in sessions.values():
+            try:
+                session.close()
+            except Exception:
+                pass
+        sessions.clear()
+
+    def _release(self, job, error, delay):
+        """Put a job claimed by a failed iteration back on the queue (or fail it)"""
+        attempts = job['attempts'] + 1
+        status = 'failed' if attempts >= self.max_attempts else 'retrying'
+        try:
+            self._finish(job['id'], status, f"Outbox worker error: {error}",
+                         time.time() + delay if status == 'retrying' else None)
+        except Exception as e:
+            # Left in 'sending'; it is claimed again once its lease runs out
+            logger.error(f"Could not release email {job['id']}: {e}")
+
+    def _process(self, job, sessions):
+        email_id = job['id']
+        attempts = job['attempts'] + 1
+        message = json.loads(job['payload'])
+
+        with self._secrets_lock:
+            password = self._secrets.get(email_id)
+        if password is None:
+            # Queued by an outbox that has stopped: nobody has the password any more
+            self._finish(email_id, 'failed', "Credentials are no longer available (the server that queued "
+                                             "this email stopped); please resubmit")
+            return
+
+        try:
+            self._send(message, password, sessions)
+        except PermanentSendError as e:
+            logger.error(f"Email {email_id} failed permanently: {e}")
+            self._finish(email_id, 'failed', str(e))
+            return
+        except Exception as e:
+            error = self.email_sender.describe_error(e, message['recipient_email'])
+            if attempts >= self.max_attempts:
+                logger.error(f"Email {email_id} failed after {attempts} attempts: {error}")
+                self._finish(email_id, 'failed', error)
+            else:
+                delay = self.backoff_delay(attempts)
+                logger.warning(f"Email {email_id} attempt {attempts} failed, retrying in {delay:.1f}s: {error}")
+                self._finish(email_id, 'retrying', error, time.time() + delay)
+            return
+
+        self._finish(email_id, 'sent')
+
+    def _send(self, message, password, sessions):
+        sender = self.email_sender
+        recipient_email = message['recipient_email']
+
+        if not os.path.exists(message['invoice_pdf_path']):
+            raise PermanentSendError(f"Invoice PDF file not found: {message['invoice_pdf_path']}")
+
+        msg = sender.build_invoice_message(
+            message['sender_email'], recipient_email, message['invoice_pdf_path'],
+            message['invoice_number'], message['client_name'], message['business_name'],
+            message.get('email_subject'), message.get('email_message')
+        )
+
+        key = (message['sender_email'], password)
+        session = sessions.get(key)
+        if session is None:
+            session = sessions[key] = sender.open_session(message['sender_email'], password)
+
+        try:
+            session.send_message(msg, recipient_email)
+        except (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+            raise PermanentSendError(sender.describe_error(e, recipient_email)) from e
+        except smtplib.SMTPResponseException as e:
+            session.close()
+            if e.smtp_code >= 500:
+                raise PermanentSendError(sender.describe_error(e, recipient_email)) from e
+            raise
+        except Exception:
+            # Connection state is unknown; start fresh on the next attempt
+            session.close()
+            raise
@@ -1,60 +1,225 @@
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import os
 import logging
+import queue
+import threading
+import time
+
+from metrics import counter, histogram
+from mime_stream import StreamedMessage, send_streamed
+
+SMTP_SECONDS = histogram('invoice_smtp_seconds', "Time spent in SMTP operations", ['operation'])
+SMTP_ERRORS = counter('invoice_smtp_errors_total', "Failed SMTP operations", ['operation'])
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls evenly at ``rate_per_second``"""
+    
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next_slot - now)
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait:
+            time.sleep(wait)
+
+
+class SMTPSession:
+    """A persistent, authenticated SMTP connection reused across many messages
+    
+    The connection is opened lazily on the first send and transparently
+    re-established if the server drops it (``SMTPServerDisconnected``).
+    """
+    
+    def __init__(self, email_sender, sender_email, sender_password, max_messages=None):
+        self.email_sender = email_sender
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.max_messages = max_messages
+        self.server = None
+        self.messages_sent = 0
+        self.connects = 0
+        self._messages_on_connection = 0
+    
+    def connect(self):
+        sender = self.email_sender
+        sender.logger.info(f"🔄 Connecting to SMTP server: {sender.smtp_server}:{sender.smtp_port}")
+        
+        operation = 'connect'
+        try:
+            with SMTP_SECONDS.labels(operation='connect').time():
+                server = smtplib.SMTP(sender.smtp_server, sender.smtp_port, timeout=sender.timeout)
+        except Exception:
+            SMTP_ERRORS.labels(operation=operation).inc()
+            raise
+        try:
+            server.set_debuglevel(sender.debug_level)
+            if sender.use_tls:
+                operation = 'starttls'
+                with SMTP_SECONDS.labels(operation='starttls').time():
+                    server.starttls()
+            operation = 'login'
+            with SMTP_SECONDS.labels(operation='login').time():
+                server.login(self.sender_email, self.sender_password)
+        except Exception:
+            SMTP_ERRORS.labels(operation=operation).inc()
+            self._close_server(server)
+            raise
+        
+        self.server = server
+        self.connects += 1
+        self._messages_on_connection = 0
+    
+    def send_message(self, msg, recipient_email):
+        """Send one message, reconnecting once if the connection was dropped"""
+        if self.max_messages and self._messages_on_connection >= self.max_messages:
+            # Providers cap messages per connection; rotate before hitting it
+            self.close()
+        
+        if self.server is None:
+            self.connect()
+        
+        try:
+            self._sendmail(msg, recipient_email)
+        except smtplib.SMTPServerDisconnected:
+            self.email_sender.logger.info("🔁 SMTP connection dropped, reconnecting...")
+            self._close_server(self.server)
+            self.server = None
+            self.connect()
+            self._sendmail(msg, recipient_email)
+        
+        self.messages_sent += 1
+        self._messages_on_connection += 1
+    
+    def _sendmail(self, msg, recipient_email):
+        if not isinstance(msg, StreamedMessage):
+            msg = StreamedMessage(msg)
+        try:
+            with SMTP_SECONDS.labels(operation='send').time():
+                send_streamed(self.server, self.sender_email, recipient_email, msg)
+        except Exception:
+            SMTP_ERRORS.labels(operation='send').inc()
+            raise
+    
+    @staticmethod
+    def _close_server(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    def close(self):
+        if self.server is not None:
+            self._close_server(self.server)
+            self.server = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SMTPConnectionPool:
+    """A bounded pool of SMTPSession objects for one sender account"""
+    
+    def __init__(self, email_sender, sender_email, sender_password, size=2, max_messages_per_connection=None):
+        self.email_sender = email_sender
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.max_messages_per_connection = max_messages_per_connection
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._sessions = []
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def session(self):
+        """Borrow a session; it is returned to the pool afterwards"""
+        self._slots.acquire()
+        try:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                session = SMTPSession(self.email_sender, self.sender_email, self.sender_password,
+                                      self.max_messages_per_connection)
+                with self._lock:
+                    self._sessions.append(session)
+            try:
+                yield session
+            finally:
+                self._idle.put(session)
+        finally:
+            self._slots.release()
+    
+    @property
+    def connects(self):
+        return sum(session.connects for session in self._sessions)
+    
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        self._idle = queue.LifoQueue()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 
 class EmailSender:
-    def __init__(self, smtp_server="smtp.gmail.com", smtp_port=587):
+    def __init__(self, smtp_server="smtp.gmail.com", smtp_port=587, use_tls=True, timeout=30, debug_level=0):
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.debug_level = debug_level
         
         # Setup logging for debugging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
-    def send_invoice_email(self, sender_email, sender_password, recipient_email, 
-                          invoice_pdf_path, invoice_number, client_name, business_name,
-                          email_subject=None, email_message=None):
-        """Send invoice as email attachment with enhanced debugging"""
+    def build_invoice_message(self, sender_email, recipient_email, invoice_pdf_path, invoice_number,
+                              client_name, business_name, email_subject=None, email_message=None,
+                              pdf_bytes=None):
+        """Build the MIME message for an invoice email with the PDF attached
         
-        try:
-            self.logger.info(f"📧 Starting email send process...")
-            self.logger.info(f"   From: {sender_email}")
-            self.logger.info(f"   To: {recipient_email}")
-            self.logger.info(f"   Invoice: {invoice_number}")
-            self.logger.info(f"   PDF Path: {invoice_pdf_path}")
-            
-            # Check if PDF file exists
-            if not os.path.exists(invoice_pdf_path):
-                error_msg = f"Invoice PDF file not found: {invoice_pdf_path}"
-                self.logger.error(f"❌ {error_msg}")
-                return False, error_msg
-            
-            # Get file size for logging
-            file_size = os.path.getsize(invoice_pdf_path)
-            self.logger.info(f"   PDF Size: {file_size} bytes")
-            
-            # Create message container
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = recipient_email
-            
-            # Use custom subject or default
-            if email_subject:
-                msg['Subject'] = email_subject
-            else:
-                msg['Subject'] = f"Invoice #{invoice_number} from {business_name}"
-            
-            self.logger.info(f"   Subject: {msg['Subject']}")
-            
-            # Email body - use custom message or default
-            if email_message:
-                body = email_message
-            else:
-                body = f"""Dear {client_name},
+        The attachment is read from ``invoice_pdf_path`` unless ``pdf_bytes``
+        (e.g. from InvoiceGenerator.render_pdf_bytes) is given. Either way it
+        is only read and base64-encoded, block by block, while the returned
+        StreamedMessage is being sent.
+        """
+        # Create message container
+        msg = MIMEMultipart()
+        msg['From'] = sender_email
+        msg['To'] = recipient_email
+        
+        # Use custom subject or default
+        if email_subject:
+            msg['Subject'] = email_subject
+        else:
+            msg['Subject'] = f"Invoice #{invoice_number} from {business_name}"
+        
+        # Email body - use custom message or default
+        if email_message:
+            body = email_message
+        else:
+            body = f"""Dear {client_name},
 
 Thank you for your business! Please find attached invoice #{invoice_number}.
 
@@ -67,77 +232,180 @@ If you have any questions about this invoice, please don't hesitate to contact u
 Best regards,
 {business_name}
 {sender_email}"""
+        
+        msg.attach(MIMEText(body, 'plain'))
+        
+        # Attach PDF file
+        message = StreamedMessage(msg)
+        message.attach(
+            invoice_pdf_path if pdf_bytes is None else pdf_bytes,
+            f'invoice_{invoice_number}.pdf'
+        )
+        
+        return message
+    
+    def describe_error(self, error, recipient_email):
+        """Turn an SMTP exception into the user-facing error message"""
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            return f"❌ Gmail Authentication Failed! Please check:\n1. Use App Password (not regular password)\n2. Enable 2-Factor Authentication\n3. Generate App Password from Google Account settings\nError: {str(error)}"
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return f"❌ Recipient email address rejected: {recipient_email}. Please check the email address."
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return f"❌ Connection to Gmail server lost. Please check your internet connection."
+        return f"❌ Email sending failed: {str(error)}"
+    
+    def open_session(self, sender_email, sender_password, max_messages=None):
+        """Open a persistent session for sending several messages on one connection"""
+        return SMTPSession(self, sender_email, sender_password, max_messages)
+    
+    def open_pool(self, sender_email, sender_password, size=2, max_messages_per_connection=None):
+        """Open a pool of persistent sessions for concurrent senders"""
+        return SMTPConnectionPool(self, sender_email, sender_password, size, max_messages_per_connection)
+    
+    def send_invoice_email(self, sender_email, sender_password, recipient_email, 
+                          invoice_pdf_path, invoice_number, client_name, business_name,
+                          email_subject=None, email_message=None, session=None, pdf_bytes=None):
+        """Send invoice as email attachment with enhanced debugging
+        
+        Pass an open ``session`` (see open_session) to reuse its connection;
+        otherwise a connection is opened and closed for this one message.
+        Pass ``pdf_bytes`` to attach an in-memory render instead of reading
+        ``invoice_pdf_path`` (which may then be None).
+        """
+        
+        try:
+            self.logger.info(f"📧 Starting email send process...")
+            self.logger.info(f"   From: {sender_email}")
+            self.logger.info(f"   To: {recipient_email}")
+            self.logger.info(f"   Invoice: {invoice_number}")
+            if pdf_bytes is not None:
+                self.logger.info(f"   PDF: rendered in memory")
+                file_size = len(pdf_bytes)
+            else:
+                self.logger.info(f"   PDF Path: {invoice_pdf_path}")
+                
+                # Check if PDF file exists
+                if not invoice_pdf_path or not os.path.exists(invoice_pdf_path):
+                    error_msg = f"Invoice PDF file not found: {invoice_pdf_path}"
+                    self.logger.error(f"❌ {error_msg}")
+                    return False, error_msg
+                
+                # Get file size for logging
+                file_size = os.path.getsize(invoice_pdf_path)
+            self.logger.info(f"   PDF Size: {file_size} bytes")
             
-            msg.attach(MIMEText(body, 'plain'))
-            self.logger.info(f"   Message attached")
-            
-            # Attach PDF file
-            with open(invoice_pdf_path, "rb") as attachment:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(attachment.read())
-                encoders.encode_base64(part)
-                part.add_header(
-                    'Content-Disposition',
-                    f'attachment; filename=invoice_{invoice_number}.pdf'
-                )
-                msg.attach(part)
-            
-            self.logger.info(f"   PDF attachment added")
-            
-            # Send email with detailed logging
-            self.logger.info(f"🔄 Connecting to SMTP server: {self.smtp_server}:{self.smtp_port}")
-            
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.set_debuglevel(1)  # Enable SMTP debugging
-            
-            self.logger.info(f"🔐 Starting TLS...")
-            server.starttls()
-            
-            self.logger.info(f"🔑 Logging in with email: {sender_email}")
-            server.login(sender_email, sender_password)
+            msg = self.build_invoice_message(
+                sender_email, recipient_email, invoice_pdf_path, invoice_number,
+                client_name, business_name, email_subject, email_message, pdf_bytes
+            )
+            self.logger.info(f"   Subject: {msg['Subject']}")
             
             self.logger.info(f"📤 Sending email...")
-            text = msg.as_string()
-            server.sendmail(sender_email, recipient_email, text)
-            
-            self.logger.info(f"🔚 Closing connection...")
-            server.quit()
+            if session is not None:
+                session.send_message(msg, recipient_email)
+            else:
+                with self.open_session(sender_email, sender_password) as one_shot:
+                    one_shot.send_message(msg, recipient_email)
             
             success_msg = f"✅ Email sent successfully to {recipient_email}!"
             self.logger.info(success_msg)
             
             return True, success_msg
             
-        except smtplib.SMTPAuthenticationError as e:
-            error_msg = f"❌ Gmail Authentication Failed! Please check:\n1. Use App Password (not regular password)\n2. Enable 2-Factor Authentication\n3. Generate App Password from Google Account settings\nError: {str(e)}"
+        except Exception as e:
+            error_msg = self.describe_error(e, recipient_email)
             self.logger.error(error_msg)
             return False, error_msg
+    
+    def send_many(self, sender_email, sender_password, messages, rate_limit=None,
+                  pool_size=1, max_messages_per_connection=None):
+        """Send many invoice emails over reused, authenticated connections
+        
+        ``messages`` is an iterable of dicts with the keyword arguments of
+        send_invoice_email (recipient_email, invoice_pdf_path or pdf_bytes,
+        invoice_number, client_name, business_name and optionally
+        email_subject/email_message).
+        ``rate_limit`` caps messages per second across all connections.
+        
+        Returns one result dict per message, in input order:
+        ``{'recipient_email', 'invoice_number', 'success', 'message'}``.
+        An authentication failure aborts the rest of the run.
+        """
+        limiter = RateLimiter(rate_limit) if rate_limit else None
+        auth_failed = threading.Event()
+        auth_error = {}
+        
+        def send_one(pool, message):
+            result = {
+                'recipient_email': message['recipient_email'],
+                'invoice_number': message.get('invoice_number'),
+                'success': False,
+                'message': ''
+            }
+            if auth_failed.is_set():
+                result['message'] = auth_error['message']
+                return result
             
-        except smtplib.SMTPRecipientsRefused as e:
-            error_msg = f"❌ Recipient email address rejected: {recipient_email}. Please check the email address."
-            self.logger.error(error_msg)
-            return False, error_msg
+            if limiter:
+                limiter.acquire()
             
-        except smtplib.SMTPServerDisconnected as e:
-            error_msg = f"❌ Connection to Gmail server lost. Please check your internet connection."
-            self.logger.error(error_msg)
-            return False, error_msg
+            with pool.session() as session:
+                try:
+                    success, text = self._send_with_session(session, sender_email, message)
+                except smtplib.SMTPAuthenticationError as e:
+                    auth_error.setdefault('message', self.describe_error(e, message['recipient_email']))
+                    auth_failed.set()
+                    success, text = False, auth_error['message']
             
+            result['success'] = success
+            result['message'] = text
+            return result
+        
+        started = time.perf_counter()
+        with self.open_pool(sender_email, sender_password, pool_size, max_messages_per_connection) as pool:
+            if pool_size > 1:
+                with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                    results = list(executor.map(lambda message: send_one(pool, message), messages))
+            else:
+                results = [send_one(pool, message) for message in messages]
+            connects = pool.connects
+        
+        sent = sum(1 for result in results if result['success'])
+        self.logger.info(
+            f"📬 Bulk send finished: {sent}/{len(results)} sent over {connects} connection(s) "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return results
+    
+    def _send_with_session(self, session, sender_email, message):
+        """Send one bulk message; authentication errors propagate to abort the run"""
+        recipient_email = message['recipient_email']
+        pdf_path = message.get('invoice_pdf_path')
+        pdf_bytes = message.get('pdf_bytes')
+        
+        if pdf_bytes is None and not (pdf_path and os.path.exists(pdf_path)):
+            return False, f"Invoice PDF file not found: {pdf_path}"
+        
+        try:
+            msg = self.build_invoice_message(
+                sender_email, recipient_email, pdf_path, message['invoice_number'],
+                message['client_name'], message['business_name'],
+                message.get('email_subject'), message.get('email_message'), pdf_bytes
+            )
+            session.send_message(msg, recipient_email)
+            return True, f"✅ Email sent successfully to {recipient_email}!"
+        except smtplib.SMTPAuthenticationError:
+            raise
         except Exception as e:
-            error_msg = f"❌ Email sending failed: {str(e)}"
-            self.logger.error(error_msg)
-            return False, error_msg
+            return False, self.describe_error(e, recipient_email)
 
     def test_email_connection(self, sender_email, sender_password):
         """Test email connection without sending"""
         try:
             self.logger.info(f"🧪 Testing email connection for: {sender_email}")
             
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.set_debuglevel(1)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.quit()
+            with self.open_session(sender_email, sender_password) as session:
+                session.connect()
             
             self.logger.info(f"✅ Email connection test successful!")
             return True, "Connection successful!"
@@ -0,0 +1,245 @@
+import re
+from datetime import date, datetime, timedelta
+
+from money import from_cents, to_cents
+
+# Materialized aggregates, kept in the invoice index database and updated in
+# the same transaction as the index rows. Amounts are integer cents so
+# repeated add/subtract never drifts.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analytics_invoices (
+    invoice_number TEXT PRIMARY KEY,
+    client_name TEXT,
+    month TEXT,
+    tax_rate REAL,
+    due_date TEXT,
+    paid INTEGER,
+    subtotal_cents INTEGER,
+    discount_cents INTEGER,
+    tax_cents INTEGER,
+    total_cents INTEGER
+);
+CREATE TABLE IF NOT EXISTS analytics_by_client (
+    client_name TEXT PRIMARY KEY, invoices INTEGER, subtotal_cents INTEGER, discount_cents INTEGER,
+    tax_cents INTEGER, total_cents INTEGER, outstanding_cents INTEGER
+);
+CREATE TABLE IF NOT EXISTS analytics_by_month (
+    month TEXT PRIMARY KEY, invoices INTEGER, subtotal_cents INTEGER, discount_cents INTEGER,
+    tax_cents INTEGER, total_cents INTEGER, outstanding_cents INTEGER
+);
+CREATE TABLE IF NOT EXISTS analytics_by_tax_rate (
+    tax_rate REAL PRIMARY KEY, invoices INTEGER, subtotal_cents INTEGER, discount_cents INTEGER,
+    tax_cents INTEGER, total_cents INTEGER, outstanding_cents INTEGER
+);
+CREATE TABLE IF NOT EXISTS analytics_outstanding (
+    due_date TEXT PRIMARY KEY, invoices INTEGER, total_cents INTEGER
+);
+"""
+
+# Dimension table -> key column of analytics_invoices
+DIMENSIONS = {
+    'analytics_by_client': 'client_name',
+    'analytics_by_month': 'month',
+    'analytics_by_tax_rate': 'tax_rate'
+}
+
+AMOUNTS = ['subtotal_cents', 'discount_cents', 'tax_cents', 'total_cents']
+
+# Days past due -> ageing bucket for the outstanding report
+AGEING_BUCKETS = [
+    ('current', None, 0),
+    ('1-30', 1, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None)
+]
+
+REPORTS = ('summary', 'by_client', 'by_month', 'by_tax_rate', 'outstanding')
+
+_NET_TERMS = re.compile(r'net\s*(\d+)', re.IGNORECASE)
+
+
+def due_date_for(invoice_date, payment_terms):
+    """Due date from "Net N" style terms; otherwise due on the invoice date"""
+    try:
+        issued = datetime.strptime(invoice_date or '', '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    match = _NET_TERMS.search(payment_terms or '')
+    days = int(match.group(1)) if match else 0
+    return (issued + timedelta(days=days)).isoformat()
+
+
+def contribution(summary):
+    """What one invoice adds to the aggregates, from an index summary dict"""
+    invoice_date = summary.get('invoice_date') or ''
+    return {
+        'invoice_number': str(summary['invoice_number']),
+        'client_name': summary.get('client_name') or '',
+        'month': invoice_date[:7] if re.match(r'^\d{4}-\d{2}', invoice_date) else '',
+        'tax_rate': float(summary.get('tax_rate') or 0),
+        'due_date': due_date_for(invoice_date, summary.get('payment_terms')),
+        'paid': 1 if summary.get('paid_date') else 0,
+        'subtotal_cents': to_cents(summary.get('subtotal') or 0),
+        'discount_cents': to_cents(summary.get('discount_amount') or 0),
+        'tax_cents': to_cents(summary.get('tax_amount') or 0),
+        'total_cents': to_cents(summary.get('total') or 0)
+    }
+
+
+def _money_row(row):
+    """Aggregate row with cents converted to amounts"""
+    result = {}
+    for key in row.keys():
+        if key.endswith('_cents'):
+            result[key[:-len('_cents')]] = from_cents(row[key])
+        else:
+            result[key] = row[key]
+    return result
+
+
+class InvoiceAnalytics:
+    """Revenue aggregates maintained incrementally alongside the invoice index
+
+    Every invoice's contribution (amounts, client, month, tax rate, due date)
+    is remembered, so re-saving an invoice subtracts the old contribution and
+    adds the new one, and removing it subtracts it. Reports read the small
+    aggregate tables only, so they cost the same however many invoices exist.
+
+    There is no payment tracking yet: an invoice counts as outstanding until
+    its data carries a ``paid_date``.
+    """
+
+    @staticmethod
+    def create_schema(conn):
+        conn.executescript(SCHEMA)
+
+    def _apply(self, conn, row, sign):
+        outstanding = 0 if row['paid'] else row['total_cents']
+        amounts = [sign * row[amount] for amount in AMOUNTS]
+        for table, key in DIMENSIONS.items():
+            conn.execute(
+                f"INSERT INTO {table} ({key}, invoices, {', '.join(AMOUNTS)}, outstanding_cents) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT({key}) DO UPDATE SET "
+                + ", ".join(f"{column} = {column} + excluded.{column}"
+                            for column in ['invoices'] + AMOUNTS + ['outstanding_cents']),
+                [row[key], sign] + amounts + [sign * outstanding]
+            )
+            conn.execute(f"DELETE FROM {table} WHERE {key} = ? AND invoices = 0", (row[key],))
+
+        if outstanding and row['due_date']:
+            conn.execute(
+                "INSERT INTO analytics_outstanding (due_date, invoices, total_cents) VALUES (?, ?, ?) "
+                "ON CONFLICT(due_date) DO UPDATE SET invoices = invoices + excluded.invoices, "
+                "total_cents = total_cents + excluded.total_cents",
+                (row['due_date'], sign, sign * outstanding)
+            )
+            conn.execute("DELETE FROM analytics_outstanding WHERE due_date = ? AND invoices = 0", (row['due_date'],))
+
+    def _previous(self, conn, invoice_number):
+        return conn.execute("SELECT * FROM analytics_invoices WHERE invoice_number = ?", (invoice_number,)).fetchone()
+
+    def record(self, conn, summaries):
+        """Add (or replace) the contributions of index summaries; call inside the index transaction"""
+        for summary in summaries:
+            row = contribution(summary)
+            previous = self._previous(conn, row['invoice_number'])
+            if previous is not None:
+                self._apply(conn, previous, -1)
+            self._apply(conn, row, 1)
+            columns = list(row)
+            conn.execute(
+                f"INSERT OR REPLACE INTO analytics_invoices ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                [row[column] for column in columns]
+            )
+
+    def forget(self, conn, invoice_numbers):
+        """Subtract the contributions of removed invoices"""
+        for invoice_number in invoice_numbers:
+            previous = self._previous(conn, str(invoice_number))
+            if previous is not None:
+                self._apply(conn, previous, -1)
+                conn.execute("DELETE FROM analytics_invoices WHERE invoice_number = ?", (str(invoice_number),))
+
+    def clear(self, conn):
+        for table in ['analytics_invoices', 'analytics_outstanding'] + list(DIMENSIONS):
+            conn.execute(f"DELETE FROM {table}")
+
+    def backfill(self, conn):
+        """Record index rows that have no contribution yet (e.g. an index built before analytics)
+
+        Returns the number of invoices added.
+        """
+        rows = conn.execute(
+            "SELECT * FROM invoices WHERE invoice_number NOT IN (SELECT invoice_number FROM analytics_invoices)"
+        ).fetchall()
+        if rows:
+            with conn:
+                self.record(conn, [dict(row) for row in rows])
+        return len(rows)
+
+    # Reports
+
+    def summary(self, conn):
+        row = conn.execute(
+            "SELECT COALESCE(SUM(invoices), 0) AS invoices, "
+            + ", ".join(f"COALESCE(SUM({column}), 0) AS {column}" for column in AMOUNTS + ['outstanding_cents'])
+            + " FROM analytics_by_client"
+        ).fetchone()
+        return _money_row(row)
+
+    def by_client(self, conn, limit=50, sort='total'):
+        order = {'total': 'total_cents DESC', 'outstanding': 'outstanding_cents DESC',
+                 'invoices': 'invoices DESC', 'client': 'client_name COLLATE NOCASE'}
+        if sort not in order:
+            raise ValueError(f"Invalid sort field: {sort}")
+        rows = conn.execute(
+            f"SELECT * FROM analytics_by_client ORDER BY {order[sort]}, client_name LIMIT ?", (int(limit),)
+        ).fetchall()
+        return [_money_row(row) for row in rows]
+
+    def by_month(self, conn, month_from=None, month_to=None):
+        sql = "SELECT * FROM analytics_by_month WHERE month != ''"
+        params = []
+        if month_from:
+            sql += " AND month >= ?"
+            params.append(month_from[:7])
+        if month_to:
+            sql += " AND month <= ?"
+            params.append(month_to[:7])
+        return [_money_row(row) for row in conn.execute(sql + " ORDER BY month", params)]
+
+    def by_tax_rate(self, conn):
+        return [_money_row(row) for row in conn.execute("SELECT * FROM analytics_by_tax_rate ORDER BY tax_rate")]
+
+    def outstanding(self, conn, as_of=None):
+        """Unpaid totals split into ageing buckets by days past the due date"""
+        as_of = as_of or date.today().isoformat()
+        datetime.strptime(as_of, '%Y-%m-%d')
+
+        cases = []
+        for name, low, high in AGEING_BUCKETS:
+            conditions = []
+            if low is not None:
+                conditions.append(f"julianday(:as_of) - julianday(due_date) >= {low}")
+            if high is not None:
+                conditions.append(f"julianday(:as_of) - julianday(due_date) <= {high}")
+            where = " AND ".join(conditions)
+            cases.append(f"COALESCE(SUM(CASE WHEN {where} THEN total_cents END), 0) AS \"{name}\"")
+            cases.append(f"COALESCE(SUM(CASE WHEN {where} THEN invoices END), 0) AS \"{name}_count\"")
+
+        row = conn.execute(
+            "SELECT COALESCE(SUM(total_cents), 0) AS total, COALESCE(SUM(invoices), 0) AS invoices, "
+            + ", ".join(cases) + " FROM analytics_outstanding",
+            {'as_of': as_of}
+        ).fetchone()
+        return {
+            'as_of': as_of,
+            'total': from_cents(row['total']),
+            'invoices': row['invoices'],
+            'buckets': [
+                {'bucket': name, 'total': from_cents(row[name]), 'invoices': row[f"{name}_count"]}
+                for name, _, _ in AGEING_BUCKETS
+            ]
+        }
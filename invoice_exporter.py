@@ -1,134 +1,331 @@
 import csv
+import gzip
+import io
+import itertools
 import json
 import os
+import zipfile
 from datetime import datetime
+from invoice_index import InvoiceIndex
+from invoice_ledger import get_default_ledger
+from invoice_loader import iter_load
+from invoice_paths import InvoicePaths
+
+SUMMARY_HEADER = [
+    'Invoice Number', 'Invoice Date', 'Client Name', 'Client Address',
+    'Subtotal', 'Tax Amount', 'Discount Amount', 'Total', 'Payment Terms'
+]
+
+# Bytes buffered before a chunk is handed to the client when streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkSink:
+    """Write-only, non-seekable byte sink that is drained between writes
+
+    ZipFile detects that it cannot seek and writes data descriptors instead of
+    going back to patch local headers, which is what lets a ZIP be streamed.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
 
 class InvoiceExporter:
     def __init__(self):
         self.invoices_dir = "invoices"
         self.exports_dir = "exports"
+        # Segment ledger when INVOICE_STORAGE=ledger, else None (one JSON file per invoice)
+        self.ledger = get_default_ledger(self.invoices_dir)
+        self.index = InvoiceIndex(self.invoices_dir, ledger=self.ledger)
         
         # Create exports directory if it doesn't exist
         if not os.path.exists(self.exports_dir):
             os.makedirs(self.exports_dir)
     
+    @property
+    def paths(self):
+        """Path layout for the current invoices and exports directories"""
+        return InvoicePaths(self.invoices_dir, self.exports_dir)
+    
     def export_to_csv(self, invoice_data, filename=None):
         """Export invoice data to CSV format"""
         if filename is None:
-            filename = f"invoice_{invoice_data['invoice_number']}.csv"
-        
-        filepath = os.path.join(self.exports_dir, filename)
+            filepath = self.paths.csv_export_path(invoice_data['invoice_number'])
+        else:
+            filepath = os.path.join(self.exports_dir, filename)
+        InvoicePaths.ensure_parent(filepath)
         
         with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Write header information
-            writer.writerow(['Invoice Export'])
-            writer.writerow(['Generated on:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
-            writer.writerow([])
-            
-            # Business information
-            writer.writerow(['Business Information'])
-            writer.writerow(['Name:', invoice_data['business_info']['name']])
-            writer.writerow(['Address:', invoice_data['business_info']['address']])
-            writer.writerow(['Phone:', invoice_data['business_info']['phone']])
-            writer.writerow(['Email:', invoice_data['business_info']['email']])
-            writer.writerow([])
-            
-            # Client information
-            writer.writerow(['Client Information'])
-            writer.writerow(['Name:', invoice_data['client_info']['name']])
-            writer.writerow(['Address:', invoice_data['client_info']['address']])
-            writer.writerow(['Phone:', invoice_data['client_info']['phone']])
-            writer.writerow(['Email:', invoice_data['client_info']['email']])
-            writer.writerow([])
-            
-            # Invoice details
-            writer.writerow(['Invoice Details'])
-            writer.writerow(['Invoice Number:', invoice_data['invoice_number']])
-            writer.writerow(['Invoice Date:', invoice_data['invoice_date']])
-            writer.writerow(['Tax Rate (%):', invoice_data['tax_rate']])
-            writer.writerow(['Discount (%):', invoice_data['discount']])
-            writer.writerow(['Payment Terms:', invoice_data['payment_terms']])
-            writer.writerow([])
-            
-            # Items header
-            writer.writerow(['Items'])
-            writer.writerow(['Description', 'Quantity', 'Unit Price', 'Total Price'])
-            
-            # Items data
-            for item in invoice_data['items']:
-                writer.writerow([
-                    item['description'],
-                    item['quantity'],
-                    f"${item['unit_price']:.2f}",
-                    f"${item['total_price']:.2f}"
-                ])
-            
-            writer.writerow([])
-            
-            # Totals
-            totals = invoice_data['totals']
-            writer.writerow(['Summary'])
-            writer.writerow(['Subtotal:', f"${totals['subtotal']:.2f}"])
-            if totals['discount_amount'] > 0:
-                writer.writerow(['Discount:', f"-${totals['discount_amount']:.2f}"])
-            if totals['tax_amount'] > 0:
-                writer.writerow(['Tax:', f"${totals['tax_amount']:.2f}"])
-            writer.writerow(['Total:', f"${totals['total']:.2f}"])
+            self.write_invoice_csv(invoice_data, csvfile)
         
         return filepath
     
-    def export_all_invoices_to_csv(self):
-        """Export all invoices to a single CSV file"""
-        all_invoices = []
+    def write_invoice_csv(self, invoice_data, csvfile):
+        """Write the single-invoice CSV layout to any text file object"""
+        writer = csv.writer(csvfile)
+        
+        # Write header information
+        writer.writerow(['Invoice Export'])
+        writer.writerow(['Generated on:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+        writer.writerow([])
+        
+        # Business information
+        writer.writerow(['Business Information'])
+        writer.writerow(['Name:', invoice_data['business_info']['name']])
+        writer.writerow(['Address:', invoice_data['business_info']['address']])
+        writer.writerow(['Phone:', invoice_data['business_info']['phone']])
+        writer.writerow(['Email:', invoice_data['business_info']['email']])
+        writer.writerow([])
+        
+        # Client information
+        writer.writerow(['Client Information'])
+        writer.writerow(['Name:', invoice_data['client_info']['name']])
+        writer.writerow(['Address:', invoice_data['client_info']['address']])
+        writer.writerow(['Phone:', invoice_data['client_info']['phone']])
+        writer.writerow(['Email:', invoice_data['client_info']['email']])
+        writer.writerow([])
+        
+        # Invoice details
+        writer.writerow(['Invoice Details'])
+        writer.writerow(['Invoice Number:', invoice_data['invoice_number']])
+        writer.writerow(['Invoice Date:', invoice_data['invoice_date']])
+        writer.writerow(['Tax Rate (%):', invoice_data['tax_rate']])
+        writer.writerow(['Discount (%):', invoice_data['discount']])
+        writer.writerow(['Payment Terms:', invoice_data['payment_terms']])
+        writer.writerow([])
+        
+        # Items header
+        writer.writerow(['Items'])
+        writer.writerow(['Description', 'Quantity', 'Unit Price', 'Total Price'])
+        
+        # Items data
+        for item in invoice_data['items']:
+            writer.writerow([
+                item['description'],
+                item['quantity'],
+                f"${item['unit_price']:.2f}",
+                f"${item['total_price']:.2f}"
+            ])
+        
+        writer.writerow([])
+        
+        # Totals
+        totals = invoice_data['totals']
+        writer.writerow(['Summary'])
+        writer.writerow(['Subtotal:', f"${totals['subtotal']:.2f}"])
+        if totals['discount_amount'] > 0:
+            writer.writerow(['Discount:', f"-${totals['discount_amount']:.2f}"])
+        if totals['tax_amount'] > 0:
+            writer.writerow(['Tax:', f"${totals['tax_amount']:.2f}"])
+        writer.writerow(['Total:', f"${totals['total']:.2f}"])
+    
+    def iter_invoice_files(self):
+        """Yield the path of every invoice JSON file without listing the directories up front"""
+        for _, entry in self.paths.iter_invoice_files('json'):
+            yield entry.path
+    
+    def iter_invoices(self):
+        """Yield invoice dicts in directory order
+        
+        Files are read and decoded in batches on a thread pool (see
+        invoice_loader.iter_load); only a bounded number of batches is in
+        memory at once. Ledger storage is read sequentially, segment by
+        segment.
+        """
+        if self.ledger is not None:
+            return self.ledger.iter_invoices()
+        return iter_load(self.iter_invoice_files())
+    
+    @staticmethod
+    def summary_row(invoice):
+        """One row of the all-invoices summary CSV"""
+        totals = invoice['totals']
+        return [
+            invoice['invoice_number'],
+            invoice['invoice_date'],
+            invoice['client_info']['name'],
+            invoice['client_info']['address'],
+            f"${totals['subtotal']:.2f}",
+            f"${totals['tax_amount']:.2f}",
+            f"${totals['discount_amount']:.2f}",
+            f"${totals['total']:.2f}",
+            invoice['payment_terms']
+        ]
+    
+    def iter_summary_rows(self):
+        """Yield summary rows; rows are built in the loader threads so full invoices are dropped early"""
+        if self.ledger is not None:
+            return map(self.summary_row, self.ledger.iter_invoices())
+        return iter_load(self.iter_invoice_files(), extract=self.summary_row)
+    
+    def export_all_invoices_to_csv(self, compress=False, chunk_size=1000):
+        """Export all invoices to a single CSV file
         
-        # Read all JSON files in invoices directory
-        if os.path.exists(self.invoices_dir):
-            for filename in os.listdir(self.invoices_dir):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(self.invoices_dir, filename)
-                    with open(filepath, 'r') as f:
-                        invoice_data = json.load(f)
-                        all_invoices.append(invoice_data)
+        Streams invoice -> row -> file, so memory use does not grow with the
+        number of invoices. The file is flushed every ``chunk_size`` rows;
+        ``compress=True`` writes a gzip-compressed ``.csv.gz`` instead.
+        """
+        rows = self.iter_summary_rows()
         
-        if not all_invoices:
+        # Peek so that no file is created when there is nothing to export
+        first_row = next(rows, None)
+        if first_row is None:
             return None
         
         # Create summary CSV
-        summary_filepath = os.path.join(self.exports_dir, f"all_invoices_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        extension = 'csv.gz' if compress else 'csv'
+        summary_filepath = InvoicePaths.ensure_parent(self.paths.summary_export_path(extension))
+        
+        if compress:
+            csvfile = gzip.open(summary_filepath, 'wt', newline='', encoding='utf-8')
+        else:
+            csvfile = open(summary_filepath, 'w', newline='', encoding='utf-8')
         
-        with open(summary_filepath, 'w', newline='', encoding='utf-8') as csvfile:
+        with csvfile:
             writer = csv.writer(csvfile)
             
             # Write header
-            writer.writerow([
-                'Invoice Number', 'Invoice Date', 'Client Name', 'Client Address',
-                'Subtotal', 'Tax Amount', 'Discount Amount', 'Total', 'Payment Terms'
-            ])
+            writer.writerow(SUMMARY_HEADER)
             
             # Write invoice data
-            for invoice in all_invoices:
-                totals = invoice['totals']
-                writer.writerow([
-                    invoice['invoice_number'],
-                    invoice['invoice_date'],
-                    invoice['client_info']['name'],
-                    invoice['client_info']['address'],
-                    f"${totals['subtotal']:.2f}",
-                    f"${totals['tax_amount']:.2f}",
-                    f"${totals['discount_amount']:.2f}",
-                    f"${totals['total']:.2f}",
-                    invoice['payment_terms']
-                ])
+            for count, row in enumerate(itertools.chain([first_row], rows), start=1):
+                writer.writerow(row)
+                if count % chunk_size == 0:
+                    csvfile.flush()
         
         return summary_filepath
     
+    def iter_selected_invoices(self, **filters):
+        """Yield invoice dicts matching index filters, in the index sort order
+        
+        Accepts the filter and sort arguments of InvoiceIndex.query_summaries
+        and pages through the index with a cursor; the files are loaded on
+        the same bounded thread pool as iter_invoices.
+        """
+        if self.ledger is not None:
+            return self._iter_selected_ledger(filters)
+        return iter_load(self._iter_selected_files(filters))
+    
+    def _iter_selected_numbers(self, filters):
+        cursor = None
+        while True:
+            page = self.index.query_summaries(cursor=cursor, limit=500, include_total=False, **filters)
+            for summary in page['invoices']:
+                yield summary['number']
+            cursor = page['next_cursor']
+            if not cursor:
+                return
+    
+    def _iter_selected_files(self, filters):
+        paths = self.paths
+        for number in self._iter_selected_numbers(filters):
+            path = paths.find_json(number)
+            if path:
+                yield path
+    
+    def _iter_selected_ledger(self, filters):
+        for number in self._iter_selected_numbers(filters):
+            invoice_data = self.ledger.get(number)
+            if invoice_data is not None:
+                yield invoice_data
+    
+    def stream_summary_csv(self, invoices=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Yield the all-invoices summary CSV as UTF-8 byte chunks
+        
+        ``invoices`` is any iterable of invoice dicts (all invoices by
+        default). The header is yielded straight away and rows are batched
+        into roughly ``chunk_size`` bytes.
+        """
+        if invoices is None:
+            invoices = self.iter_invoices()
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(SUMMARY_HEADER)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        
+        for invoice in invoices:
+            writer.writerow(self.summary_row(invoice))
+            if buffer.tell() >= chunk_size:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+    
+    def stream_zip(self, invoice_source=None, include_pdf=True, include_csv=True, chunk_size=STREAM_CHUNK_SIZE):
+        """Yield a ZIP archive of the summary CSV plus per-invoice PDFs and CSVs
+        
+        ``invoice_source`` is a callable returning a fresh iterable of invoice
+        dicts (``self.iter_invoices`` by default); it is called twice, once
+        for the summary and once for the per-invoice entries, so nothing is
+        collected in memory. PDFs are copied into the archive in
+        ``chunk_size`` blocks and the archive bytes are yielded as they are
+        produced.
+        """
+        if invoice_source is None:
+            invoice_source = self.iter_invoices
+        
+        paths = self.paths
+        sink = _ChunkSink()
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            with archive.open('all_invoices_summary.csv', 'w') as entry:
+                for chunk in self.stream_summary_csv(invoice_source(), chunk_size):
+                    entry.write(chunk)
+                    if sink.size >= chunk_size:
+                        yield sink.drain()
+            
+            for invoice in invoice_source():
+                number = invoice['invoice_number']
+                
+                if include_pdf:
+                    pdf_path = paths.find_pdf(number)
+                    if pdf_path:
+                        with open(pdf_path, 'rb') as src, archive.open(f"pdf/invoice_{number}.pdf", 'w') as entry:
+                            for block in iter(lambda: src.read(chunk_size), b''):
+                                entry.write(block)
+                                if sink.size >= chunk_size:
+                                    yield sink.drain()
+                
+                if include_csv:
+                    text = io.StringIO()
+                    self.write_invoice_csv(invoice, text)
+                    archive.writestr(f"csv/invoice_{number}.csv", text.getvalue())
+                
+                if sink.size >= chunk_size:
+                    yield sink.drain()
+        
+        # Central directory
+        tail = sink.drain()
+        if tail:
+            yield tail
+    
     def load_invoice_from_json(self, invoice_number):
-        """Load invoice data from JSON file"""
-        filepath = os.path.join(self.invoices_dir, f"invoice_{invoice_number}.json")
+        """Load invoice data from JSON file (or the ledger, when enabled)"""
+        if self.ledger is not None:
+            return self.ledger.get(invoice_number)
         
-        if os.path.exists(filepath):
+        filepath = self.paths.find_json(invoice_number)
+        
+        if filepath:
             with open(filepath, 'r') as f:
                 return json.load(f)
         else:
@@ -136,16 +333,22 @@ class InvoiceExporter:
     
     def get_all_invoices(self):
         """Get list of all invoice numbers"""
-        invoices = []
-        
-        if os.path.exists(self.invoices_dir):
-            for filename in os.listdir(self.invoices_dir):
-                if filename.endswith('.json'):
-                    # Extract invoice number from filename
-                    invoice_number = filename.replace('invoice_', '').replace('.json', '')
-                    invoices.append(invoice_number)
+        return self.index.get_invoice_numbers()
+    
+    def get_invoice_summaries(self):
+        """Get number, date, client, total and item count for every invoice
         
-        return sorted(invoices)
+        Served from the index, so no invoice JSON file is opened.
+        """
+        return self.index.get_summaries()
+    
+    def query_invoice_summaries(self, **filters):
+        """Get one filtered, sorted page of invoice summaries (see InvoiceIndex.query_summaries)"""
+        return self.index.query_summaries(**filters)
+    
+    def get_report(self, name, **params):
+        """Revenue report from the materialized aggregates (see InvoiceIndex.report)"""
+        return self.index.report(name, **params)
 
 
 # Example usage and testing
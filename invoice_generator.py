@@ -1,19 +1,91 @@
-from fpdf import FPDF
 from datetime import datetime
 import os
 import json
+from invoice_index import InvoiceIndex
+from invoice_ledger import get_default_ledger
+from invoice_paths import InvoicePaths
+from metrics import histogram
+from money import LineItemTable, format_cents, format_price, totals_to_float
+from pdf_cache import atomic_write_bytes, get_default_cache, link_or_copy
+from tracing import span
+
+# Bump whenever the PDF layout changes so cached renders are not reused
+TEMPLATE_VERSION = "4"
+
+PDF_RENDER_SECONDS = histogram('invoice_pdf_render_seconds', "Time to lay out and serialize an invoice PDF")
+JSON_WRITE_SECONDS = histogram('invoice_json_write_seconds', "Time to write invoice data", ['storage'])
+
+# Rows laid out between calls to InvoiceGenerator.render_progress
+PROGRESS_EVERY_ROWS = 100
 
 class InvoiceGenerator:
     def __init__(self):
         self.business_info = {}
         self.client_info = {}
-        self.items = []
+        self.line_items = LineItemTable()
         self.invoice_number = ""
         self.invoice_date = datetime.now().strftime("%Y-%m-%d")
         self.tax_rate = 0.0
         self.discount = 0.0
         self.payment_terms = ""
-        
+        self.pdf_cache = get_default_cache()
+        # Optional callable(rows_done, rows_total) called while the item table is
+        # laid out; background jobs use it for progress and raise from it to cancel
+        self.render_progress = None
+
+    @classmethod
+    def from_payload(cls, data):
+        """Build an invoice from a flat payload (same shape as /api/create-invoice)"""
+        invoice = cls()
+
+        invoice.set_business_info(
+            name=data['business_name'],
+            address=data.get('business_address', ''),
+            phone=data.get('business_phone', ''),
+            email=data.get('business_email', '')
+        )
+
+        invoice.set_client_info(
+            name=data['client_name'],
+            address=data.get('client_address', ''),
+            phone=data.get('client_phone', ''),
+            email=data.get('client_email', '')
+        )
+
+        invoice.set_invoice_details(
+            invoice_number=data['invoice_number'],
+            invoice_date=data.get('invoice_date') or datetime.now().strftime('%Y-%m-%d'),
+            tax_rate=float(data.get('tax_rate') or 0),
+            discount=float(data.get('discount') or 0),
+            payment_terms=data.get('payment_terms', '')
+        )
+
+        for item in data['items']:
+            invoice.add_item(
+                description=item['description'],
+                quantity=item['quantity'],
+                unit_price=item['unit_price']
+            )
+
+        return invoice
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild an invoice from its stored JSON data (the inverse of to_dict)"""
+        invoice = cls()
+        invoice.business_info = dict(data.get('business_info') or {})
+        invoice.client_info = dict(data.get('client_info') or {})
+        invoice.set_invoice_details(
+            invoice_number=data['invoice_number'],
+            invoice_date=data.get('invoice_date'),
+            tax_rate=data.get('tax_rate') or 0.0,
+            discount=data.get('discount') or 0.0,
+            payment_terms=data.get('payment_terms', '')
+        )
+        for item in data.get('items', []):
+            invoice.add_item(item['description'], item['quantity'], item['unit_price'])
+        return invoice
+
     def set_business_info(self, name, address, phone, email=""):
         """Set business information"""
         self.business_info = {
@@ -32,15 +104,27 @@ class InvoiceGenerator:
             'email': email
         }
     
+    @property
+    def items(self):
+        """Line items; a LineItemTable that iterates as item dicts"""
+        return self.line_items
+    
+    @items.setter
+    def items(self, items):
+        self.line_items = LineItemTable(items)
+    
     def add_item(self, description, quantity, unit_price):
-        """Add an item to the invoice"""
-        total_price = quantity * unit_price
-        self.items.append({
-            'description': description,
-            'quantity': quantity,
-            'unit_price': unit_price,
-            'total_price': total_price
-        })
+        """Add an item to the invoice
+        
+        Quantity and unit price may be numbers, strings or Decimals; the
+        price keeps six decimal places and only the line total is rounded
+        to the cent.
+        """
+        self.line_items.append(description, quantity, unit_price)
+    
+    def remove_item(self, index):
+        """Remove and return the item at ``index``"""
+        return self.line_items.pop(index)
     
     def set_invoice_details(self, invoice_number, invoice_date=None, tax_rate=0.0, discount=0.0, payment_terms=""):
         """Set invoice details"""
@@ -51,147 +135,190 @@ class InvoiceGenerator:
         self.discount = discount
         self.payment_terms = payment_terms
     
+    def calculate_totals_cents(self):
+        """Subtotal, discount, tax and total as exact integer cents
+        
+        The subtotal is kept up to date as items are added or removed, so
+        this does not walk the items.
+        """
+        return self.line_items.totals_cents(self.tax_rate, self.discount)
+    
     def calculate_totals(self):
         """Calculate subtotal, tax, discount, and total"""
-        subtotal = sum(item['total_price'] for item in self.items)
-        discount_amount = subtotal * (self.discount / 100)
-        taxable_amount = subtotal - discount_amount
-        tax_amount = taxable_amount * (self.tax_rate / 100)
-        total = taxable_amount + tax_amount
-        
-        return {
-            'subtotal': subtotal,
-            'discount_amount': discount_amount,
-            'tax_amount': tax_amount,
-            'total': total
-        }
+        return totals_to_float(self.calculate_totals_cents())
     
     def generate_pdf(self):
-        """Generate PDF invoice"""
-        # Create invoices directory if it doesn't exist
-        if not os.path.exists('invoices'):
-            os.makedirs('invoices')
-        
-        # Create PDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font('Arial', 'B', 16)
-        
-        # Header - Business Info
-        pdf.cell(0, 10, 'INVOICE', 0, 1, 'C')
-        pdf.ln(10)
-        
-        # Business Information
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 8, self.business_info['name'], 0, 1)
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(0, 6, self.business_info['address'], 0, 1)
-        pdf.cell(0, 6, f"Phone: {self.business_info['phone']}", 0, 1)
-        if self.business_info['email']:
-            pdf.cell(0, 6, f"Email: {self.business_info['email']}", 0, 1)
-        
-        pdf.ln(10)
-        
-        # Invoice details and Client info side by side
-        pdf.set_font('Arial', 'B', 10)
-        
-        # Left side - Invoice Details
-        pdf.cell(95, 6, f"Invoice Number: {self.invoice_number}", 0, 0)
-        # Right side - Bill To
-        pdf.cell(95, 6, "BILL TO:", 0, 1)
-        
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(95, 6, f"Invoice Date: {self.invoice_date}", 0, 0)
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(95, 6, self.client_info['name'], 0, 1)
-        
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(95, 6, "", 0, 0)  # Empty cell for alignment
-        pdf.cell(95, 6, self.client_info['address'], 0, 1)
-        
-        if self.client_info['phone']:
-            pdf.cell(95, 6, "", 0, 0)  # Empty cell for alignment
-            pdf.cell(95, 6, f"Phone: {self.client_info['phone']}", 0, 1)
-        
-        if self.client_info['email']:
-            pdf.cell(95, 6, "", 0, 0)  # Empty cell for alignment
-            pdf.cell(95, 6, f"Email: {self.client_info['email']}", 0, 1)
-        
-        pdf.ln(10)
-        
-        # Items table header
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(80, 8, 'Description', 1, 0, 'C')
-        pdf.cell(25, 8, 'Quantity', 1, 0, 'C')
-        pdf.cell(30, 8, 'Unit Price', 1, 0, 'C')
-        pdf.cell(30, 8, 'Total', 1, 1, 'C')
+        """Generate PDF invoice
         
-        # Items
-        pdf.set_font('Arial', '', 9)
-        for item in self.items:
-            pdf.cell(80, 8, item['description'], 1, 0)
-            pdf.cell(25, 8, str(item['quantity']), 1, 0, 'C')
-            pdf.cell(30, 8, f"${item['unit_price']:.2f}", 1, 0, 'R')
-            pdf.cell(30, 8, f"${item['total_price']:.2f}", 1, 1, 'R')
-        
-        # Totals
-        totals = self.calculate_totals()
-        pdf.ln(5)
-        
-        # Right-aligned totals
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(135, 8, 'Subtotal:', 0, 0, 'R')
-        pdf.cell(30, 8, f"${totals['subtotal']:.2f}", 1, 1, 'R')
-        
-        if self.discount > 0:
-            pdf.cell(135, 8, f'Discount ({self.discount}%):', 0, 0, 'R')
-            pdf.cell(30, 8, f"-${totals['discount_amount']:.2f}", 1, 1, 'R')
-        
-        if self.tax_rate > 0:
-            pdf.cell(135, 8, f'Tax ({self.tax_rate}%):', 0, 0, 'R')
-            pdf.cell(30, 8, f"${totals['tax_amount']:.2f}", 1, 1, 'R')
-        
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(135, 10, 'TOTAL:', 0, 0, 'R')
-        pdf.cell(30, 10, f"${totals['total']:.2f}", 1, 1, 'R')
-        
-        # Payment terms
-        if self.payment_terms:
-            pdf.ln(10)
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(0, 8, 'Payment Terms:', 0, 1)
-            pdf.set_font('Arial', '', 10)
-            pdf.cell(0, 6, self.payment_terms, 0, 1)
-        
-        # Footer
-        pdf.ln(10)
-        pdf.set_font('Arial', 'I', 10)
-        pdf.cell(0, 6, 'Thank you for your business!', 0, 1, 'C')
-        
-        # Save PDF
-        filename = f"invoices/invoice_{self.invoice_number}.pdf"
-        pdf.output(filename)
+        Renders are cached by a hash of the invoice data and TEMPLATE_VERSION.
+        A fresh render is written once, into the cache, and the invoice's PDF
+        is hard-linked (or copied) from the cache entry, so regenerating an
+        unchanged invoice never lays it out again.
+        Each phase runs in a ``tracing`` span under ``generate_pdf``.
+        """
+        with span('generate_pdf', invoice_number=self.invoice_number, items=len(self.line_items)) as pdf_span:
+            # Create the invoice's (shard) directory if it doesn't exist
+            with span('mkdir'):
+                filename = InvoicePaths.ensure_parent(InvoicePaths().pdf_path(self.invoice_number))
+
+            cache = self.pdf_cache
+            pdf_bytes = None
+            if cache is not None:
+                cache_key, cached_path = self._cache_lookup(pdf_span, cache)
+                if not cached_path:
+                    pdf_bytes = self._layout_bytes()
+                    with span('cache_store'):
+                        cached_path = cache.put(cache_key, pdf_bytes)
+                try:
+                    with span('write', source='cache'):
+                        link_or_copy(cached_path, filename)
+                    return filename
+                except FileNotFoundError:
+                    # Evicted before it could be linked; write it directly
+                    pass
+
+            if pdf_bytes is None:
+                pdf_bytes = self._layout_bytes()
+            with span('write', bytes=len(pdf_bytes)):
+                atomic_write_bytes(filename, pdf_bytes)
+            return filename
+
+    def render_pdf_bytes(self, use_cache=True):
+        """Render the invoice PDF in memory and return it as bytes
+
+        Nothing is written under invoices/, so previews and ad-hoc emails
+        skip the round trip through the filesystem; call write_pdf() to keep
+        the result. The render cache is still used unless ``use_cache`` is
+        False (worth doing for drafts that are about to change).
+        """
+        with span('render_pdf', invoice_number=self.invoice_number, items=len(self.line_items)) as pdf_span:
+            pdf_bytes, _ = self._render(pdf_span, self.pdf_cache if use_cache else None)
+            return pdf_bytes
+
+    def write_pdf(self, pdf_bytes):
+        """Store already rendered PDF bytes as this invoice's PDF and return the path"""
+        filename = InvoicePaths.ensure_parent(InvoicePaths().pdf_path(self.invoice_number))
+        atomic_write_bytes(filename, pdf_bytes)
         return filename
+
+    def _render(self, pdf_span, cache):
+        """PDF bytes from the render cache or a fresh layout, and whether they were cached"""
+        if cache is not None:
+            cache_key, cached_path = self._cache_lookup(pdf_span, cache)
+            if cached_path:
+                try:
+                    with open(cached_path, 'rb') as f:
+                        return f.read(), True
+                except FileNotFoundError:
+                    # Evicted between lookup and read; render it again
+                    pass
+
+        pdf_bytes = self._layout_bytes()
+        if cache is not None:
+            with span('cache_store'):
+                cache.put(cache_key, pdf_bytes)
+        return pdf_bytes, False
+
+    def _cache_lookup(self, pdf_span, cache):
+        """Cache key of this invoice and the path of its cached PDF (None on a miss)"""
+        with span('cache_lookup'):
+            cache_key = cache.make_key(self.to_dict(), TEMPLATE_VERSION)
+            cached_path = cache.get(cache_key)
+        pdf_span.set_attribute('cache_hit', bool(cached_path))
+        return cache_key, cached_path
+
+    def _layout_bytes(self):
+        """Lay out and serialize the PDF (no cache involved)"""
+        with PDF_RENDER_SECONDS.time():
+            with span('layout'):
+                pdf = self._build_pdf()
+            with span('serialize'):
+                return bytes(pdf.output())
+
+    def _build_pdf(self):
+        """Lay out the invoice and return the FPDF document"""
+        # fpdf is only loaded once something is actually rendered
+        from invoice_layout import get_default_layout
+
+        return get_default_layout().render(self._layout_fields(), self._item_table_rows())
     
-    def save_invoice_data(self):
-        """Save invoice data to JSON file"""
-        data = {
+    def _layout_fields(self):
+        """Values for the ``{field}`` placeholders of the invoice layout"""
+        totals = self.calculate_totals_cents()
+        return {
+            'business_name': self.business_info['name'],
+            'business_address': self.business_info['address'],
+            'business_phone': self.business_info['phone'],
+            'business_email': self.business_info['email'],
+            'client_name': self.client_info['name'],
+            'client_address': self.client_info['address'],
+            'client_phone': self.client_info['phone'],
+            'client_email': self.client_info['email'],
+            'invoice_number': self.invoice_number,
+            'invoice_date': self.invoice_date,
+            'discount': self.discount,
+            'tax_rate': self.tax_rate,
+            'has_discount': self.discount > 0,
+            'has_tax': self.tax_rate > 0,
+            'subtotal': format_cents(totals['subtotal']),
+            'discount_amount': format_cents(totals['discount_amount']),
+            'tax_amount': format_cents(totals['tax_amount']),
+            'total': format_cents(totals['total']),
+            'payment_terms': self.payment_terms
+        }
+    
+    def _item_table_rows(self):
+        progress = self.render_progress
+        total = len(self.line_items)
+        for done, (description, quantity, price_units, line_cents) in enumerate(self.line_items.iter_rows()):
+            if progress is not None and done % PROGRESS_EVERY_ROWS == 0:
+                progress(done, total)
+            yield (description, str(quantity), format_price(price_units), format_cents(line_cents)), line_cents
+    
+    def to_dict(self):
+        """Invoice data as stored in the JSON file"""
+        return {
             'business_info': self.business_info,
             'client_info': self.client_info,
             'invoice_number': self.invoice_number,
             'invoice_date': self.invoice_date,
-            'items': self.items,
+            'items': self.line_items.to_list(),
             'tax_rate': self.tax_rate,
             'discount': self.discount,
             'payment_terms': self.payment_terms,
             'totals': self.calculate_totals()
         }
+    
+    def save_invoice_data(self):
+        """Save invoice data to JSON file
         
-        filename = f"invoices/invoice_{self.invoice_number}.json"
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
-        return filename
+        With INVOICE_STORAGE=ledger the data is appended to the segment
+        ledger instead and the segment path is returned.
+        """
+        with span('save_invoice_data', invoice_number=self.invoice_number):
+            with span('to_dict'):
+                data = self.to_dict()
+            
+            ledger = get_default_ledger()
+            if ledger is not None:
+                with JSON_WRITE_SECONDS.labels(storage='ledger').time(), span('ledger_put'):
+                    stamp = ledger.put(data)
+                filename = ledger.path_for(self.invoice_number)
+            else:
+                with span('mkdir'):
+                    filename = InvoicePaths.ensure_parent(InvoicePaths().json_path(self.invoice_number))
+                with JSON_WRITE_SECONDS.labels(storage='files').time():
+                    with span('serialize'):
+                        text = json.dumps(data, indent=2)
+                    with span('write', bytes=len(text)):
+                        with open(filename, 'w') as f:
+                            f.write(text)
+                stamp = os.path.getmtime(filename)
 
+            # Keep the summary index in step with the source of truth
+            with span('index_upsert'):
+                InvoiceIndex(ledger=ledger).upsert(data, stamp)
+            return filename
 
 def main():
     """Main function to run the invoice generator"""
@@ -3,6 +3,153 @@ from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 import os
 from invoice_generator import InvoiceGenerator
+from item_import import parse_pasted_items, read_items_csv
+from money import LineItemTable, format_cents, format_price
+from render_jobs import FINISHED_STATUSES, RenderJobQueue, render_batch_job, render_invoice_job
+
+# How often the Tk loop checks the background job for progress (milliseconds)
+POLL_INTERVAL_MS = 100
+
+
+def render_batch_file_job(job, payload_path):
+    """Background job for the batch dialog: parse the file, then render every payload"""
+    from batch_renderer import load_payloads
+
+    job.progress('reading file', 0)
+    return render_batch_job(job, list(load_payloads(payload_path)))
+
+
+class VirtualItemList:
+    """Treeview that shows a scrolling window onto a LineItemTable
+    
+    Only the rows that fit on screen exist as Treeview items; scrolling moves
+    the window and rewrites those few rows, so the widget costs the same for
+    ten lines or fifty thousand. Selection is kept as a set of item indices.
+    """
+    
+    COLUMNS = ('Description', 'Quantity', 'Price', 'Total')
+    ROW_HEIGHT = 20
+    # Event.state bits for Shift and Control: clicks with these extend the selection
+    EXTEND_MODIFIERS = 0x0001 | 0x0004
+    HEADER_HEIGHT = 25
+    
+    def __init__(self, parent, line_items, rows=6):
+        self.line_items = line_items
+        self.offset = 0
+        self.rows = rows
+        self.selected = set()
+        
+        self.tree = ttk.Treeview(parent, columns=self.COLUMNS, show='headings', height=rows, selectmode='extended')
+        self.tree.heading('Description', text='Description')
+        self.tree.heading('Quantity', text='Quantity')
+        self.tree.heading('Price', text='Unit Price')
+        self.tree.heading('Total', text='Total')
+        self.tree.column('Description', width=300)
+        self.tree.column('Quantity', width=80)
+        self.tree.column('Price', width=100)
+        self.tree.column('Total', width=100)
+        
+        # The scrollbar drives our offset, not the Treeview's own scrolling
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        # Widget bindings run before the Treeview's own, so a plain click or
+        # arrow key drops off-screen rows before the new selection is reported
+        self.tree.bind('<Button-1>', self._on_plain_select)
+        self.tree.bind('<Up>', self._on_plain_select)
+        self.tree.bind('<Down>', self._on_plain_select)
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<MouseWheel>', lambda event: self._scroll_event(-3 if event.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda event: self._scroll_event(-3))
+        self.tree.bind('<Button-5>', lambda event: self._scroll_event(3))
+        self.tree.bind('<Prior>', lambda event: self._scroll_event(-self.rows))
+        self.tree.bind('<Next>', lambda event: self._scroll_event(self.rows))
+        self.tree.bind('<Control-a>', lambda event: self.select_all() or 'break')
+    
+    def grid(self, row, column):
+        self.tree.grid(row=row, column=column, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=row, column=column + 1, sticky=(tk.N, tk.S))
+    
+    def scroll_to(self, offset):
+        self.offset = min(max(0, int(offset)), max(0, len(self.line_items) - self.rows))
+        self.refresh()
+    
+    def scroll_to_end(self):
+        self.scroll_to(len(self.line_items))
+    
+    def yview(self, *args):
+        """Scrollbar command: ``moveto <fraction>`` or ``scroll <n> units|pages``"""
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * len(self.line_items)))
+        elif args[0] == 'scroll':
+            step = self.rows if args[2] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+    
+    def _scroll_event(self, rows):
+        self.scroll_to(self.offset + rows)
+        return 'break'
+    
+    def _on_resize(self, event):
+        rows = max(1, (event.height - self.HEADER_HEIGHT) // self.ROW_HEIGHT)
+        if rows != self.rows:
+            self.rows = rows
+            self.scroll_to(self.offset)
+    
+    def _on_plain_select(self, event):
+        if event.state & self.EXTEND_MODIFIERS:
+            return
+        if event.type == tk.EventType.ButtonPress and self.tree.identify_region(event.x, event.y) not in ('cell', 'tree'):
+            return
+        self.selected.clear()
+    
+    def hidden_selection(self):
+        """Number of selected items that are scrolled out of view"""
+        visible = range(self.offset, self.offset + len(self.tree.get_children()))
+        return sum(1 for index in self.selected if index not in visible)
+    
+    def _on_select(self, event=None):
+        visible = range(self.offset, self.offset + len(self.tree.get_children()))
+        self.selected.difference_update(visible)
+        self.selected.update(self.offset + int(iid) for iid in self.tree.selection())
+    
+    def select_all(self):
+        self.selected = set(range(len(self.line_items)))
+        self.refresh()
+    
+    def clear_selection(self):
+        self.selected.clear()
+        self.refresh()
+    
+    def refresh(self):
+        """Rewrite the visible rows (Treeview item ids are screen positions)"""
+        tree = self.tree
+        count = max(0, min(self.rows, len(self.line_items) - self.offset))
+        existing = tree.get_children()
+        if len(existing) > count:
+            tree.delete(*existing[count:])
+        
+        line_items = self.line_items
+        for position in range(count):
+            index = self.offset + position
+            values = (line_items.descriptions[index], line_items[index]['quantity'],
+                      format_price(line_items.unit_prices[index]), format_cents(line_items.line_totals[index]))
+            if position < len(existing):
+                tree.item(str(position), values=values)
+            else:
+                tree.insert('', 'end', iid=str(position), values=values)
+        
+        visible = [str(position) for position in range(count) if self.offset + position in self.selected]
+        if visible:
+            tree.selection_set(visible)
+        elif tree.selection():
+            tree.selection_remove(tree.selection())
+        
+        total = len(self.line_items)
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + count) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
 
 class InvoiceGUI:
     def __init__(self, root):
@@ -12,9 +159,15 @@ class InvoiceGUI:
         self.root.configure(bg='#f0f0f0')
         
         self.invoice = InvoiceGenerator()
-        self.items = []
+        self.line_items = LineItemTable()
+        
+        # Rendering and saving run here, never on the Tk event-loop thread
+        self.jobs = RenderJobQueue(max_workers=1)
+        self.active_job = None
+        self.on_job_done = None
         
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def create_widgets(self):
         # Main container
@@ -132,42 +285,61 @@ class InvoiceGUI:
         add_button = ttk.Button(item_input_frame, text="Add Item", command=self.add_item)
         add_button.grid(row=1, column=3, padx=(10, 0), pady=2)
         
-        # Items list
-        self.items_tree = ttk.Treeview(items_frame, columns=('Description', 'Quantity', 'Price', 'Total'), 
-                                      show='headings', height=6)
-        self.items_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        # Items list (virtualized: only the visible rows are Treeview items)
+        self.items_view = VirtualItemList(items_frame, self.line_items)
+        self.items_view.grid(row=1, column=0)
+        self.items_view.tree.bind('<Control-v>', lambda event: self.paste_items() or 'break')
+        
+        # Item list actions
+        item_actions = ttk.Frame(items_frame)
+        item_actions.grid(row=2, column=0, columnspan=2, pady=(5, 0), sticky=(tk.W, tk.E))
         
-        # Configure columns
-        self.items_tree.heading('Description', text='Description')
-        self.items_tree.heading('Quantity', text='Quantity')
-        self.items_tree.heading('Price', text='Unit Price')
-        self.items_tree.heading('Total', text='Total')
+        remove_button = ttk.Button(item_actions, text="Remove Selected", command=self.remove_item)
+        remove_button.pack(side=tk.LEFT)
         
-        self.items_tree.column('Description', width=300)
-        self.items_tree.column('Quantity', width=80)
-        self.items_tree.column('Price', width=100)
-        self.items_tree.column('Total', width=100)
+        paste_button = ttk.Button(item_actions, text="Paste Items", command=self.paste_items)
+        paste_button.pack(side=tk.LEFT, padx=(10, 0))
         
-        # Scrollbar for items list
-        scrollbar = ttk.Scrollbar(items_frame, orient=tk.VERTICAL, command=self.items_tree.yview)
-        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
-        self.items_tree.configure(yscrollcommand=scrollbar.set)
+        import_button = ttk.Button(item_actions, text="Import CSV...", command=self.import_items_csv)
+        import_button.pack(side=tk.LEFT, padx=(10, 0))
         
-        # Remove item button
-        remove_button = ttk.Button(items_frame, text="Remove Selected", command=self.remove_item)
-        remove_button.grid(row=2, column=0, pady=(5, 0), sticky=tk.W)
+        # Running totals, updated from the table's incremental subtotal
+        self.totals_var = tk.StringVar()
+        ttk.Label(item_actions, textvariable=self.totals_var).pack(side=tk.RIGHT)
+        self.tax_rate.bind('<KeyRelease>', lambda event: self.update_totals())
+        self.discount.bind('<KeyRelease>', lambda event: self.update_totals())
+        self.update_totals()
         
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.grid(row=5, column=0, columnspan=2, pady=(10, 0))
         
-        generate_button = ttk.Button(buttons_frame, text="Generate Invoice", 
-                                   command=self.generate_invoice, style='Accent.TButton')
-        generate_button.pack(side=tk.LEFT, padx=(0, 10))
+        self.generate_button = ttk.Button(buttons_frame, text="Generate Invoice", 
+                                          command=self.generate_invoice, style='Accent.TButton')
+        self.generate_button.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.batch_button = ttk.Button(buttons_frame, text="Batch Generate from File...",
+                                       command=self.batch_generate)
+        self.batch_button.pack(side=tk.LEFT, padx=(0, 10))
         
         clear_button = ttk.Button(buttons_frame, text="Clear All", command=self.clear_all)
         clear_button.pack(side=tk.LEFT)
         
+        # Background job progress
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        progress_frame.columnconfigure(0, weight=1)
+        
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_bar = ttk.Progressbar(progress_frame, variable=self.progress_var, maximum=100)
+        self.progress_bar.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        self.cancel_button = ttk.Button(progress_frame, text="Cancel", command=self.cancel_job, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1, padx=(10, 0))
+        
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(progress_frame, textvariable=self.status_var).grid(row=1, column=0, columnspan=2, sticky=tk.W)
+        
         # Configure main frame row weights
         main_frame.rowconfigure(4, weight=1)
         
@@ -182,45 +354,90 @@ class InvoiceGUI:
             return
         
         try:
-            quantity = float(quantity_str)
-            price = float(price_str)
-            total = quantity * price
-            
-            # Add to tree view
-            self.items_tree.insert('', 'end', values=(description, quantity, f"${price:.2f}", f"${total:.2f}"))
-            
-            # Add to items list
-            self.items.append({
-                'description': description,
-                'quantity': quantity,
-                'unit_price': price,
-                'total_price': total
-            })
-            
-            # Clear input fields
-            self.item_description.delete(0, tk.END)
-            self.item_quantity.delete(0, tk.END)
-            self.item_price.delete(0, tk.END)
-            
+            self.line_items.append(description, quantity_str, price_str)
         except ValueError:
             messagebox.showerror("Error", "Quantity and Price must be valid numbers")
+            return
+        
+        self.items_changed(scroll_to_end=True)
+        
+        # Clear input fields
+        self.item_description.delete(0, tk.END)
+        self.item_quantity.delete(0, tk.END)
+        self.item_price.delete(0, tk.END)
     
     def remove_item(self):
-        """Remove selected item from the list"""
-        selected = self.items_tree.selection()
-        if not selected:
+        """Remove the selected items from the list"""
+        if not self.items_view.selected:
             messagebox.showwarning("Warning", "Please select an item to remove")
             return
         
-        # Get the index of the selected item
-        index = self.items_tree.index(selected[0])
-        
-        # Remove from tree view
-        self.items_tree.delete(selected[0])
+        hidden = self.items_view.hidden_selection()
+        if hidden and not messagebox.askyesno(
+                "Remove Items",
+                f"Remove {len(self.items_view.selected)} selected items, "
+                f"including {hidden} that are not currently visible?"):
+            return
         
-        # Remove from items list
-        if 0 <= index < len(self.items):
-            self.items.pop(index)
+        self.line_items.remove_many(self.items_view.selected)
+        self.items_view.selected.clear()
+        self.items_changed()
+    
+    def paste_items(self):
+        """Append items copied from a spreadsheet (tab-separated) or as CSV text"""
+        try:
+            text = self.root.clipboard_get()
+        except tk.TclError:
+            messagebox.showwarning("Warning", "The clipboard is empty")
+            return
+        self.add_parsed_items(*parse_pasted_items(text), source="clipboard")
+    
+    def import_items_csv(self):
+        """Append items from a CSV file (description, quantity, unit price)"""
+        path = filedialog.askopenfilename(title="Import Items",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            items, errors = read_items_csv(path)
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Error", f"Could not read {path}: {str(e)}")
+            return
+        self.add_parsed_items(items, errors, source=os.path.basename(path))
+    
+    def add_parsed_items(self, items, errors, source):
+        self.line_items.extend(items)
+        self.items_changed(scroll_to_end=True)
+        
+        if errors:
+            lines = [f"Line {line_number}: {message}" for line_number, message in errors[:10]]
+            if len(errors) > 10:
+                lines.append(f"... and {len(errors) - 10} more")
+            messagebox.showwarning("Some lines were skipped",
+                                   f"Added {len(items)} items from {source}; skipped {len(errors)}:\n\n"
+                                   + "\n".join(lines))
+        elif not items:
+            messagebox.showwarning("Warning", f"No items found in {source}")
+    
+    def items_changed(self, scroll_to_end=False):
+        if scroll_to_end:
+            self.items_view.scroll_to_end()
+        else:
+            self.items_view.scroll_to(self.items_view.offset)
+        self.update_totals()
+    
+    def update_totals(self):
+        """Show the running totals; O(1) because the table keeps its subtotal"""
+        try:
+            tax_rate = float(self.tax_rate.get() or "0")
+            discount = float(self.discount.get() or "0")
+        except ValueError:
+            tax_rate = discount = 0
+        totals = self.line_items.totals_cents(tax_rate, discount)
+        self.totals_var.set(
+            f"{len(self.line_items)} items   Subtotal {format_cents(totals['subtotal'])}   "
+            f"Tax {format_cents(totals['tax_amount'])}   Total {format_cents(totals['total'])}"
+        )
     
     def generate_invoice(self):
         """Generate the invoice PDF"""
@@ -237,7 +454,7 @@ class InvoiceGUI:
             messagebox.showerror("Error", "Invoice number is required")
             return
         
-        if not self.items:
+        if not len(self.line_items):
             messagebox.showerror("Error", "Please add at least one item")
             return
         
@@ -270,26 +487,120 @@ class InvoiceGUI:
                 self.payment_terms.get()
             )
             
-            # Add items
-            self.invoice.items = self.items.copy()
-            
-            # Generate PDF
-            pdf_filename = self.invoice.generate_pdf()
-            json_filename = self.invoice.save_invoice_data()
-            
-            # Show success message
-            totals = self.invoice.calculate_totals()
-            message = f"Invoice generated successfully!\n\n"
-            message += f"PDF: {pdf_filename}\n"
-            message += f"Data: {json_filename}\n\n"
-            message += f"Total Amount: ${totals['total']:.2f}"
-            
-            messagebox.showinfo("Success", message)
+            # Hand the worker its own copy so the list can keep being edited
+            self.invoice.line_items = self.line_items.snapshot()
             
         except ValueError as e:
             messagebox.showerror("Error", f"Please enter valid numbers for tax rate and discount: {str(e)}")
+            return
         except Exception as e:
             messagebox.showerror("Error", f"Failed to generate invoice: {str(e)}")
+            return
+
+        # Render and save in the background; the next Generate gets a fresh invoice
+        invoice, self.invoice = self.invoice, InvoiceGenerator()
+        self.run_in_background(render_invoice_job, invoice, description=f"Invoice {invoice.invoice_number}",
+                               on_done=self.invoice_done)
+    
+    def invoice_done(self, job):
+        """Results callback for generate_invoice (runs on the Tk thread)"""
+        if job['status'] == 'succeeded':
+            result = job['result']
+            message = f"Invoice generated successfully!\n\n"
+            message += f"PDF: {result['pdf_filename']}\n"
+            message += f"Data: {result['json_filename']}\n\n"
+            message += f"Total Amount: ${result['totals']['total']:.2f}"
+            messagebox.showinfo("Success", message)
+        elif job['status'] == 'failed':
+            messagebox.showerror("Error", f"Failed to generate invoice: {job['error']}")
+    
+    def batch_generate(self):
+        """Pick a JSON / JSON Lines payload file and render it in the background"""
+        payload_path = filedialog.askopenfilename(
+            title="Batch Generate Invoices",
+            filetypes=[("Invoice payloads", "*.json *.jsonl *.ndjson"), ("All files", "*.*")]
+        )
+        if not payload_path:
+            return
+        
+        self.run_in_background(render_batch_file_job, payload_path,
+                               description=f"Batch {os.path.basename(payload_path)}", on_done=self.batch_done)
+    
+    def batch_done(self, job):
+        """Results callback for batch_generate (runs on the Tk thread)"""
+        if job['status'] == 'failed':
+            messagebox.showerror("Error", f"Batch generation failed: {job['error']}")
+        elif job['status'] == 'succeeded':
+            report = job['result']
+            message = f"Invoices processed: {report['total']}\n"
+            message += f"Succeeded: {report['succeeded']}\nFailed: {report['failed']}\n"
+            message += f"Elapsed: {report['elapsed_seconds']:.2f}s"
+            for failure in report['failures'][:10]:
+                message += f"\n❌ {failure['invoice_number'] or '(no number)'}: {failure['error']}"
+            if report['failed']:
+                messagebox.showwarning("Batch Finished", message)
+            else:
+                messagebox.showinfo("Batch Finished", message)
+    
+    # Background jobs
+    
+    def run_in_background(self, func, *args, description=None, on_done=None):
+        """Run ``func(job, *args)`` on the job queue and follow it from the Tk loop
+        
+        ``on_done(job)`` receives the final job snapshot through ``root.after``,
+        so it may touch widgets. Only one job runs at a time.
+        """
+        if self.active_job is not None:
+            messagebox.showwarning("Busy", "Please wait for the current job to finish or cancel it")
+            return None
+        
+        job = self.jobs.submit(func, *args, description=description)
+        self.active_job = job['id']
+        self.on_job_done = on_done
+        self.progress_var.set(0)
+        self.status_var.set(f"{description or 'Job'}: queued")
+        self.set_busy(True)
+        self.root.after(POLL_INTERVAL_MS, self.poll_job)
+        return job['id']
+    
+    def poll_job(self):
+        """Mirror the active job's progress into the widgets until it finishes"""
+        if self.active_job is None:
+            return
+        job = self.jobs.get(self.active_job)
+        if job is None:
+            job = {'status': 'failed', 'error': "Job was lost", 'description': None}
+        
+        label = job.get('description') or 'Job'
+        if job['status'] not in FINISHED_STATUSES:
+            self.progress_var.set(job['progress'])
+            self.status_var.set(f"{label}: {job['stage']} ({job['progress']}%)")
+            self.root.after(POLL_INTERVAL_MS, self.poll_job)
+            return
+        
+        self.active_job = None
+        on_done, self.on_job_done = self.on_job_done, None
+        self.set_busy(False)
+        self.progress_var.set(100 if job['status'] == 'succeeded' else 0)
+        self.status_var.set(f"{label}: {job['status']}")
+        if on_done is not None:
+            on_done(job)
+    
+    def cancel_job(self):
+        if self.active_job is not None and self.jobs.cancel(self.active_job):
+            self.status_var.set("Cancelling...")
+            self.cancel_button.configure(state=tk.DISABLED)
+    
+    def set_busy(self, busy):
+        self.generate_button.configure(state=tk.DISABLED if busy else tk.NORMAL)
+        self.batch_button.configure(state=tk.DISABLED if busy else tk.NORMAL)
+        self.cancel_button.configure(state=tk.NORMAL if busy else tk.DISABLED)
+    
+    def on_close(self):
+        if self.active_job is not None:
+            self.jobs.cancel(self.active_job)
+        self.jobs.shutdown(wait=False)
+        self.root.destroy()
     
     def clear_all(self):
         """Clear all fields"""
@@ -321,8 +632,9 @@ class InvoiceGUI:
         self.item_price.delete(0, tk.END)
         
         # Clear items list
-        self.items_tree.delete(*self.items_tree.get_children())
-        self.items.clear()
+        self.line_items.clear()
+        self.items_view.selected.clear()
+        self.items_changed()
 
 
 def main():
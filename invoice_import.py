@@ -0,0 +1,454 @@
+import csv
+import itertools
+import json
+import os
+import time
+
+from pdf_cache import atomic_write_bytes
+
+# Invoice-level columns (same names as the /api/create-invoice payload)
+INVOICE_FIELDS = [
+    'invoice_number', 'invoice_date', 'tax_rate', 'discount', 'payment_terms',
+    'business_name', 'business_address', 'business_phone', 'business_email',
+    'client_name', 'client_address', 'client_phone', 'client_email'
+]
+
+# Per-row line item columns
+ITEM_FIELDS = ['description', 'quantity', 'unit_price']
+
+REQUIRED_FIELDS = ['business_name', 'client_name', 'invoice_number']
+
+FORMATS = ('csv', 'ndjson')
+
+
+def detect_format(path):
+    return 'ndjson' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def iter_source_rows(path, source_format=None):
+    """Yield ``(row_number, row_dict, error)`` for each data row, streaming
+
+    CSV rows are numbered from 1 after the header; NDJSON rows by line.
+    A row that cannot be parsed comes back as ``(n, {'raw': line}, error)``.
+    """
+    source_format = source_format or detect_format(path)
+    if source_format == 'csv':
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row_number, row in enumerate(csv.DictReader(f), 1):
+                yield row_number, row, None
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            for row_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield row_number, {'raw': line.rstrip('\n')}, f"Invalid JSON: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield row_number, {'raw': line.rstrip('\n')}, "Each line must be a JSON object"
+                    continue
+                yield row_number, row, None
+
+
+class RowGroup:
+    """The source rows of one invoice, plus the payload built from them"""
+
+    __slots__ = ('seq', 'invoice_number', 'rows', 'payload', 'error', 'done')
+
+    def __init__(self, seq, invoice_number):
+        self.seq = seq
+        self.invoice_number = invoice_number
+        self.rows = []
+        self.payload = None
+        self.error = None
+        # Rendered or rejected; the checkpoint can move past it
+        self.done = False
+
+    @property
+    def last_row(self):
+        return self.rows[-1][0]
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def build_payload(rows, defaults):
+    """Invoice payload from grouped rows; invoice fields come from the first row"""
+    first = rows[0][1]
+    payload = {field: value for field, value in defaults.items() if not _blank(value)}
+    payload.update({field: first[field] for field in INVOICE_FIELDS if not _blank(first.get(field))})
+    if isinstance(first.get('items'), list):
+        # NDJSON line that is already a whole invoice
+        payload['items'] = first['items']
+    else:
+        payload['items'] = [{field: row.get(field) for field in ITEM_FIELDS} for _, row, _ in rows]
+    payload['invoice_number'] = str(payload.get('invoice_number', '')).strip()
+    return payload
+
+
+def iter_groups(rows, defaults=None, seen=None):
+    """Group consecutive rows with the same invoice number into RowGroups
+
+    Rows of one invoice must be adjacent (as in a sorted order export) so
+    only the current invoice is held in memory. An invoice number that shows
+    up again after another invoice is rejected rather than merged. ``seen``
+    holds the numbers of invoices before a resumed checkpoint, so repeats of
+    those are rejected too; it is updated in place.
+    """
+    defaults = defaults or {}
+    seen = set() if seen is None else seen
+    group = None
+    seq = 0
+
+    def finish(group):
+        if group.error is None:
+            group.payload = build_payload(group.rows, defaults)
+        seen.add(group.invoice_number)
+        return group
+
+    for row_number, row, error in rows:
+        invoice_number = '' if error else str(row.get('invoice_number') or '').strip()
+        whole_invoice = not error and isinstance(row.get('items'), list)
+        if group is not None and (error or whole_invoice or invoice_number != group.invoice_number):
+            yield finish(group)
+            group = None
+
+        if group is None:
+            group = RowGroup(seq, invoice_number)
+            seq += 1
+            if error:
+                group.error = error
+            elif not invoice_number:
+                group.error = "invoice_number is required"
+            elif invoice_number in seen:
+                group.error = f"Rows for invoice {invoice_number} must be adjacent; it appeared earlier"
+        group.rows.append((row_number, row, error))
+
+    if group is not None:
+        yield finish(group)
+
+
+def validate_payload(payload):
+    """Error message for a payload /api/create-invoice would refuse, else None"""
+    from invoice_generator import InvoiceGenerator
+
+    for field in REQUIRED_FIELDS:
+        if _blank(payload.get(field)):
+            return f"{field} is required"
+    if not payload.get('items'):
+        return "At least one item is required"
+    for number, item in enumerate(payload['items'], 1):
+        if not isinstance(item, dict) or _blank(item.get('description')):
+            return f"Item {number}: description is required"
+    try:
+        InvoiceGenerator.from_payload(payload)
+    except (ValueError, KeyError, TypeError) as e:
+        return f"Invalid invoice data: {e}"
+    return None
+
+
+def validate_batch(groups):
+    """Validate a batch of groups in place (sets ``group.error``)"""
+    for group in groups:
+        if group.error is None:
+            group.error = validate_payload(group.payload)
+    return groups
+
+
+class RejectWriter:
+    """Bad rows with their error, as CSV (CSV sources) or NDJSON
+
+    The file is only appended to as the checkpoint advances, so on resume it
+    is truncated back to the offset recorded in the checkpoint.
+    """
+
+    def __init__(self, path, source_format, offset=0):
+        self.path = path
+        self.source_format = source_format
+        self.fieldnames = None
+        mode = 'r+' if offset and os.path.exists(path) else 'w'
+        self._file = open(path, mode, encoding='utf-8', newline='')
+        self._file.seek(offset)
+        self._file.truncate()
+        self._writer = None
+
+    def write(self, row_number, row, error):
+        if self.source_format == 'ndjson':
+            self._file.write(json.dumps({'row': row_number, 'error': error, 'data': row}, ensure_ascii=False) + '\n')
+            return
+        if self._writer is None:
+            self.fieldnames = ['reject_row', 'reject_error'] + [name for name in row if name is not None]
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+            if self._file.tell() == 0:
+                self._writer.writeheader()
+        self._writer.writerow({**row, 'reject_row': row_number, 'reject_error': error})
+
+    def offset(self):
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class SeenInvoiceLog:
+    """Invoice numbers of the rows behind the checkpoint, one JSON string per line
+
+    Like the reject file it is append-only and truncated back to the offset
+    recorded in the checkpoint on resume; the numbers up to that offset are
+    read back into ``numbers``.
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.numbers = set()
+        if offset and os.path.exists(path):
+            self._file = open(path, 'r+b')
+            self.numbers.update(json.loads(line) for line in self._file.read(offset).splitlines())
+        else:
+            self._file = open(path, 'wb')
+        self._file.seek(offset)
+        self._file.truncate()
+
+    def add(self, invoice_number):
+        self._file.write(json.dumps(invoice_number, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    def offset(self):
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class InvoiceImporter:
+    """Stream invoices from a CSV / NDJSON order export into PDFs and storage
+
+    Rows are read lazily, grouped into invoices, validated ``batch_size``
+    invoices at a time and handed to ``BatchRenderer`` (at most
+    ``max_in_flight`` invoices queued across ``workers`` processes), so memory
+    stays bounded however large the export is. Invalid invoices and failed
+    renders go to the reject file with the reason.
+
+    Progress is checkpointed every ``checkpoint_every`` invoices: the
+    checkpoint holds the last source row before which every invoice is
+    finished (rendered or rejected). Re-running with the same checkpoint
+    skips those rows; invoices after it may be rendered again, which simply
+    overwrites their files. The invoice numbers behind the checkpoint are
+    kept in ``seen_path``, so a number repeated later in the source is
+    still rejected after a resume instead of overwriting the earlier invoice.
+    """
+
+    def __init__(self, source_path, reject_path=None, checkpoint_path=None, defaults=None,
+                 source_format=None, workers=None, max_in_flight=None, batch_size=500,
+                 checkpoint_every=100, save_json=True, seen_path=None):
+        self.source_path = source_path
+        self.source_format = source_format or detect_format(source_path)
+        if self.source_format not in FORMATS:
+            raise ValueError(f"Unknown format: {self.source_format}")
+        extension = 'csv' if self.source_format == 'csv' else 'ndjson'
+        self.reject_path = reject_path or f"{source_path}.rejects.{extension}"
+        self.checkpoint_path = checkpoint_path or f"{source_path}.checkpoint.json"
+        self.seen_path = seen_path or f"{source_path}.seen.jsonl"
+        self.defaults = defaults or {}
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.save_json = save_json
+
+    def _fingerprint(self):
+        stat = os.stat(self.source_path)
+        return {'source': os.path.abspath(self.source_path), 'source_size': stat.st_size,
+                'source_mtime': stat.st_mtime}
+
+    def load_checkpoint(self):
+        """Saved state for this source, or None; raises ValueError if the source changed"""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        fingerprint = self._fingerprint()
+        if any(state.get(key) != value for key, value in fingerprint.items()):
+            raise ValueError(f"{self.source_path} changed since checkpoint {self.checkpoint_path}; "
+                             f"remove it (or restart) to import from the beginning")
+        return state
+
+    def _save_checkpoint(self, complete=False):
+        state = {
+            **self._fingerprint(),
+            'rows_done': self.rows_done,
+            'invoices_imported': self.imported,
+            'invoices_rejected': self.rejected_invoices,
+            'rows_rejected': self.rejected_rows,
+            'reject_offset': self.rejects.offset(),
+            'seen_offset': self.seen.offset(),
+            'complete': complete,
+            'updated_at': time.time()
+        }
+        atomic_write_bytes(self.checkpoint_path, json.dumps(state, indent=2).encode('utf-8'))
+        return state
+
+    def run(self, restart=False, progress_callback=None):
+        """Import the source; returns a summary dict
+
+        ``progress_callback(summary)`` is called after every checkpoint.
+        """
+        from batch_renderer import BatchRenderer
+
+        state = None if restart else self.load_checkpoint()
+        started = time.perf_counter()
+        self.rows_done = state['rows_done'] if state else 0
+        self.imported = state['invoices_imported'] if state else 0
+        self.rejected_invoices = state['invoices_rejected'] if state else 0
+        self.rejected_rows = state['rows_rejected'] if state else 0
+        resumed_from = self.rows_done
+        self.rejects = RejectWriter(self.reject_path, self.source_format, state['reject_offset'] if state else 0)
+        self.seen = SeenInvoiceLog(self.seen_path, state.get('seen_offset', 0) if state else 0)
+        self._progress_callback = progress_callback
+        self._pending = {}
+        self._in_flight = {}
+        self._next_seq = 0
+        self._since_checkpoint = 0
+
+        try:
+            renderer = BatchRenderer(max_workers=self.workers, max_in_flight=self.max_in_flight,
+                                     save_json=self.save_json)
+            report = renderer.render(self._payloads(), progress_callback=self._on_result)
+            self._advance()
+            state = self._save_checkpoint(complete=True)
+        finally:
+            self.rejects.close()
+            self.seen.close()
+
+        return {
+            'rows_done': self.rows_done,
+            'resumed_from_row': resumed_from,
+            'invoices_imported': self.imported,
+            'invoices_rejected': self.rejected_invoices,
+            'rows_rejected': self.rejected_rows,
+            'reject_path': self.reject_path if self.rejected_rows else None,
+            'checkpoint_path': self.checkpoint_path,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+            'render': report.to_dict()
+        }
+
+    def _payloads(self):
+        """Valid payloads for the renderer; rejected groups are settled on the way"""
+        rows = (row for row in iter_source_rows(self.source_path, self.source_format) if row[0] > self.rows_done)
+        groups = iter_groups(rows, self.defaults, seen=self.seen.numbers)
+        while True:
+            batch = list(itertools.islice(groups, self.batch_size))
+            if not batch:
+                return
+            for group in validate_batch(batch):
+                self._pending[group.seq] = group
+                if group.error:
+                    self._settle(group, group.error)
+                else:
+                    self._in_flight[group.invoice_number] = group
+                    yield group.payload
+            self._advance()
+
+    def _on_result(self, result, report):
+        group = self._in_flight.pop(str(result['invoice_number']), None)
+        if group is not None:
+            self._settle(group, None if result['success'] else result['error'])
+            self._advance()
+
+    def _settle(self, group, error):
+        group.error = error
+        group.payload = None
+        group.done = True
+
+    def _advance(self):
+        """Move the checkpoint past every finished invoice at the front of the queue"""
+        while self._next_seq in self._pending and self._pending[self._next_seq].done:
+            group = self._pending.pop(self._next_seq)
+            self._next_seq += 1
+            if group.invoice_number:
+                self.seen.add(group.invoice_number)
+            if group.error:
+                self.rejected_invoices += 1
+                for row_number, row, _ in group.rows:
+                    self.rejects.write(row_number, row, group.error)
+                    self.rejected_rows += 1
+            else:
+                self.imported += 1
+            self.rows_done = group.last_row
+            self._since_checkpoint += 1
+
+        if self._since_checkpoint >= self.checkpoint_every:
+            self._since_checkpoint = 0
+            state = self._save_checkpoint()
+            if self._progress_callback:
+                self._progress_callback(state)
+
+
+def _parse_args(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="invoice_import.py",
+                                     description="Import invoices from a CSV or NDJSON order export")
+    add_import_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def add_import_arguments(parser):
+    """Arguments shared by ``python invoice_import.py`` and ``python main.py import``"""
+    parser.add_argument("source", help="CSV or NDJSON (.jsonl/.ndjson) file, one line item per row")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Source format (default: from extension)")
+    parser.add_argument("--rejects", default=None, help="Reject file (default: <source>.rejects.csv/.ndjson)")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <source>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum queued invoices")
+    parser.add_argument("--batch-size", type=int, default=500, help="Invoices validated per batch")
+    parser.add_argument("--defaults", default=None,
+                        help="JSON file with default invoice fields, e.g. the business_* details")
+    for field in ('business_name', 'business_address', 'business_phone', 'business_email'):
+        parser.add_argument(f"--{field.replace('_', '-')}", dest=field, default=None,
+                            help=f"Default {field.replace('_', ' ')} for rows without one")
+
+
+def run_import(args):
+    """Run an import from parsed arguments and print a summary; returns an exit status"""
+    defaults = {}
+    if args.defaults:
+        with open(args.defaults, 'r', encoding='utf-8') as f:
+            defaults.update(json.load(f))
+    for field in ('business_name', 'business_address', 'business_phone', 'business_email'):
+        if getattr(args, field):
+            defaults[field] = getattr(args, field)
+
+    importer = InvoiceImporter(args.source, reject_path=args.rejects, checkpoint_path=args.checkpoint,
+                               defaults=defaults, source_format=args.format, workers=args.workers,
+                               max_in_flight=args.max_in_flight, batch_size=args.batch_size)
+
+    def progress(state):
+        print(f"   row {state['rows_done']}: {state['invoices_imported']} imported, "
+              f"{state['invoices_rejected']} rejected")
+
+    print(f"🔄 Importing invoices from {args.source}...")
+    try:
+        summary = importer.run(restart=args.restart, progress_callback=progress)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    if summary['resumed_from_row']:
+        print(f"↪️ Resumed after row {summary['resumed_from_row']}")
+    print(f"✅ {summary['invoices_imported']} invoices imported, {summary['invoices_rejected']} rejected "
+          f"({summary['rows_rejected']} rows) in {summary['elapsed_seconds']:.1f}s")
+    if summary['reject_path']:
+        print(f"⚠️ Rejected rows written to {summary['reject_path']}")
+    return 1 if summary['invoices_rejected'] else 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(run_import(_parse_args(sys.argv[1:])))
@@ -0,0 +1,397 @@
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from invoice_analytics import REPORTS, InvoiceAnalytics
+from invoice_ledger import get_default_ledger
+from invoice_loader import iter_load
+from invoice_paths import InvoicePaths
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+SCAN_SECONDS = histogram('invoice_directory_scan_seconds', "Time to list the invoice JSON files on disk")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_number TEXT PRIMARY KEY,
+    invoice_date TEXT,
+    client_name TEXT,
+    client_address TEXT,
+    business_name TEXT,
+    subtotal REAL,
+    discount_amount REAL,
+    tax_amount REAL,
+    total REAL,
+    tax_rate REAL,
+    discount REAL,
+    payment_terms TEXT,
+    items_count INTEGER,
+    json_mtime REAL
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_date_number ON invoices (invoice_date, invoice_number);
+CREATE INDEX IF NOT EXISTS idx_invoices_client_nocase ON invoices (client_name COLLATE NOCASE, invoice_number);
+CREATE INDEX IF NOT EXISTS idx_invoices_total_number ON invoices (total, invoice_number);
+"""
+
+# Public sort keys for list queries -> indexed column
+SORT_COLUMNS = {
+    'number': 'invoice_number',
+    'date': 'invoice_date',
+    'client': 'client_name COLLATE NOCASE',
+    'total': 'total'
+}
+
+MAX_PAGE_SIZE = 500
+
+COLUMNS = [
+    'invoice_number', 'invoice_date', 'client_name', 'client_address', 'business_name',
+    'subtotal', 'discount_amount', 'tax_amount', 'total', 'tax_rate', 'discount',
+    'payment_terms', 'items_count', 'json_mtime'
+]
+
+
+class InvoiceIndex:
+    """SQLite index of invoice summary columns
+
+    The ``invoice_<n>.json`` files (or the segment ledger when
+    INVOICE_STORAGE=ledger) remain the source of truth; the index only caches
+    the fields list and summary views need so they never have to open and
+    parse individual invoices. It can always be rebuilt from that source.
+    The ``json_mtime`` column holds the file mtime, or the record stamp for
+    ledger storage.
+    """
+
+    _synced = set()
+    _sync_lock = threading.Lock()
+    # Databases whose schema this process has already created
+    _schema_ready = set()
+
+    def __init__(self, invoices_dir="invoices", db_path=None, ledger=None):
+        self.invoices_dir = invoices_dir
+        self.db_path = db_path or os.path.join(invoices_dir, "index.sqlite3")
+        self.ledger = ledger if ledger is not None else get_default_ledger(invoices_dir)
+        self.analytics = InvoiceAnalytics()
+
+    def _connect(self):
+        """Open the database, creating its schema on the first connection of this process
+
+        A database file that disappeared meanwhile (e.g. a deleted
+        invoices/ directory) gets its schema again.
+        """
+        key = os.path.abspath(self.db_path)
+        create = key not in InvoiceIndex._schema_ready or not os.path.exists(self.db_path)
+        if create:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if create:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self.analytics.create_schema(conn)
+            InvoiceIndex._schema_ready.add(key)
+        return conn
+
+    @staticmethod
+    def _row_to_summary(row):
+        return {
+            'number': row['invoice_number'],
+            'date': row['invoice_date'],
+            'client': row['client_name'],
+            'total': row['total'],
+            'items_count': row['items_count']
+        }
+
+    @staticmethod
+    def encode_cursor(sort_value, invoice_number):
+        raw = json.dumps([sort_value, invoice_number]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            sort_value, invoice_number = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+        return sort_value, invoice_number
+
+    @staticmethod
+    def summary_from_data(invoice_data, json_mtime=None):
+        """Extract the indexed columns from a full invoice dict"""
+        totals = invoice_data.get('totals', {})
+        client_info = invoice_data.get('client_info', {})
+        return {
+            'invoice_number': str(invoice_data['invoice_number']),
+            'invoice_date': invoice_data.get('invoice_date', ''),
+            'client_name': client_info.get('name', ''),
+            'client_address': client_info.get('address', ''),
+            'business_name': invoice_data.get('business_info', {}).get('name', ''),
+            'subtotal': totals.get('subtotal', 0.0),
+            'discount_amount': totals.get('discount_amount', 0.0),
+            'tax_amount': totals.get('tax_amount', 0.0),
+            'total': totals.get('total', 0.0),
+            'tax_rate': invoice_data.get('tax_rate', 0.0),
+            'discount': invoice_data.get('discount', 0.0),
+            'payment_terms': invoice_data.get('payment_terms', ''),
+            'items_count': len(invoice_data.get('items', [])),
+            'json_mtime': json_mtime,
+            # Not an index column; only used by the analytics aggregates
+            'paid_date': invoice_data.get('paid_date')
+        }
+
+    def upsert(self, invoice_data, json_mtime=None):
+        """Insert or update the summary row for one invoice"""
+        self.upsert_many([self.summary_from_data(invoice_data, json_mtime)])
+
+    def upsert_many(self, summaries):
+        """Write summary rows and update the analytics aggregates in one transaction"""
+        summaries = list(summaries)
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO invoices ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                    ([summary[column] for column in COLUMNS] for summary in summaries)
+                )
+                self.analytics.record(conn, summaries)
+        finally:
+            conn.close()
+
+    def remove(self, invoice_number):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM invoices WHERE invoice_number = ?", (str(invoice_number),))
+                self.analytics.forget(conn, [invoice_number])
+        finally:
+            conn.close()
+
+    def _scan_json_files(self):
+        """Map invoice number -> (path, mtime) for every JSON file on disk, flat or sharded"""
+        found = {}
+        with SCAN_SECONDS.time():
+            for invoice_number, entry in InvoicePaths(self.invoices_dir).iter_invoice_files('json'):
+                found[invoice_number] = (entry.path, entry.stat().st_mtime)
+        return found
+
+    def sync(self):
+        """Bring the index in line with the JSON files on disk (or the ledger)
+
+        Only files that are new or whose mtime changed are parsed; rows for
+        deleted files are dropped. Returns the number of rows updated.
+        """
+        if self.ledger is not None:
+            on_disk = self.ledger.stamps()
+        else:
+            files = self._scan_json_files()
+            on_disk = {number: mtime for number, (_, mtime) in files.items()}
+
+        conn = self._connect()
+        try:
+            indexed = {
+                row['invoice_number']: row['json_mtime']
+                for row in conn.execute("SELECT invoice_number, json_mtime FROM invoices")
+            }
+            stale = [number for number in indexed if number not in on_disk]
+            if stale:
+                with conn:
+                    conn.executemany("DELETE FROM invoices WHERE invoice_number = ?",
+                                     ((number,) for number in stale))
+                    self.analytics.forget(conn, stale)
+        finally:
+            conn.close()
+
+        changed = [number for number, mtime in on_disk.items() if indexed.get(number) != mtime]
+
+        summaries = []
+        if self.ledger is not None:
+            # Changed records are read segment by segment, in offset order
+            for number, invoice_data in self.ledger.iter_items(changed):
+                summaries.append(self.summary_from_data(invoice_data, on_disk[number]))
+        else:
+            # Parse changed files on a thread pool; a cold index build reads every file
+            mtimes = {files[number][0]: on_disk[number] for number in changed}
+            for path, summary in iter_load(mtimes, extract=self.summary_from_data, with_paths=True):
+                summary['json_mtime'] = mtimes[path]
+                summaries.append(summary)
+
+        if summaries:
+            self.upsert_many(summaries)
+
+        # Indexes created before the analytics tables existed
+        conn = self._connect()
+        try:
+            self.analytics.backfill(conn)
+        finally:
+            conn.close()
+        return len(summaries)
+
+    def rebuild(self):
+        """Drop every row and re-index all JSON files"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM invoices")
+                self.analytics.clear(conn)
+        finally:
+            conn.close()
+        return self.sync()
+
+    def ensure_synced(self):
+        """Sync with the directory once per process; saves keep it current after that"""
+        key = os.path.abspath(self.db_path)
+        if key in InvoiceIndex._synced:
+            return
+        with InvoiceIndex._sync_lock:
+            if key not in InvoiceIndex._synced:
+                self.sync()
+                InvoiceIndex._synced.add(key)
+
+    def get_invoice_numbers(self):
+        self.ensure_synced()
+        conn = self._connect()
+        try:
+            return [row[0] for row in conn.execute(
+                "SELECT invoice_number FROM invoices ORDER BY invoice_number"
+            )]
+        finally:
+            conn.close()
+
+    def get_summaries(self):
+        """Summary rows for list views, in the shape the web UI expects"""
+        self.ensure_synced()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT invoice_number, invoice_date, client_name, total, items_count "
+                "FROM invoices ORDER BY invoice_number"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return [self._row_to_summary(row) for row in rows]
+
+    def query_summaries(self, search=None, client=None, date_from=None, date_to=None,
+                        min_total=None, max_total=None, sort='date', order='desc',
+                        limit=50, cursor=None, offset=0, include_total=True):
+        """Return one page of filtered, sorted summaries
+
+        Pages are addressed either by ``offset`` or, preferably, by the opaque
+        ``cursor`` returned with the previous page (keyset pagination, so deep
+        pages cost the same as the first one). Returns a dict with
+        ``invoices``, ``next_cursor`` and, when ``include_total``, ``total``.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Invalid sort field: {sort}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Invalid sort order: {order}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+
+        where = []
+        params = []
+        if search:
+            where.append("(invoice_number LIKE ? ESCAPE '\\' OR client_name LIKE ? ESCAPE '\\')")
+            pattern = '%' + self._escape_like(search) + '%'
+            params.extend([pattern, pattern])
+        if client:
+            # Prefix match so the NOCASE client index can be used
+            where.append("client_name LIKE ? ESCAPE '\\'")
+            params.append(self._escape_like(client) + '%')
+        if date_from:
+            where.append("invoice_date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("invoice_date <= ?")
+            params.append(date_to)
+        if min_total is not None:
+            where.append("total >= ?")
+            params.append(float(min_total))
+        if max_total is not None:
+            where.append("total <= ?")
+            params.append(float(max_total))
+
+        sort_column = SORT_COLUMNS[sort]
+        direction = 'DESC' if order == 'desc' else 'ASC'
+        page_where = list(where)
+        page_params = list(params)
+
+        if cursor:
+            sort_value, last_number = self.decode_cursor(cursor)
+            comparison = '<' if order == 'desc' else '>'
+            if sort == 'number':
+                page_where.append(f"invoice_number {comparison} ?")
+                page_params.append(last_number)
+            else:
+                page_where.append(f"({sort_column}, invoice_number) {comparison} (?, ?)")
+                page_params.extend([sort_value, last_number])
+            offset = 0
+
+        order_by = f"{sort_column} {direction}"
+        if sort != 'number':
+            order_by += f", invoice_number {direction}"
+
+        sql = "SELECT invoice_number, invoice_date, client_name, total, items_count FROM invoices"
+        if page_where:
+            sql += " WHERE " + " AND ".join(page_where)
+        sql += f" ORDER BY {order_by} LIMIT ? OFFSET ?"
+
+        self.ensure_synced()
+        conn = self._connect()
+        try:
+            # Fetch one extra row to know whether another page exists
+            rows = conn.execute(sql, page_params + [limit + 1, offset]).fetchall()
+
+            total = None
+            if include_total:
+                count_sql = "SELECT COUNT(*) FROM invoices"
+                if where:
+                    count_sql += " WHERE " + " AND ".join(where)
+                total = conn.execute(count_sql, params).fetchone()[0]
+        finally:
+            conn.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        invoices = [self._row_to_summary(row) for row in rows]
+
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            sort_key = {'number': 'invoice_number', 'date': 'invoice_date',
+                        'client': 'client_name', 'total': 'total'}[sort]
+            next_cursor = self.encode_cursor(last[sort_key], last['invoice_number'])
+
+        result = {'invoices': invoices, 'next_cursor': next_cursor, 'limit': limit}
+        if include_total:
+            result['total'] = total
+        return result
+
+    def report(self, name, **params):
+        """Run one of the analytics reports (see invoice_analytics.REPORTS)
+
+        Reports read only the materialized aggregate tables.
+        """
+        if name not in REPORTS:
+            raise ValueError(f"Unknown report: {name}")
+        self.ensure_synced()
+        conn = self._connect()
+        try:
+            return getattr(self.analytics, name)(conn, **params)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _escape_like(value):
+        return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    index = InvoiceIndex()
+    updated = index.rebuild()
+    print(f"Index rebuilt: {updated} invoices indexed in {index.db_path}")
@@ -0,0 +1,181 @@
+import string
+from collections import namedtuple
+
+from fpdf import FPDF
+
+from invoice_table import PagedTable
+
+# One text cell; ``text`` may contain ``{field}`` placeholders. A width of 0
+# extends the cell to the right margin, like FPDF.cell.
+Cell = namedtuple('Cell', ['width', 'text', 'font', 'align', 'border'], defaults=('L', 0))
+
+# A line of cells, drawn only when the ``when`` field is truthy
+Row = namedtuple('Row', ['height', 'cells', 'when'], defaults=(None,))
+
+Gap = namedtuple('Gap', ['height', 'when'], defaults=(None,))
+
+# Placeholder for the line-item table (rendered by invoice_table.PagedTable)
+Table = namedtuple('Table', [])
+
+TITLE = ('helvetica', 'B', 16)
+HEADING = ('helvetica', 'B', 12)
+BOLD = ('helvetica', 'B', 10)
+REGULAR = ('helvetica', '', 10)
+ITALIC = ('helvetica', 'I', 10)
+TOTAL = ('helvetica', 'B', 12)
+
+# The standard invoice. Core "Arial" is an alias of Helvetica in fpdf2, so
+# naming helvetica directly renders the same glyphs without the
+# substitution warning on every set_font call.
+INVOICE_LAYOUT = (
+    Row(10, [Cell(0, 'INVOICE', TITLE, 'C')]),
+    Gap(10),
+
+    # Business information
+    Row(8, [Cell(0, '{business_name}', HEADING)]),
+    Row(6, [Cell(0, '{business_address}', REGULAR)]),
+    Row(6, [Cell(0, 'Phone: {business_phone}', REGULAR)]),
+    Row(6, [Cell(0, 'Email: {business_email}', REGULAR)], when='business_email'),
+    Gap(10),
+
+    # Invoice details and client info side by side
+    Row(6, [Cell(95, 'Invoice Number: {invoice_number}', BOLD), Cell(95, 'BILL TO:', BOLD)]),
+    Row(6, [Cell(95, 'Invoice Date: {invoice_date}', REGULAR), Cell(95, '{client_name}', BOLD)]),
+    Row(6, [Cell(95, '', REGULAR), Cell(95, '{client_address}', REGULAR)]),
+    Row(6, [Cell(95, '', REGULAR), Cell(95, 'Phone: {client_phone}', REGULAR)], when='client_phone'),
+    Row(6, [Cell(95, '', REGULAR), Cell(95, 'Email: {client_email}', REGULAR)], when='client_email'),
+    Gap(10),
+
+    Table(),
+
+    # Right-aligned totals
+    Gap(5),
+    Row(8, [Cell(135, 'Subtotal:', BOLD, 'R'), Cell(30, '{subtotal}', BOLD, 'R', 1)]),
+    Row(8, [Cell(135, 'Discount ({discount}%):', BOLD, 'R'), Cell(30, '-{discount_amount}', BOLD, 'R', 1)],
+        when='has_discount'),
+    Row(8, [Cell(135, 'Tax ({tax_rate}%):', BOLD, 'R'), Cell(30, '{tax_amount}', BOLD, 'R', 1)],
+        when='has_tax'),
+    Row(10, [Cell(135, 'TOTAL:', TOTAL, 'R'), Cell(30, '{total}', TOTAL, 'R', 1)]),
+
+    # Payment terms
+    Gap(10, when='payment_terms'),
+    Row(8, [Cell(0, 'Payment Terms:', BOLD)], when='payment_terms'),
+    Row(6, [Cell(0, '{payment_terms}', REGULAR)], when='payment_terms'),
+
+    # Footer
+    Gap(10),
+    Row(6, [Cell(0, 'Thank you for your business!', ITALIC, 'C')]),
+)
+
+# A compiled cell: absolute x, resolved width, and either a fixed text with its
+# pre-measured width or a format template
+_CompiledCell = namedtuple('_CompiledCell', ['x', 'width', 'font', 'align', 'border', 'text', 'text_width', 'template'])
+
+
+class CompiledLayout:
+    """An invoice layout compiled once and applied to many invoices
+
+    Compiling resolves every cell's absolute x position and width against
+    the page geometry, splits static labels from ``{field}`` templates and
+    measures the static labels' widths up front. Rendering an invoice then
+    only formats and measures the variable fields and draws with
+    ``rect``/``text``. Flow is still vertical, so optional rows (``when``)
+    and the item table move everything below them.
+    """
+
+    def __init__(self, layout=INVOICE_LAYOUT):
+        self._formatter = string.Formatter()
+        probe = FPDF()
+        probe.add_page()
+        self.left = probe.l_margin
+        self.top = probe.t_margin
+        self.cell_margin = probe.c_margin
+        self.page_break_at = probe.page_break_trigger
+        self._content_right = probe.w - probe.r_margin
+
+        self.ops = [self._compile(probe, op) for op in layout]
+
+    def _compile(self, probe, op):
+        if not isinstance(op, Row):
+            return op
+
+        cells = []
+        x = self.left
+        for cell in op.cells:
+            width = cell.width or self._content_right - x
+            has_fields = any(field for _, field, _, _ in self._formatter.parse(cell.text))
+            text_width = None
+            if not has_fields and cell.align != 'L':
+                probe.set_font(*cell.font)
+                text_width = probe.get_string_width(cell.text)
+            cells.append(_CompiledCell(x, width, cell.font, cell.align, cell.border,
+                                       None if has_fields else cell.text, text_width,
+                                       cell.text if has_fields else None))
+            x += width
+        return Row(op.height, cells, op.when)
+
+    def render(self, fields, rows):
+        """Draw an invoice and return the FPDF document
+
+        ``fields`` maps placeholder names to values; ``rows`` is the item
+        table iterator passed to PagedTable.render.
+        """
+        pdf = FPDF()
+        pdf.add_page()
+        y = self.top
+        current_font = None
+
+        for op in self.ops:
+            if getattr(op, 'when', None) and not fields.get(op.when):
+                continue
+
+            if isinstance(op, Gap):
+                y += op.height
+                continue
+
+            if isinstance(op, Table):
+                pdf.set_y(y)
+                PagedTable(pdf).render(rows)
+                y = pdf.get_y()
+                current_font = None
+                continue
+
+            if y + op.height > self.page_break_at:
+                pdf.add_page()
+                y = self.top
+
+            for cell in op.cells:
+                if cell.font != current_font:
+                    pdf.set_font(*cell.font)
+                    current_font = cell.font
+                if cell.border:
+                    pdf.rect(cell.x, y, cell.width, op.height)
+
+                text = cell.text if cell.template is None else cell.template.format_map(fields)
+                if not text:
+                    continue
+                if cell.align == 'L':
+                    text_x = cell.x + self.cell_margin
+                else:
+                    text_width = cell.text_width if cell.text_width is not None else pdf.get_string_width(text)
+                    if cell.align == 'R':
+                        text_x = cell.x + cell.width - self.cell_margin - text_width
+                    else:
+                        text_x = cell.x + (cell.width - text_width) / 2
+                pdf.text(text_x, y + 0.5 * op.height + 0.3 * pdf.font_size, text)
+
+            y += op.height
+
+        pdf.set_y(y)
+        return pdf
+
+
+_default_layout = None
+
+
+def get_default_layout():
+    """The standard invoice layout, compiled on first use"""
+    global _default_layout
+    if _default_layout is None:
+        _default_layout = CompiledLayout()
+    return _default_layout
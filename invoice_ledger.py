@@ -0,0 +1,559 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from invoice_loader import iter_load, loads
+from invoice_paths import InvoicePaths
+from pdf_cache import atomic_write_bytes
+
+SEGMENT_PREFIX = 'segment_'
+SEGMENT_SUFFIX = '.jsonl'
+HINT_SUFFIX = '.hint'
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Held exclusively by whichever process is compacting (others skip compaction
+# meanwhile) and shared by every append, so no record lands in a segment
+# while it is being merged
+COMPACT_LOCK_NAME = 'compact.lock'
+
+
+def _lock_fd(fd, shared, blocking):
+    if fcntl is not None:
+        fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+    else:
+        # msvcrt has no shared locks, so shared holders exclude each other too
+        msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def try_file_lock(path, shared=False):
+    """Non-blocking lock on ``path``; yields whether it was acquired
+
+    The OS drops the lock when its holder exits, so a crashed process never
+    leaves a stale lock behind.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            _lock_fd(fd, shared, blocking=False)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Lock on ``path``, waiting for it (see try_file_lock)"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _lock_fd(fd, shared, blocking=True)
+        try:
+            yield
+        finally:
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+
+def encode_record(record):
+    """One compact JSON Lines record"""
+    return json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+class InvoiceLedger:
+    """Append-only invoice store made of JSON Lines segment files
+
+    Every save appends one compact record (``{"n": number, "t": stamp, "d":
+    invoice}``) to the newest segment; deletes append a tombstone. An
+    in-memory offset index maps each invoice number to the segment, offset
+    and length of its latest record, so a lookup is a single seek and read.
+
+    Once a segment reaches ``segment_max_bytes`` it is sealed and a ``.hint``
+    file with its offsets is written next to it, so opening a ledger reads
+    the hints instead of re-parsing sealed segments. Records written by other
+    processes are picked up by ``refresh``, which only scans bytes appended
+    since the last call. Every ``compact_every`` appends, sealed segments are
+    merged into one when more than ``compact_garbage_ratio`` of their bytes
+    belong to overwritten or deleted invoices. The active segment is never
+    rewritten, and appends hold the compaction lock file shared while they
+    pick a segment and write, so a writer in another process that still
+    sees a sealed segment as active never appends to it mid-merge. The same
+    lock keeps two processes from compacting at the same time.
+    """
+
+    def __init__(self, ledger_dir=os.path.join("invoices", "ledger"), segment_max_bytes=DEFAULT_SEGMENT_BYTES,
+                 compact_every=1000, compact_garbage_ratio=0.5):
+        self.ledger_dir = ledger_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_every = compact_every
+        self.compact_garbage_ratio = compact_garbage_ratio
+
+        self.compactions = 0
+        self._appends = 0
+        self._last_stamp = 0.0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        # invoice number -> (segment id, offset, length, stamp)
+        self._offsets = {}
+        # segment id -> bytes indexed so far
+        self._scanned = {}
+        # segment id -> bytes held by live records
+        self._live_bytes = {}
+        # segment id -> {invoice number: (offset, length, stamp)} of deletes
+        self._tombstones = {}
+
+    def segment_path(self, segment_id):
+        return os.path.join(self.ledger_dir, f"{SEGMENT_PREFIX}{segment_id:06d}{SEGMENT_SUFFIX}")
+
+    def hint_path(self, segment_id):
+        return self.segment_path(segment_id) + HINT_SUFFIX
+
+    def _segment_ids(self):
+        if not os.path.exists(self.ledger_dir):
+            return []
+        ids = []
+        for name in os.listdir(self.ledger_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    ids.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(ids)
+
+    def _index_record(self, segment_id, offset, length, number, stamp, deleted):
+        previous = self._offsets.pop(number, None)
+        if previous is not None:
+            self._live_bytes[previous[0]] -= previous[2]
+        tombstones = self._tombstones.setdefault(segment_id, {})
+        if deleted:
+            tombstones[number] = (offset, length, stamp)
+        else:
+            tombstones.pop(number, None)
+            self._offsets[number] = (segment_id, offset, length, stamp)
+            self._live_bytes[segment_id] = self._live_bytes.get(segment_id, 0) + length
+        self._live_bytes.setdefault(segment_id, 0)
+
+    def _load_hint(self, segment_id, size):
+        """Index a sealed segment from its hint file; returns the bytes covered"""
+        try:
+            with open(self.hint_path(segment_id), 'rb') as f:
+                hint = loads(f.read())
+        except (OSError, ValueError):
+            return 0
+        if hint.get('size', 0) > size:
+            # Segment was replaced (e.g. compacted by another process)
+            return 0
+        for number, offset, length, stamp, deleted in hint['records']:
+            self._index_record(segment_id, offset, length, number, stamp, deleted)
+        return hint['size']
+
+    def _scan(self, segment_id, start):
+        """Index complete records from ``start`` to the end of a segment"""
+        with open(self.segment_path(segment_id), 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Partial record still being written
+                    break
+                try:
+                    record = loads(line)
+                except ValueError:
+                    # Torn write left by a crash; later records are still valid
+                    offset += len(line)
+                    continue
+                self._index_record(segment_id, offset, len(line), record['n'], record['t'], record.get('deleted', False))
+                offset += len(line)
+        self._scanned[segment_id] = offset
+
+    def refresh(self):
+        """Index records appended since the last call, by this or any other process"""
+        with self._lock:
+            ids = self._segment_ids()
+            if any(segment_id not in ids for segment_id in self._scanned):
+                # Segments were merged away underneath us; start over
+                self._reset()
+
+            for segment_id in ids:
+                try:
+                    size = os.path.getsize(self.segment_path(segment_id))
+                except FileNotFoundError:
+                    continue
+                start = self._scanned.get(segment_id)
+                if start is None:
+                    start = self._load_hint(segment_id, size)
+                    self._scanned[segment_id] = start
+                if size > start:
+                    self._scan(segment_id, start)
+            return ids
+
+    def _next_stamp(self):
+        stamp = max(time.time(), self._last_stamp + 1e-6)
+        self._last_stamp = stamp
+        return stamp
+
+    def _append(self, lines):
+        """Append encoded records to the active segment in a single write"""
+        os.makedirs(self.ledger_dir, exist_ok=True)
+        with file_lock(os.path.join(self.ledger_dir, COMPACT_LOCK_NAME), shared=True):
+            ids = self.refresh()
+            segment_id = ids[-1] if ids else 1
+            path = self.segment_path(segment_id)
+            if ids and os.path.getsize(path) >= self.segment_max_bytes:
+                self._write_hint(segment_id)
+                segment_id += 1
+                path = self.segment_path(segment_id)
+
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                os.write(fd, b''.join(lines))
+            finally:
+                os.close(fd)
+        self.refresh()
+
+    def put(self, invoice_data):
+        """Append an invoice record; returns its stamp (the save time)"""
+        return self.put_many([invoice_data])[0]
+
+    def put_many(self, invoices):
+        """Append several invoices in one write; returns their stamps"""
+        with self._lock:
+            stamps = []
+            lines = []
+            for invoice_data in invoices:
+                stamp = self._next_stamp()
+                stamps.append(stamp)
+                lines.append(encode_record({'n': str(invoice_data['invoice_number']), 't': stamp, 'd': invoice_data}))
+            if not lines:
+                return stamps
+            self._append(lines)
+            self._appends += len(lines)
+            due = self.compact_every and self._appends >= self.compact_every
+            if due:
+                self._appends = 0
+        if due and self.garbage_ratio(sealed_only=True) > self.compact_garbage_ratio:
+            self.compact()
+        return stamps
+
+    def delete(self, invoice_number):
+        """Append a tombstone; returns False when the invoice is not stored"""
+        invoice_number = str(invoice_number)
+        with self._lock:
+            self.refresh()
+            if invoice_number not in self._offsets:
+                return False
+            self._append([encode_record({'n': invoice_number, 't': self._next_stamp(), 'deleted': True})])
+            return True
+
+    def _read(self, location):
+        segment_id, offset, length, _ = location
+        try:
+            with open(self.segment_path(segment_id), 'rb') as f:
+                f.seek(offset)
+                return loads(f.read(length))
+        except (OSError, ValueError):
+            return None
+
+    def get(self, invoice_number):
+        """Latest stored data for an invoice, or None"""
+        invoice_number = str(invoice_number)
+        for attempt in range(2):
+            with self._lock:
+                location = self._offsets.get(invoice_number)
+                if location is None:
+                    self.refresh()
+                    location = self._offsets.get(invoice_number)
+            if location is None:
+                return None
+
+            record = self._read(location)
+            if record is not None and record.get('n') == invoice_number:
+                return record['d']
+
+            # Stale offset (segment compacted by another process): re-index once
+            with self._lock:
+                self._reset()
+                self.refresh()
+        return None
+
+    def __contains__(self, invoice_number):
+        with self._lock:
+            self.refresh()
+            return str(invoice_number) in self._offsets
+
+    def __len__(self):
+        with self._lock:
+            self.refresh()
+            return len(self._offsets)
+
+    def path_for(self, invoice_number):
+        """Segment file currently holding an invoice, or None"""
+        with self._lock:
+            self.refresh()
+            location = self._offsets.get(str(invoice_number))
+        return self.segment_path(location[0]) if location else None
+
+    def stamps(self):
+        """Map invoice number -> save stamp for every stored invoice"""
+        with self._lock:
+            self.refresh()
+            return {number: location[3] for number, location in self._offsets.items()}
+
+    def iter_items(self, invoice_numbers=None):
+        """Yield ``(number, data)`` pairs in storage order
+
+        Records are grouped by segment and read in offset order, so each
+        segment is opened once and read front to back. ``invoice_numbers``
+        limits the scan to those invoices (all by default).
+        """
+        with self._lock:
+            self.refresh()
+            if invoice_numbers is None:
+                locations = list(self._offsets.items())
+            else:
+                locations = [(number, self._offsets[number]) for number in map(str, invoice_numbers)
+                             if number in self._offsets]
+        locations.sort(key=lambda item: item[1][:2])
+
+        current_segment = None
+        f = None
+        try:
+            for number, (segment_id, offset, length, _) in locations:
+                if segment_id != current_segment:
+                    if f is not None:
+                        f.close()
+                    try:
+                        f = open(self.segment_path(segment_id), 'rb')
+                    except FileNotFoundError:
+                        # Compacted meanwhile; fall back to individual lookups
+                        f = None
+                    current_segment = segment_id
+                if f is None:
+                    data = self.get(number)
+                else:
+                    f.seek(offset)
+                    try:
+                        record = loads(f.read(length))
+                    except ValueError:
+                        record = {}
+                    data = record['d'] if record.get('n') == number else self.get(number)
+                if data is not None:
+                    yield number, data
+        finally:
+            if f is not None:
+                f.close()
+
+    def iter_invoices(self):
+        """Yield every stored invoice dict"""
+        for _, data in self.iter_items():
+            yield data
+
+    def _write_hint(self, segment_id):
+        records = [
+            [number, offset, length, stamp, False]
+            for number, (seg, offset, length, stamp) in self._offsets.items() if seg == segment_id
+        ]
+        # Deletes must survive reopening, or older segments would resurrect the invoice
+        records.extend(
+            [number, offset, length, stamp, True]
+            for number, (offset, length, stamp) in self._tombstones.get(segment_id, {}).items()
+        )
+        records.sort(key=lambda record: record[1])
+        hint = {'size': self._scanned.get(segment_id, 0), 'records': records}
+        atomic_write_bytes(self.hint_path(segment_id), json.dumps(hint, separators=(',', ':')).encode('utf-8'))
+
+    def seal(self):
+        """Start a new active segment so everything written so far can be compacted"""
+        with self._lock:
+            ids = self.refresh()
+            if not ids or not os.path.getsize(self.segment_path(ids[-1])):
+                return
+            self._write_hint(ids[-1])
+            os.makedirs(self.ledger_dir, exist_ok=True)
+            open(self.segment_path(ids[-1] + 1), 'ab').close()
+            self.refresh()
+
+    def garbage_ratio(self, sealed_only=False):
+        """Share of segment bytes held by overwritten or deleted records"""
+        with self._lock:
+            self.refresh()
+            ids = sorted(self._scanned)
+            if sealed_only:
+                ids = ids[:-1]
+            total = sum(self._scanned[segment_id] for segment_id in ids)
+            live = sum(self._live_bytes.get(segment_id, 0) for segment_id in ids)
+        return (total - live) / total if total else 0.0
+
+    def compact(self):
+        """Merge all sealed segments into one holding only live records
+
+        The merged segment takes the id of the newest sealed segment, so it
+        still sorts before the active one. Returns the bytes reclaimed; 0 when
+        another process (e.g. a batch worker) is compacting right now.
+        """
+        with self._lock:
+            if not os.path.isdir(self.ledger_dir):
+                return 0
+            with try_file_lock(os.path.join(self.ledger_dir, COMPACT_LOCK_NAME)) as locked:
+                if not locked:
+                    return 0
+                # Segments may have been merged by the previous lock holder
+                return self._compact()
+
+    def _compact(self):
+        with self._lock:
+            ids = self.refresh()
+            sealed = ids[:-1]
+            if not sealed:
+                return 0
+            target = sealed[-1]
+            before = sum(self._scanned.get(segment_id, 0) for segment_id in sealed)
+
+            while True:
+                scanned = {segment_id: self._scanned[segment_id] for segment_id in sealed}
+                live = sorted(
+                    (location[:2], number) for number, location in self._offsets.items()
+                    if location[0] in scanned
+                )
+                tmp_path = self.segment_path(target) + '.compact'
+                new_locations = {}
+                offset = 0
+                with open(tmp_path, 'wb') as out:
+                    for (segment_id, _), number in live:
+                        record = self._read(self._offsets[number])
+                        if record is None or record.get('n') != number:
+                            out.close()
+                            os.remove(tmp_path)
+                            raise ValueError(f"Unreadable ledger record for invoice {number} in segment {segment_id}")
+                        line = encode_record(record)
+                        out.write(line)
+                        new_locations[number] = (target, offset, len(line), record['t'])
+                        offset += len(line)
+
+                # A late append to a sealed segment: index it and merge again
+                self.refresh()
+                if all(self._scanned[segment_id] == size for segment_id, size in scanned.items()):
+                    break
+                os.remove(tmp_path)
+
+            os.replace(tmp_path, self.segment_path(target))
+            for segment_id in sealed[:-1]:
+                for path in (self.segment_path(segment_id), self.hint_path(segment_id)):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                self._scanned.pop(segment_id, None)
+                self._live_bytes.pop(segment_id, None)
+                self._tombstones.pop(segment_id, None)
+
+            # Invoices re-saved into the active segment meanwhile keep their newer location
+            live_bytes = 0
+            for number, location in new_locations.items():
+                current = self._offsets.get(number)
+                if current is not None and current[0] in scanned:
+                    self._offsets[number] = location
+                    live_bytes += location[2]
+            self._scanned[target] = offset
+            self._live_bytes[target] = live_bytes
+            self._tombstones.pop(target, None)
+            self._write_hint(target)
+            self.compactions += 1
+            return before - offset
+
+    def import_json_files(self, invoices_dir="invoices", batch_size=500):
+        """Append every ``invoice_<n>.json`` file under ``invoices_dir`` (any layout); returns the count"""
+        paths = [entry.path for _, entry in InvoicePaths(invoices_dir).iter_invoice_files('json')]
+
+        imported = 0
+        batch = []
+        for invoice_data in iter_load(paths):
+            batch.append(invoice_data)
+            if len(batch) >= batch_size:
+                imported += len(self.put_many(batch))
+                batch = []
+        if batch:
+            imported += len(self.put_many(batch))
+        return imported
+
+    def stats(self):
+        with self._lock:
+            self.refresh()
+            return {
+                'segments': len(self._scanned),
+                'invoices': len(self._offsets),
+                'bytes': sum(self._scanned.values()),
+                'garbage_ratio': self.garbage_ratio(),
+                'compactions': self.compactions
+            }
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def storage_backend():
+    """'ledger' when INVOICE_STORAGE=ledger, otherwise 'files' (one JSON file per invoice)"""
+    return 'ledger' if os.environ.get('INVOICE_STORAGE', 'files') == 'ledger' else 'files'
+
+
+def get_default_ledger(invoices_dir="invoices"):
+    """Process-wide ledger for ``invoices_dir``, or None when storing JSON files
+
+    The ledger lives in ``<invoices_dir>/ledger`` unless INVOICE_LEDGER_DIR
+    is set.
+    """
+    if storage_backend() != 'ledger':
+        return None
+    ledger_dir = os.environ.get('INVOICE_LEDGER_DIR', os.path.join(invoices_dir, "ledger"))
+    key = os.path.abspath(ledger_dir)
+    with _ledgers_lock:
+        if key not in _ledgers:
+            _ledgers[key] = InvoiceLedger(ledger_dir)
+        return _ledgers[key]
+
+
+# Command line maintenance
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    ledger = InvoiceLedger(os.environ.get('INVOICE_LEDGER_DIR', os.path.join("invoices", "ledger")))
+
+    if command == 'import':
+        source = sys.argv[2] if len(sys.argv) > 2 else "invoices"
+        count = ledger.import_json_files(source)
+        print(f"✅ Imported {count} invoices from {source} into {ledger.ledger_dir}")
+    elif command == 'compact':
+        ledger.seal()
+        reclaimed = ledger.compact()
+        print(f"✅ Compacted {ledger.ledger_dir}: {reclaimed} bytes reclaimed")
+    elif command == 'stats':
+        for key, value in ledger.stats().items():
+            print(f"{key}: {value}")
+    else:
+        print("Usage: python invoice_ledger.py [import [invoices_dir] | compact | stats]")
+        sys.exit(1)
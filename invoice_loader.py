@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:  # optional faster decoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+DEFAULT_BATCH_SIZE = 64
+
+
+def default_workers():
+    return min(16, (os.cpu_count() or 1) * 4)
+
+
+def loads(data):
+    """Decode JSON bytes with orjson when installed, else the standard library"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json_file(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def _load_batch(paths, extract, skip_errors, with_paths):
+    results = []
+    for path in paths:
+        try:
+            data = load_json_file(path)
+            if extract is not None:
+                data = extract(data)
+            results.append((path, data) if with_paths else data)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not skip_errors:
+                raise
+            logger.warning(f"Skipping unreadable invoice file {path}: {e}")
+    return results
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_load(paths, extract=None, workers=None, batch_size=DEFAULT_BATCH_SIZE,
+              max_in_flight=None, skip_errors=True, with_paths=False):
+    """Read and decode JSON files on a thread pool, yielding results in order
+
+    ``paths`` may be any iterable (it is consumed lazily). Files are read in
+    batches of ``batch_size``, one batch per task; ``extract`` runs in the
+    worker so only what it returns (e.g. a handful of summary fields) is kept,
+    not the full invoice. At most ``max_in_flight`` batches are pending at a
+    time, which bounds memory for arbitrarily large directories. Unreadable
+    files are logged and skipped unless ``skip_errors`` is False. With
+    ``with_paths`` each result is a ``(path, result)`` pair.
+    """
+    workers = workers or default_workers()
+    max_in_flight = max_in_flight or workers * 2
+
+    if workers == 1:
+        for batch in _batches(paths, batch_size):
+            yield from _load_batch(batch, extract, skip_errors, with_paths)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='invoice-loader') as executor:
+        pending = deque()
+        for batch in _batches(paths, batch_size):
+            pending.append(executor.submit(_load_batch, batch, extract, skip_errors, with_paths))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def load_many(paths, extract=None, **kwargs):
+    """List form of iter_load"""
+    return list(iter_load(paths, extract, **kwargs))
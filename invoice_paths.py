@@ -0,0 +1,197 @@
+import hashlib
+import os
+import re
+import sys
+from datetime import datetime
+
+# Number of hex characters of the invoice-number hash used as the shard
+# directory name: 2 gives 256 shards, so a million invoices is roughly
+# 8k files (PDF + JSON) per directory.
+SHARD_CHARS = 2
+
+LAYOUTS = ('hash', 'flat')
+
+_INVOICE_FILE = re.compile(r'^invoice_(.+)\.(pdf|json|csv)$')
+_SUMMARY_FILE = re.compile(r'^all_invoices_summary_(\d{4})(\d{2})\d{2}_\d{6}\.csv(\.gz)?$')
+
+
+def default_layout():
+    """'hash' (sharded) unless INVOICE_LAYOUT=flat"""
+    layout = os.environ.get('INVOICE_LAYOUT', 'hash')
+    return layout if layout in LAYOUTS else 'hash'
+
+
+def shard_for(invoice_number):
+    """Shard directory name for an invoice number"""
+    return hashlib.sha1(str(invoice_number).encode('utf-8')).hexdigest()[:SHARD_CHARS]
+
+
+class InvoicePaths:
+    """Where invoice PDFs, JSON files and exports live on disk
+
+    With the default ``hash`` layout each invoice's files go into
+    ``invoices/<shard>/`` where the shard is a prefix of a hash of the
+    invoice number, so no directory grows past a few thousand entries and a
+    path is computed without any lookup. Per-invoice CSV exports are sharded
+    the same way under ``exports/``; bulk summaries go to
+    ``exports/summary/<YYYY-MM>/``. ``flat`` keeps the original single
+    directory layout.
+
+    Lookups (``find_pdf``, ``find_json``) also check the flat location, so
+    files written before a layout change stay reachable until
+    ``migrate`` moves them.
+    """
+
+    def __init__(self, invoices_dir="invoices", exports_dir="exports", layout=None):
+        self.invoices_dir = invoices_dir
+        self.exports_dir = exports_dir
+        self.layout = layout or default_layout()
+
+    def _place(self, base_dir, invoice_number, extension):
+        name = f"invoice_{invoice_number}.{extension}"
+        if self.layout == 'flat':
+            return os.path.join(base_dir, name)
+        return os.path.join(base_dir, shard_for(invoice_number), name)
+
+    def pdf_path(self, invoice_number):
+        """Location a PDF is written to"""
+        return self._place(self.invoices_dir, invoice_number, 'pdf')
+
+    def json_path(self, invoice_number):
+        """Location invoice JSON is written to"""
+        return self._place(self.invoices_dir, invoice_number, 'json')
+
+    def csv_export_path(self, invoice_number):
+        """Location of the single-invoice CSV export"""
+        return self._place(self.exports_dir, invoice_number, 'csv')
+
+    def summary_export_path(self, extension='csv', now=None):
+        """New timestamped path for an all-invoices summary export"""
+        now = now or datetime.now()
+        name = f"all_invoices_summary_{now.strftime('%Y%m%d_%H%M%S')}.{extension}"
+        if self.layout == 'flat':
+            return os.path.join(self.exports_dir, name)
+        return os.path.join(self.exports_dir, 'summary', now.strftime('%Y-%m'), name)
+
+    def _find(self, invoice_number, extension):
+        name = f"invoice_{invoice_number}.{extension}"
+        candidates = [os.path.join(self.invoices_dir, shard_for(invoice_number), name),
+                      os.path.join(self.invoices_dir, name)]
+        if self.layout == 'flat':
+            candidates.reverse()
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def find_pdf(self, invoice_number):
+        """Existing PDF for an invoice in either layout, or None"""
+        return self._find(invoice_number, 'pdf')
+
+    def find_json(self, invoice_number):
+        """Existing JSON file for an invoice in either layout, or None"""
+        return self._find(invoice_number, 'json')
+
+    @staticmethod
+    def ensure_parent(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return path
+
+    def _iter_dir(self, directory):
+        """Yield ``(entry, number, extension)`` for invoice files directly in ``directory``"""
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                match = _INVOICE_FILE.match(entry.name)
+                if match and entry.is_file():
+                    yield entry, match.group(1), match.group(2)
+
+    def _shard_dirs(self, base_dir):
+        try:
+            entries = os.scandir(base_dir)
+        except FileNotFoundError:
+            return []
+        with entries:
+            return [entry.path for entry in entries
+                    if entry.is_dir() and len(entry.name) == SHARD_CHARS
+                    and all(c in '0123456789abcdef' for c in entry.name)]
+
+    def iter_invoice_files(self, extension, base_dir=None):
+        """Yield ``(invoice_number, entry)`` for every file of one type, in both layouts
+
+        Each invoice is yielded once. When a file exists in both places (a
+        legacy flat copy left next to a re-saved sharded one, or an
+        interrupted migration) only the copy ``_find`` would pick, the one
+        in this layout, is yielded.
+        """
+        base_dir = base_dir or self.invoices_dir
+        for directory in [base_dir] + self._shard_dirs(base_dir):
+            # Files outside this layout are only used when there is no copy inside it
+            outside_layout = (directory == base_dir) != (self.layout == 'flat')
+            for entry, number, ext in self._iter_dir(directory):
+                if ext != extension:
+                    continue
+                if outside_layout:
+                    preferred = self._place(base_dir, number, ext)
+                    if os.path.abspath(preferred) != os.path.abspath(entry.path) and os.path.exists(preferred):
+                        continue
+                yield number, entry
+
+    def migrate(self, progress_every=10000):
+        """Move invoice files and exports into this layout, in place
+
+        Each file is moved with an atomic rename, so an interrupted migration
+        is resumed by running it again: files already in place are skipped.
+        When both an old and a new copy exist the newer one is kept.
+        Returns the number of files moved.
+        """
+        moved = 0
+        for base_dir in (self.invoices_dir, self.exports_dir):
+            for directory in [base_dir] + self._shard_dirs(base_dir):
+                for entry, number, extension in list(self._iter_dir(directory)):
+                    target = self._place(base_dir, number, extension)
+                    if os.path.abspath(target) == os.path.abspath(entry.path):
+                        continue
+                    if self._move(entry.path, target):
+                        moved += 1
+                        if progress_every and moved % progress_every == 0:
+                            print(f"   {moved} files moved...")
+
+        # Bulk summary exports are partitioned by month
+        if self.layout != 'flat':
+            for name in os.listdir(self.exports_dir) if os.path.isdir(self.exports_dir) else []:
+                match = _SUMMARY_FILE.match(name)
+                if match:
+                    target = os.path.join(self.exports_dir, 'summary', f"{match.group(1)}-{match.group(2)}", name)
+                    if self._move(os.path.join(self.exports_dir, name), target):
+                        moved += 1
+        return moved
+
+    def _move(self, source, target):
+        try:
+            if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                # Already migrated; the copy left behind is stale
+                os.remove(source)
+                return False
+            os.replace(source, self.ensure_parent(target))
+            return True
+        except FileNotFoundError:
+            # Moved by a concurrent run
+            return False
+
+
+# Command line migration
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    layout = args[0] if args else default_layout()
+    if layout not in LAYOUTS:
+        print(f"Usage: python invoice_paths.py [{'|'.join(LAYOUTS)}] [invoices_dir] [exports_dir]")
+        sys.exit(1)
+
+    paths = InvoicePaths(*(args[1:3] or []), layout=layout)
+    print(f"🔄 Migrating {paths.invoices_dir}/ and {paths.exports_dir}/ to the {layout} layout...")
+    count = paths.migrate()
+    print(f"✅ {count} files moved")
@@ -0,0 +1,152 @@
+from collections import namedtuple
+
+from fpdf.enums import MethodReturnValue
+from fpdf.fonts import CoreFont
+
+# format_cents lives in money; imported here for existing callers
+from money import format_cents
+
+Column = namedtuple('Column', ['title', 'width', 'align'])
+
+ITEM_COLUMNS = (
+    Column('Description', 80, 'L'),
+    Column('Quantity', 25, 'C'),
+    Column('Unit Price', 30, 'R'),
+    Column('Total', 30, 'R'),
+)
+
+
+class PagedTable:
+    """Draws a long table across as many pages as it needs
+
+    Rows are pulled one at a time from an iterator of ``(cells, amount_cents)``
+    pairs, so the caller never has to materialize the rows. Every page starts
+    with the column header (and a "Brought forward" row after the first page)
+    and ends with that page's subtotal. Cells that do not fit their column
+    are wrapped onto extra lines.
+
+    Rows are drawn with ``rect`` and ``text`` rather than ``cell``, which is
+    several times faster per row. Note that fpdf2 still keeps every finished
+    page in memory until ``output()``; what this bounds is the per-row work
+    and the Python objects held for the items.
+    """
+
+    def __init__(self, pdf, columns=ITEM_COLUMNS, row_height=8, line_height=5,
+                 body_font=('helvetica', '', 9), header_font=('helvetica', 'B', 10), subtotal_font=('helvetica', 'I', 9)):
+        self.pdf = pdf
+        self.columns = columns
+        self.row_height = row_height
+        self.line_height = line_height
+        self.body_font = body_font
+        self.header_font = header_font
+        self.subtotal_font = subtotal_font
+
+        self.pages = 0
+        self.rows = 0
+        self.page_subtotals = 0
+        self.total_cents = 0
+        self._page_cents = 0
+        self._bottom = None
+
+    def _string_width(self, text):
+        """get_string_width, summed straight from the metrics table for core fonts"""
+        pdf = self.pdf
+        font = pdf.current_font
+        if isinstance(font, CoreFont) and not pdf.char_spacing and pdf.font_stretching == 100:
+            widths = font.cw
+            return sum(widths.get(char, 0) for char in text) * pdf.font_size / 1000
+        return pdf.get_string_width(text)
+
+    def _text(self, column, x, y, height, text, align=None):
+        pdf = self.pdf
+        align = align or column.align
+        if align == 'R':
+            text_x = x + column.width - pdf.c_margin - self._string_width(text)
+        elif align == 'C':
+            text_x = x + (column.width - self._string_width(text)) / 2
+        else:
+            text_x = x + pdf.c_margin
+        pdf.text(text_x, y + 0.5 * height + 0.3 * pdf.font_size, text)
+
+    def _draw_row(self, cells, height, lines=None, align=None):
+        pdf = self.pdf
+        x = pdf.l_margin
+        y = pdf.get_y()
+        for index, (column, text) in enumerate(zip(self.columns, cells)):
+            pdf.rect(x, y, column.width, height)
+            if lines is not None and index == 0:
+                top = y + (height - len(lines) * self.line_height) / 2
+                for offset, line in enumerate(lines):
+                    self._text(column, x, top + offset * self.line_height, self.line_height, line)
+            else:
+                self._text(column, x, y, height, text, align)
+            x += column.width
+        pdf.set_y(y + height)
+
+    def _draw_header(self):
+        self.pdf.set_font(*self.header_font)
+        self._draw_row([column.title for column in self.columns], self.row_height, align='C')
+        self.pdf.set_font(*self.body_font)
+
+    def _draw_summary_row(self, label, cents):
+        pdf = self.pdf
+        label_width = sum(column.width for column in self.columns[:-1])
+        y = pdf.get_y()
+        pdf.set_font(*self.subtotal_font)
+        self._text(Column(label, label_width, 'R'), pdf.l_margin, y, self.row_height, label)
+        last = self.columns[-1]
+        pdf.rect(pdf.l_margin + label_width, y, last.width, self.row_height)
+        self._text(last, pdf.l_margin + label_width, y, self.row_height, format_cents(cents))
+        pdf.set_y(y + self.row_height)
+        pdf.set_font(*self.body_font)
+
+    def _end_page(self):
+        self._draw_summary_row(f"Page {self.pages} subtotal:", self._page_cents)
+        self.page_subtotals += 1
+        self._page_cents = 0
+
+    def _start_page(self, new_page):
+        if new_page:
+            self.pdf.add_page()
+        self.pages += 1
+        self._draw_header()
+        if self.pages > 1:
+            self._draw_summary_row("Brought forward:", self.total_cents)
+
+    def _wrap(self, text):
+        """Lines for the first column, or None when the text fits on one line"""
+        width = self.columns[0].width - 2 * self.pdf.c_margin
+        if self._string_width(text) <= width:
+            return None
+        return self.pdf.multi_cell(self.columns[0].width, self.line_height, text,
+                                   dry_run=True, output=MethodReturnValue.LINES)
+
+    def render(self, rows):
+        """Draw every row; returns the grand total of ``amount_cents``"""
+        pdf = self.pdf
+        auto_page_break, break_margin = pdf.auto_page_break, pdf.b_margin
+        # Always leave room for the page subtotal row
+        self._bottom = pdf.h - break_margin - self.row_height
+        pdf.set_auto_page_break(False)
+        try:
+            pdf.set_font(*self.body_font)
+            self._start_page(new_page=False)
+            for cells, amount_cents in rows:
+                lines = self._wrap(cells[0])
+                height = self.row_height if lines is None else max(
+                    self.row_height, len(lines) * self.line_height + 2)
+
+                if pdf.get_y() + height > self._bottom:
+                    self._end_page()
+                    self._start_page(new_page=True)
+
+                self._draw_row(cells, height, lines)
+                self.rows += 1
+                self._page_cents += amount_cents
+                self.total_cents += amount_cents
+
+            if self.pages > 1:
+                self._end_page()
+        finally:
+            pdf.set_auto_page_break(auto_page_break, break_margin)
+        return self.total_cents
@@ -0,0 +1,91 @@
+import csv
+import io
+
+from money import to_price_units, to_quantity_units
+
+# Header names accepted for each column (compared case-insensitively)
+COLUMN_NAMES = {
+    'description': ('description', 'item', 'service', 'name'),
+    'quantity': ('quantity', 'qty', 'hours'),
+    'unit_price': ('unit price', 'unit_price', 'price', 'rate', 'unit cost')
+}
+
+# Column order when the data has no header row
+DEFAULT_COLUMNS = {'description': 0, 'quantity': 1, 'unit_price': 2}
+
+
+def _amount(text):
+    """Strip currency symbols and thousands separators from a spreadsheet cell"""
+    return str(text).strip().replace('$', '').replace(',', '')
+
+
+def _header_columns(row):
+    """Column positions if ``row`` is a header row, else None"""
+    names = [cell.strip().lower() for cell in row]
+    columns = {}
+    for field, aliases in COLUMN_NAMES.items():
+        for position, name in enumerate(names):
+            if name in aliases:
+                columns[field] = position
+                break
+    return columns if len(columns) == len(COLUMN_NAMES) else None
+
+
+def parse_item_rows(rows):
+    """Turn rows of cells into line item dicts
+
+    Rows are ``description, quantity, unit price`` unless the first row is a
+    header naming the columns (extra columns such as a total are ignored).
+    Blank rows are skipped. Returns ``(items, errors)`` where ``errors`` is a
+    list of ``(line_number, message)`` so one bad line does not drop the rest.
+    """
+    items = []
+    errors = []
+    columns = DEFAULT_COLUMNS
+    width = max(columns.values()) + 1
+
+    for line_number, row in enumerate(rows, 1):
+        if not any(cell.strip() for cell in row):
+            continue
+        if line_number == 1:
+            header = _header_columns(row)
+            if header:
+                columns = header
+                width = max(columns.values()) + 1
+                continue
+
+        if len(row) < width:
+            errors.append((line_number, f"expected {width} columns, got {len(row)}"))
+            continue
+
+        description = row[columns['description']].strip()
+        quantity = _amount(row[columns['quantity']])
+        unit_price = _amount(row[columns['unit_price']])
+        try:
+            if not description:
+                raise ValueError("missing description")
+            # Validate with the same conversions LineItemTable applies
+            to_quantity_units(quantity)
+            to_price_units(unit_price)
+        except ValueError as e:
+            errors.append((line_number, str(e)))
+            continue
+        items.append({'description': description, 'quantity': quantity, 'unit_price': unit_price})
+
+    return items, errors
+
+
+def parse_pasted_items(text):
+    """Line items from clipboard text: tab-separated (spreadsheet copy) or CSV"""
+    lines = text.splitlines()
+    if any('\t' in line for line in lines):
+        rows = [line.split('\t') for line in lines]
+    else:
+        rows = list(csv.reader(io.StringIO(text)))
+    return parse_item_rows(rows)
+
+
+def read_items_csv(path):
+    """Line items from a CSV file (UTF-8, an Excel byte-order mark is fine)"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return parse_item_rows(csv.reader(f))
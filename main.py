@@ -11,9 +11,10 @@ from datetime import datetime
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from invoice_generator import InvoiceGenerator
-from invoice_exporter import InvoiceExporter
-from email_sender import EmailSender
+# Application modules are imported inside the functions that use them: fpdf,
+# the email.mime tree, Flask and tkinter are slow to load, and a cron job that
+# only lists or exports invoices should not pay for them. The startup budget
+# is checked by benchmarks/bench_import_time.py and test_import_time.py.
 
 def print_banner():
     """Print application banner"""
@@ -32,7 +33,9 @@ def print_menu():
     print("5. Export All Invoices Summary")
     print("6. Send Invoice via Email")
     print("7. View Existing Invoices")
-    print("8. Exit")
+    print("8. Batch Generate Invoices from File")
+    print("9. Revenue Reports")
+    print("10. Exit")
     print("-" * 30)
 
 def create_cli_invoice():
@@ -40,6 +43,8 @@ def create_cli_invoice():
     print("\n📋 Creating New Invoice (CLI Mode)")
     print("-" * 40)
     
+    from invoice_generator import InvoiceGenerator
+
     # Create invoice generator instance
     invoice = InvoiceGenerator()
     
@@ -169,6 +174,8 @@ def launch_web():
 
 def export_invoice_csv():
     """Export specific invoice to CSV"""
+    from invoice_exporter import InvoiceExporter
+
     exporter = InvoiceExporter()
     invoices = exporter.get_all_invoices()
     
@@ -195,6 +202,8 @@ def export_invoice_csv():
 
 def export_all_invoices():
     """Export all invoices summary"""
+    from invoice_exporter import InvoiceExporter
+
     try:
         exporter = InvoiceExporter()
         csv_file = exporter.export_all_invoices_to_csv()
@@ -208,6 +217,8 @@ def export_all_invoices():
 
 def send_invoice_email():
     """Send invoice via email"""
+    from invoice_exporter import InvoiceExporter
+
     exporter = InvoiceExporter()
     invoices = exporter.get_all_invoices()
     
@@ -240,14 +251,25 @@ def send_invoice_email():
             return
         
         # Send email
+        from email_sender import EmailSender
+        from invoice_paths import InvoicePaths
+
         email_sender = EmailSender()
-        pdf_path = f"invoices/invoice_{invoice_number}.pdf"
+        pdf_path = InvoicePaths().find_pdf(invoice_number)
+        pdf_bytes = None
+        if not pdf_path:
+            # No stored PDF: render one in memory from the saved data
+            from invoice_generator import InvoiceGenerator
+
+            print("🔄 PDF not found, rendering it from the invoice data...")
+            pdf_bytes = InvoiceGenerator.from_dict(invoice_data).render_pdf_bytes()
         
         success, message = email_sender.send_invoice_email(
             sender_email, sender_password, recipient_email,
             pdf_path, invoice_number,
             invoice_data['client_info']['name'],
-            invoice_data['business_info']['name']
+            invoice_data['business_info']['name'],
+            pdf_bytes=pdf_bytes
         )
         
         if success:
@@ -260,8 +282,15 @@ def send_invoice_email():
 
 def view_invoices():
     """View existing invoices"""
+    from invoice_exporter import InvoiceExporter
+
     exporter = InvoiceExporter()
-    invoices = exporter.get_all_invoices()
+    
+    try:
+        invoices = exporter.get_invoice_summaries()
+    except Exception as e:
+        print(f"❌ Error reading invoices: {str(e)}")
+        return
     
     if not invoices:
         print("❌ No invoices found!")
@@ -270,19 +299,156 @@ def view_invoices():
     print(f"\n📋 Found {len(invoices)} invoices:")
     print("-" * 40)
     
-    for invoice_number in invoices:
+    for invoice in invoices:
+        print(f"📄 Invoice #{invoice['number']}")
+        print(f"   Date: {invoice['date']}")
+        print(f"   Client: {invoice['client']}")
+        print(f"   Total: ${invoice['total']:.2f}")
+        print(f"   Items: {invoice['items_count']}")
+        print()
+
+def show_reports():
+    """Print revenue by client, month and tax rate plus outstanding totals"""
+    from invoice_exporter import InvoiceExporter
+
+    exporter = InvoiceExporter()
+    
+    try:
+        summary = exporter.get_report('summary')
+        clients = exporter.get_report('by_client', limit=10)
+        months = exporter.get_report('by_month')
+        tax_rates = exporter.get_report('by_tax_rate')
+        outstanding = exporter.get_report('outstanding')
+    except Exception as e:
+        print(f"❌ Error building reports: {str(e)}")
+        return
+    
+    if not summary['invoices']:
+        print("❌ No invoices found!")
+        return
+    
+    print(f"\n📈 Revenue Reports ({summary['invoices']} invoices)")
+    print("-" * 40)
+    print(f"Total billed: ${summary['total']:.2f} (tax ${summary['tax']:.2f}, discounts ${summary['discount']:.2f})")
+    print(f"Outstanding:  ${summary['outstanding']:.2f}")
+    
+    print("\n👥 Top clients:")
+    for row in clients:
+        print(f"   {row['client_name']:<30} {row['invoices']:>5} invoices  ${row['total']:>12.2f}")
+    
+    print("\n📅 By month:")
+    for row in months:
+        print(f"   {row['month']:<10} {row['invoices']:>5} invoices  ${row['total']:>12.2f}")
+    
+    print("\n🧾 By tax rate:")
+    for row in tax_rates:
+        print(f"   {row['tax_rate']:>6.2f}%    {row['invoices']:>5} invoices  tax ${row['tax']:>10.2f}")
+    
+    print(f"\n⏳ Outstanding as of {outstanding['as_of']}:")
+    for bucket in outstanding['buckets']:
+        print(f"   {bucket['bucket']:<10} {bucket['invoices']:>5} invoices  ${bucket['total']:>12.2f}")
+
+def run_batch(payload_path, workers=None, max_in_flight=None):
+    """Render every invoice payload in a JSON / JSON Lines file"""
+    from batch_renderer import BatchRenderer, load_payloads
+
+    renderer = BatchRenderer(max_workers=workers, max_in_flight=max_in_flight)
+    print(f"\n🔄 Rendering invoices from {payload_path} with {renderer.max_workers} worker(s)...")
+
+    def progress(result, report):
+        if report.total % 100 == 0:
+            print(f"   {report.total} done ({report.throughput:.1f} invoices/s)")
+
+    report = renderer.render(load_payloads(payload_path), progress_callback=progress)
+
+    print(f"\n📊 Batch Summary:")
+    print(report.summary())
+    return report
+
+def batch_generate_invoices():
+    """Batch generate invoices from a payload file"""
+    payload_path = input("Payload file (.json or .jsonl): ").strip()
+    if not os.path.exists(payload_path):
+        print("❌ File not found!")
+        return
+
+    workers = input("Worker processes (press Enter for all CPU cores): ").strip()
+
+    try:
+        run_batch(payload_path, int(workers) if workers else None)
+    except ValueError:
+        print("❌ Please enter a valid number of workers!")
+    except Exception as e:
+        print(f"❌ Error generating invoices: {str(e)}")
+
+def run_profiled(func, output=None, limit=30):
+    """Run ``func()`` under cProfile and print the hottest functions and per-phase span times
+
+    The raw stats are written to ``output`` (for snakeviz, pstats, ...) when given.
+    """
+    import cProfile
+    import pstats
+    from tracing import SpanStats, hooked
+
+    profiler = cProfile.Profile()
+    with hooked(SpanStats()) as phases:
+        profiler.enable()
         try:
-            invoice_data = exporter.load_invoice_from_json(invoice_number)
-            if invoice_data:
-                totals = invoice_data['totals']
-                print(f"📄 Invoice #{invoice_number}")
-                print(f"   Date: {invoice_data['invoice_date']}")
-                print(f"   Client: {invoice_data['client_info']['name']}")
-                print(f"   Total: ${totals['total']:.2f}")
-                print(f"   Items: {len(invoice_data['items'])}")
-                print()
-        except Exception as e:
-            print(f"❌ Error reading invoice {invoice_number}: {str(e)}")
+            result = func()
+        finally:
+            profiler.disable()
+
+    print(f"\n⏱️ Phases:")
+    print(phases.report())
+    print(f"\n🔬 Top {limit} functions by cumulative time:")
+    pstats.Stats(profiler, stream=sys.stdout).strip_dirs().sort_stats('cumulative').print_stats(limit)
+    if output:
+        profiler.dump_stats(output)
+        print(f"💾 Profile saved to {output}")
+    return result
+
+def run_cli(argv):
+    """Non-interactive entry point, e.g. ``python main.py batch invoices.jsonl``"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="main.py", description="Professional Invoice Generator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="Render invoices from a JSON / JSON Lines file")
+    batch_parser.add_argument("payloads", help="Path to a .json list or .jsonl file of invoice payloads")
+    batch_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    batch_parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum queued invoices")
+    batch_parser.add_argument("--profile", action="store_true",
+                              help="Profile the run in-process and print a cProfile/pstats report")
+    batch_parser.add_argument("--profile-output", default=None, help="Also save the raw pstats data to this file")
+    batch_parser.add_argument("--profile-limit", type=int, default=30, help="Functions shown in the report")
+
+    import_parser = subparsers.add_parser("import", help="Import invoices from a CSV / NDJSON order export")
+    if argv and argv[0] == "import":
+        # Its arguments are defined by invoice_import, loaded only for this subcommand
+        from invoice_import import add_import_arguments
+
+        add_import_arguments(import_parser)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        from invoice_import import run_import
+
+        return run_import(args)
+
+    if args.command == "batch":
+        if args.profile or args.profile_output:
+            # cProfile only sees the current process, so render without a pool
+            if args.workers not in (None, 1):
+                print("ℹ️ --profile renders in-process; ignoring --workers")
+            report = run_profiled(lambda: run_batch(args.payloads, 1, args.max_in_flight),
+                                  output=args.profile_output, limit=args.profile_limit)
+        else:
+            report = run_batch(args.payloads, args.workers, args.max_in_flight)
+        return 1 if report.failed else 0
+
+    return 0
 
 def main():
     """Main application entry point"""
@@ -290,7 +456,7 @@ def main():
     
     while True:
         print_menu()
-        choice = input("Enter your choice (1-8): ").strip()
+        choice = input("Enter your choice (1-10): ").strip()
         
         if choice == '1':
             create_cli_invoice()
@@ -307,12 +473,18 @@ def main():
         elif choice == '7':
             view_invoices()
         elif choice == '8':
+            batch_generate_invoices()
+        elif choice == '9':
+            show_reports()
+        elif choice == '10':
             print("\n👋 Thank you for using Professional Invoice Generator!")
             break
         else:
-            print("❌ Invalid choice! Please enter 1-8.")
+            print("❌ Invalid choice! Please enter 1-10.")
         
         input("\nPress Enter to continue...")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     main()
@@ -0,0 +1,324 @@
+import bisect
+import os
+import threading
+import time
+
+# Latency buckets in seconds, from 1 ms to 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# INVOICE_METRICS=0 turns every metric into a shared no-op object, so the
+# instrumented code paths cost one method call that does nothing
+ENABLED = os.environ.get('INVOICE_METRICS', '1') != '0'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Timer:
+    """Context manager that observes the elapsed time into a histogram child"""
+
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def state(self):
+        return self.value
+
+    @staticmethod
+    def difference(state, before):
+        return state - before if state != before else None
+
+    def merge(self, change):
+        self.inc(change)
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def state(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    @staticmethod
+    def difference(state, before):
+        counts, total, count = state
+        if count == before[2]:
+            return None
+        return [now - then for now, then in zip(counts, before[0])], total - before[1], count - before[2]
+
+    def merge(self, change):
+        counts, total, count = change
+        with self._lock:
+            self.counts = [now + added for now, added in zip(self.counts, counts)]
+            self.sum += total
+            self.count += count
+
+
+class _Metric:
+    """Shared parent of Counter and Histogram: one child per label combination"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._unlabelled = self._child(())
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _child(self, key):
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def labels(self, **labels):
+        """The child for one combination of label values"""
+        return self._child(tuple(str(labels[name]) for name in self.labelnames))
+
+    def _samples(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._unlabelled.inc(amount)
+
+    def value(self, **labels):
+        return self.labels(**labels).value if labels or self.labelnames else self._unlabelled.value
+
+    def render(self):
+        for key, child in self._samples():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._unlabelled.observe(value)
+
+    def time(self):
+        return self._unlabelled.time()
+
+    def render(self):
+        for key, child in self._samples():
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class _NoopMetric:
+    """Stands in for every metric and child when metrics are disabled"""
+
+    def labels(self, **labels):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return _NOOP_TIMER
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP_TIMER = _NoopTimer()
+NOOP = _NoopMetric()
+
+
+class Registry:
+    """Named collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        if not self.enabled:
+            return NOOP
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def snapshot(self):
+        """Current state of every sample, to pass to ``changes_since`` later"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {key: child.state() for key, child in metric._samples()} for metric in metrics}
+
+    def changes_since(self, snapshot):
+        """What was recorded since ``snapshot``, in a picklable form ``merge`` accepts"""
+        changes = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            before = snapshot.get(metric.name, {})
+            samples = {}
+            for key, child in metric._samples():
+                state = child.state()
+                change = child.difference(state, before[key]) if key in before else state
+                if change is not None:
+                    samples[key] = change
+            if samples:
+                extra = {'buckets': metric.buckets} if isinstance(metric, Histogram) else {}
+                changes.append((type(metric).__name__, metric.name, metric.documentation, metric.labelnames,
+                                extra, samples))
+        return changes
+
+    def merge(self, changes):
+        """Add changes recorded in another process (see ``run_collecting``) to this registry"""
+        for kind, name, documentation, labelnames, extra, samples in changes:
+            cls = Histogram if kind == 'Histogram' else Counter
+            metric = self._register(cls, name, documentation, labelnames, **extra)
+            for key, change in samples.items():
+                metric._child(key).merge(change)
+
+    def render(self):
+        """All metrics in text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+REGISTRY = Registry(enabled=ENABLED)
+
+
+def counter(name, documentation, labelnames=()):
+    """Counter in the default registry (a no-op when metrics are disabled)"""
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Histogram in the default registry (a no-op when metrics are disabled)"""
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+def run_collecting(func, *args, **kwargs):
+    """Call ``func`` and return ``(result, metric changes)``; for process pool workers
+
+    Metrics recorded in a worker process only reach that process's registry.
+    Submit work through this function and hand the changes to
+    ``merge_changes`` in the parent so render times and cache lookups made
+    in the pool still show up in /metrics.
+    """
+    if not REGISTRY.enabled:
+        return func(*args, **kwargs), None
+    before = REGISTRY.snapshot()
+    result = func(*args, **kwargs)
+    return result, REGISTRY.changes_since(before)
+
+
+def merge_changes(changes):
+    """Merge metric changes returned by ``run_collecting`` into the default registry"""
+    if changes and REGISTRY.enabled:
+        REGISTRY.merge(changes)
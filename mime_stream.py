@@ -0,0 +1,158 @@
+import base64
+import os
+import re
+import smtplib
+import uuid
+from email.mime.base import MIMEBase
+from email.policy import compat32
+
+# Attachment bytes base64-encoded per block; a multiple of 57 so every block
+# ends on a full 76-character line (about 79 KB of encoded output per block)
+BLOCK_SIZE = 57 * 1024
+
+# Serialize the small, non-attachment parts with SMTP line endings
+SMTP_POLICY = compat32.clone(linesep='\r\n')
+
+_EOL = re.compile(rb'\r\n|\n|\r')
+_LEADING_DOT = re.compile(rb'^\.', re.MULTILINE)
+
+
+def _smtp_text(data):
+    """CRLF line endings and dot-stuffing, as smtplib applies to a whole message"""
+    return _LEADING_DOT.sub(b'..', _EOL.sub(b'\r\n', data))
+
+
+def _source_blocks(source):
+    """Raw attachment blocks from a path or a bytes-like object, without copying the whole source"""
+    if isinstance(source, (str, os.PathLike)):
+        buffer = bytearray(BLOCK_SIZE)
+        view = memoryview(buffer)
+        with open(source, 'rb') as f:
+            while True:
+                size = f.readinto(buffer)
+                if not size:
+                    return
+                yield view[:size]
+    else:
+        view = memoryview(source).cast('B')
+        for start in range(0, len(view), BLOCK_SIZE):
+            yield view[start:start + BLOCK_SIZE]
+
+
+def _encoded_blocks(source):
+    """Base64 of ``source`` as CRLF-terminated 76-character lines, one block at a time
+
+    The final line break is left off: the serialized message already has one
+    in front of the next boundary.
+    """
+    pending = None
+    for block in _source_blocks(source):
+        if pending is not None:
+            yield pending
+        pending = base64.encodebytes(block).replace(b'\n', b'\r\n')
+    if pending:
+        yield pending[:-2]
+
+
+class StreamedMessage:
+    """A MIME message whose attachments are encoded while it is being sent
+
+    Headers, boundaries and text parts are built by the ``email`` package as
+    usual; each attachment is a placeholder in that small serialized skeleton
+    and is read and base64-encoded in BLOCK_SIZE pieces by iter_chunks(), so
+    the message never exists in memory as a whole. Attachments may be file
+    paths (read at send time) or bytes-like objects (sliced, not copied).
+    iter_chunks() can be called again, e.g. to resend after a reconnect.
+    """
+
+    def __init__(self, message):
+        self.message = message
+        self._attachments = []
+
+    def __getitem__(self, name):
+        return self.message[name]
+
+    def attach(self, source, filename, maintype='application', subtype='octet-stream'):
+        """Attach a file path or bytes-like object as a base64 part"""
+        token = f"attachment-{uuid.uuid4().hex}"
+        part = MIMEBase(maintype, subtype)
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header('Content-Disposition', f'attachment; filename={filename}')
+        part.set_payload(token)
+        self.message.attach(part)
+        self._attachments.append((token.encode('ascii'), source))
+
+    def iter_chunks(self):
+        """The message as SMTP DATA: CRLF line endings, dot-stuffed, no terminator"""
+        rest = self.message.as_bytes(policy=SMTP_POLICY)
+        for token, source in self._attachments:
+            before, rest = rest.split(token, 1)
+            yield _smtp_text(before)
+            # Base64 lines never start with '.', so they need no dot-stuffing
+            yield from _encoded_blocks(source)
+        yield _smtp_text(rest)
+
+    def as_bytes(self):
+        """The whole message in one buffer (for tests; defeats the point for big attachments)"""
+        return b''.join(self.iter_chunks())
+
+
+def _reset(server):
+    try:
+        server.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
+
+
+def send_streamed(server, from_addr, to_addrs, message):
+    """Send a StreamedMessage on a connected ``smtplib.SMTP``, chunk by chunk
+
+    Follows ``SMTP.sendmail``: the same exceptions are raised for refused
+    senders, recipients and data, and refused recipients are returned when
+    at least one was accepted. The only difference is that DATA is written
+    as the message is produced instead of from one fully built string.
+    """
+    if isinstance(to_addrs, str):
+        to_addrs = [to_addrs]
+
+    server.ehlo_or_helo_if_needed()
+    code, response = server.mail(from_addr)
+    if code != 250:
+        if code == 421:
+            server.close()
+        else:
+            _reset(server)
+        raise smtplib.SMTPSenderRefused(code, response, from_addr)
+
+    refused = {}
+    for recipient in to_addrs:
+        code, response = server.rcpt(recipient)
+        if code not in (250, 251):
+            refused[recipient] = (code, response)
+        if code == 421:
+            server.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(to_addrs):
+        _reset(server)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, response = server.docmd('data')
+    if code != 354:
+        _reset(server)
+        raise smtplib.SMTPDataError(code, response)
+
+    tail = b''
+    for chunk in message.iter_chunks():
+        if chunk:
+            server.send(chunk)
+            tail = chunk[-2:]
+    server.send(b'.\r\n' if tail == b'\r\n' else b'\r\n.\r\n')
+
+    code, response = server.getreply()
+    if code != 250:
+        if code == 421:
+            server.close()
+        else:
+            _reset(server)
+        raise smtplib.SMTPDataError(code, response)
+    return refused
@@ -0,0 +1,282 @@
+from array import array
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+
+# Quantities are stored as integers in units of 1/QUANTITY_SCALE (4 decimal places)
+QUANTITY_SCALE = 10000
+
+# Unit prices are stored as integers in units of 1/PRICE_SCALE (6 decimal places)
+# so sub-cent rates such as $0.1234/kWh are multiplied exactly; only the line
+# total is rounded to the cent
+PRICE_SCALE = 1000000
+
+# Tax and discount percentages are applied in units of 1/RATE_SCALE percent
+RATE_SCALE = 10000
+
+
+def to_decimal(value):
+    """Exact Decimal for an int, float, str or Decimal amount
+
+    Floats go through ``str`` so 0.1 becomes Decimal('0.1'), not its binary
+    approximation.
+    """
+    try:
+        amount = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return amount
+
+
+def to_cents(value):
+    """Round an amount to whole cents (half up) and return it as an int"""
+    return int((to_decimal(value) / CENT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Float for an integer amount of cents (exact to two decimal places)"""
+    return cents / 100
+
+
+def to_quantity_units(value):
+    return int((to_decimal(value) * QUANTITY_SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_price_units(value):
+    return int((to_decimal(value) * PRICE_SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_price_units(units):
+    """Float for a unit price in price units (exact to six decimal places)"""
+    return units / PRICE_SCALE
+
+
+def to_rate_units(percent):
+    return int((to_decimal(percent) * RATE_SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def round_div(numerator, denominator):
+    """Integer division rounding half away from zero (ROUND_HALF_UP for money)"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def line_total_cents(quantity_units, price_units):
+    """Quantity times unit price, rounded half up to the cent only at the end"""
+    return round_div(quantity_units * price_units, QUANTITY_SCALE * PRICE_SCALE // 100)
+
+
+def percent_of(cents, rate_units):
+    """``rate_units`` percent (see to_rate_units) of an amount in cents, rounded to a cent"""
+    return round_div(cents * rate_units, 100 * RATE_SCALE)
+
+
+def compute_totals(subtotal_cents, tax_rate=0, discount=0):
+    """Discount, tax and total in cents for a subtotal in cents
+
+    The discount is taken off the subtotal first and tax is charged on what
+    remains, each rounded half up to the cent.
+    """
+    discount_cents = percent_of(subtotal_cents, to_rate_units(discount))
+    taxable_cents = subtotal_cents - discount_cents
+    tax_cents = percent_of(taxable_cents, to_rate_units(tax_rate))
+    return {
+        'subtotal': subtotal_cents,
+        'discount_amount': discount_cents,
+        'tax_amount': tax_cents,
+        'total': taxable_cents + tax_cents
+    }
+
+
+def totals_to_float(totals_cents):
+    return {key: from_cents(value) for key, value in totals_cents.items()}
+
+
+def format_cents(cents):
+    sign = '-' if cents < 0 else ''
+    whole, fraction = divmod(abs(cents), 100)
+    return f"{sign}${whole}.{fraction:02d}"
+
+
+def format_price(price_units):
+    """Unit price with two decimals, or more when it has sub-cent precision"""
+    sign = '-' if price_units < 0 else ''
+    whole, fraction = divmod(abs(price_units), PRICE_SCALE)
+    digits = f"{fraction:06d}".rstrip('0').ljust(2, '0')
+    return f"{sign}${whole}.{digits}"
+
+
+class LineItemTable:
+    """Columnar store of invoice line items with exact, incremental totals
+
+    Quantities, unit prices and line totals live in integer ``array`` columns
+    (quantity units, price units and cents) rather than one dict per item,
+    which keeps 50k-line invoices compact. The subtotal is updated as items are added or
+    removed, so asking for totals never re-sums the items.
+
+    Iterating or indexing yields the item dicts used everywhere else
+    (``description``, ``quantity``, ``unit_price``, ``total_price``).
+    """
+
+    def __init__(self, items=()):
+        self.descriptions = []
+        self.quantities = array('q')
+        self.unit_prices = array('q')
+        self.line_totals = array('q')
+        self.subtotal_cents = 0
+        self.extend(items)
+
+    def append(self, description, quantity, unit_price):
+        quantity_units = to_quantity_units(quantity)
+        price_units = to_price_units(unit_price)
+        line_cents = line_total_cents(quantity_units, price_units)
+
+        self.descriptions.append(description)
+        self.quantities.append(quantity_units)
+        self.unit_prices.append(price_units)
+        self.line_totals.append(line_cents)
+        self.subtotal_cents += line_cents
+        return len(self.descriptions) - 1
+
+    def extend(self, items):
+        """Append item dicts (``total_price`` is ignored and recomputed)"""
+        for item in items:
+            self.append(item['description'], item['quantity'], item['unit_price'])
+
+    def pop(self, index=-1):
+        item = self[index]
+        del self.descriptions[index]
+        del self.quantities[index]
+        del self.unit_prices[index]
+        self.subtotal_cents -= self.line_totals.pop(index)
+        return item
+
+    def remove_many(self, indices):
+        """Remove the items at ``indices`` in one pass; returns how many were removed"""
+        drop = {index for index in indices if 0 <= index < len(self)}
+        if not drop:
+            return 0
+        keep = [index for index in range(len(self)) if index not in drop]
+        self.subtotal_cents -= sum(self.line_totals[index] for index in drop)
+        self.descriptions = [self.descriptions[index] for index in keep]
+        self.quantities = array('q', (self.quantities[index] for index in keep))
+        self.unit_prices = array('q', (self.unit_prices[index] for index in keep))
+        self.line_totals = array('q', (self.line_totals[index] for index in keep))
+        return len(drop)
+
+    def clear(self):
+        self.__init__()
+
+    def _quantity(self, units):
+        whole, fraction = divmod(units, QUANTITY_SCALE)
+        return whole if not fraction else units / QUANTITY_SCALE
+
+    def __len__(self):
+        return len(self.descriptions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return {
+            'description': self.descriptions[index],
+            'quantity': self._quantity(self.quantities[index]),
+            'unit_price': from_price_units(self.unit_prices[index]),
+            'total_price': from_cents(self.line_totals[index])
+        }
+
+    def __iter__(self):
+        for description, quantity_units, price_units, line_cents in zip(
+                self.descriptions, self.quantities, self.unit_prices, self.line_totals):
+            yield {
+                'description': description,
+                'quantity': self._quantity(quantity_units),
+                'unit_price': from_price_units(price_units),
+                'total_price': from_cents(line_cents)
+            }
+
+    def iter_rows(self):
+        """Yield raw ``(description, quantity, price_units, line_cents)`` tuples"""
+        for description, quantity_units, price_units, line_cents in zip(
+                self.descriptions, self.quantities, self.unit_prices, self.line_totals):
+            yield description, self._quantity(quantity_units), price_units, line_cents
+
+    def to_list(self):
+        return list(self)
+
+    def copy(self):
+        return self.to_list()
+
+    def snapshot(self):
+        """Independent LineItemTable with the same items (copies the columns, not item dicts)"""
+        table = LineItemTable()
+        table.descriptions = list(self.descriptions)
+        table.quantities = array('q', self.quantities)
+        table.unit_prices = array('q', self.unit_prices)
+        table.line_totals = array('q', self.line_totals)
+        table.subtotal_cents = self.subtotal_cents
+        return table
+
+    def totals_cents(self, tax_rate=0, discount=0):
+        return compute_totals(self.subtotal_cents, tax_rate, discount)
+
+
+def _numpy():
+    """NumPy if it is installed, imported on first use (it is slow to load)"""
+    try:
+        import numpy
+    except ImportError:  # optional, only used by batch_totals
+        return None
+    return numpy
+
+
+def batch_totals(subtotals_cents, tax_rates, discounts):
+    """Totals for many invoices at once; returns a dict of integer-cent columns
+
+    Uses NumPy int64 arithmetic when NumPy is installed and a plain Python
+    loop otherwise. Both paths apply the same half-up rounding as
+    compute_totals, so the results match invoice by invoice.
+    """
+    np = _numpy()
+    if np is None:
+        columns = {'subtotal': [], 'discount_amount': [], 'tax_amount': [], 'total': []}
+        for subtotal, tax_rate, discount in zip(subtotals_cents, tax_rates, discounts):
+            for key, value in compute_totals(subtotal, tax_rate, discount).items():
+                columns[key].append(value)
+        return columns
+
+    subtotal = np.asarray(subtotals_cents, dtype=np.int64)
+    tax_units = np.asarray([to_rate_units(rate) for rate in tax_rates], dtype=np.int64)
+    discount_units = np.asarray([to_rate_units(rate) for rate in discounts], dtype=np.int64)
+
+    def vector_percent_of(cents, rate_units):
+        denominator = 100 * RATE_SCALE
+        quotient, remainder = np.divmod(np.abs(cents) * rate_units, denominator)
+        quotient += remainder * 2 >= denominator
+        return np.where(cents >= 0, quotient, -quotient)
+
+    discount_amount = vector_percent_of(subtotal, discount_units)
+    taxable = subtotal - discount_amount
+    tax_amount = vector_percent_of(taxable, tax_units)
+    return {
+        'subtotal': subtotal.tolist(),
+        'discount_amount': discount_amount.tolist(),
+        'tax_amount': tax_amount.tolist(),
+        'total': (taxable + tax_amount).tolist()
+    }
+
+
+def batch_invoice_totals(invoices):
+    """batch_totals over saved invoice dicts, recomputing each subtotal from its items"""
+    subtotals, tax_rates, discounts = [], [], []
+    for invoice in invoices:
+        subtotals.append(sum(
+            line_total_cents(to_quantity_units(item['quantity']), to_price_units(item['unit_price']))
+            for item in invoice.get('items', [])
+        ))
+        tax_rates.append(invoice.get('tax_rate', 0))
+        discounts.append(invoice.get('discount', 0))
+    return batch_totals(subtotals, tax_rates, discounts)
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from metrics import counter
+
+CACHE_LOOKUPS = counter('invoice_pdf_cache_lookups_total', "PDF render cache lookups by result", ['result'])
+
+# Once over max_bytes, eviction trims the cache to this share of it, so the
+# next few stores don't each trigger another scan
+EVICT_TO_RATIO = 0.9
+
+
+def atomic_write_bytes(path, data):
+    """Write ``data`` to ``path`` so readers never see a partial file"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def link_or_copy(source, path):
+    """Atomically make ``path`` a hard link to ``source``, or a copy where links fail
+
+    Raises FileNotFoundError when ``source`` is gone. Writers always replace
+    files (see atomic_write_bytes) rather than rewrite them, so sharing an
+    inode with a cache entry is safe.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}.part")
+    try:
+        try:
+            os.link(source, tmp_path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # Different filesystem, or one without hard links
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class PDFRenderCache:
+    """Content-addressed store of rendered invoice PDFs
+
+    Entries are keyed on a SHA-256 of the canonical invoice JSON plus the
+    template version, so any change to the data or the layout produces a new
+    key. The cache is bounded by total size and entry age. Stores keep a
+    running total of the cache size (read from disk once, then updated as
+    entries are written and removed); only when it passes ``max_bytes`` does
+    eviction scan the directory, dropping expired entries first, then the
+    least recently used ones. Expired entries are also dropped when looked
+    up. The total only sees this process's writes and is corrected from
+    disk on every eviction.
+    """
+
+    def __init__(self, cache_dir=os.path.join("cache", "pdf"), max_bytes=256 * 1024 * 1024,
+                 max_age_seconds=30 * 24 * 3600, auto_evict=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.auto_evict = auto_evict
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bytes held by the cache, or None until it is first needed
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(invoice_data, template_version):
+        canonical = json.dumps(invoice_data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+        digest = hashlib.sha256()
+        digest.update(str(template_version).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(canonical.encode('utf-8'))
+        return digest.hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pdf")
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        """Path of the cached PDF for ``key``, or None on a miss"""
+        path = self.path_for(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._count('misses')
+            CACHE_LOOKUPS.labels(result='miss').inc()
+            return None
+
+        now = time.time()
+        if self.max_age_seconds and now - stat.st_mtime > self.max_age_seconds:
+            self._remove(path, stat.st_size)
+            self._count('misses')
+            CACHE_LOOKUPS.labels(result='miss').inc()
+            return None
+
+        # Record the access for LRU eviction (mtime doubles as last-used time)
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        self._count('hits')
+        CACHE_LOOKUPS.labels(result='hit').inc()
+        return path
+
+    def put(self, key, pdf_bytes):
+        """Store rendered bytes atomically; returns the cache path"""
+        path = self.path_for(key)
+        pdf_bytes = bytes(pdf_bytes)
+        # Same key, same content: an existing entry is replaced, not added to
+        existed = os.path.exists(path)
+        atomic_write_bytes(path, pdf_bytes)
+
+        if self.auto_evict and self.max_bytes:
+            if self._size is None:
+                self._resync_size()
+            elif not existed:
+                with self._lock:
+                    self._size += len(pdf_bytes)
+            if self._size > self.max_bytes:
+                self.evict()
+        return path
+
+    def _resync_size(self):
+        total = sum(size for _, size, _ in self._entries())
+        with self._lock:
+            self._size = total
+
+    def _remove(self, path, size=0):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._size is not None:
+                self._size = max(0, self._size - size)
+
+    def _entries(self):
+        if not os.path.exists(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.pdf'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """Enforce the age and size bounds; returns the number of entries removed
+
+        Over ``max_bytes``, least recently used entries are dropped until the
+        cache is down to EVICT_TO_RATIO of it.
+        """
+        now = time.time()
+        removed = 0
+        live = []
+
+        for path, size, mtime in self._entries():
+            if self.max_age_seconds and now - mtime > self.max_age_seconds:
+                self._remove(path)
+                removed += 1
+            else:
+                live.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in live)
+        if self.max_bytes and total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO_RATIO
+            live.sort()
+            for mtime, size, path in live:
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
+                removed += 1
+
+        with self._lock:
+            self._size = total
+        return removed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache, or None when disabled with INVOICE_PDF_CACHE=0"""
+    global _default_cache
+    if os.environ.get('INVOICE_PDF_CACHE', '1') == '0':
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = PDFRenderCache(
+                    cache_dir=os.environ.get('INVOICE_PDF_CACHE_DIR', os.path.join("cache", "pdf"))
+                )
+    return _default_cache
@@ -0,0 +1,312 @@
+import logging
+import multiprocessing
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from metrics import merge_changes, run_collecting
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# How often a job waiting on a worker process checks whether it was cancelled (seconds)
+CANCEL_POLL_SECONDS = 0.1
+
+
+class JobCancelled(Exception):
+    """Raised inside a job (from ``JobHandle.progress``) once cancellation was requested"""
+
+
+class RenderJobQueue:
+    """In-process queue of invoice render jobs
+
+    Jobs run on a small thread pool so the web worker that accepted the
+    request is free again immediately. Each job reports progress through
+    ``update``; watchers either poll ``get`` or block in ``wait_for_change``
+    (used for the Server-Sent Events stream). Job state is kept in memory
+    only: finished jobs are dropped after ``keep_finished_seconds``.
+
+    Cancellation is cooperative: ``cancel`` flags the job and its next
+    progress report raises ``JobCancelled``; a job still queued never starts.
+
+    PDF layout is CPU-bound and holds the GIL, so a job that renders on its
+    thread slows down everything else in the process (the Flask app, or the
+    Tk loop). Jobs should hand the rendering to ``JobHandle.run_in_process``,
+    which uses a pool of ``process_workers`` processes started on first use
+    (plus a ``multiprocessing.Manager`` once a job reports progress from one).
+    """
+
+    def __init__(self, max_workers=2, keep_finished_seconds=3600, process_workers=None):
+        self.max_workers = max_workers
+        self.keep_finished_seconds = keep_finished_seconds
+        self.process_workers = process_workers or max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render-job')
+        self._processes = None
+        self._manager = None
+        self._processes_lock = threading.Lock()
+        self._jobs = {}
+        self._changed = threading.Condition()
+
+    def submit(self, func, *args, description=None, **kwargs):
+        """Queue ``func(job, *args, **kwargs)``; its return value becomes the job result"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._changed:
+            self._prune(now)
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'description': description,
+                'progress': 0,
+                'stage': 'queued',
+                'result': None,
+                'error': None,
+                'created_at': now,
+                'updated_at': now,
+                'finished_at': None,
+                'cancel_requested': False,
+                'version': 0
+            }
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return self.get(job_id)
+
+    def _run(self, job_id, func, args, kwargs):
+        job = JobHandle(self, job_id)
+        try:
+            job.progress('starting', 0, status='running')
+            result = func(job, *args, **kwargs)
+        except JobCancelled:
+            logger.info(f"Render job {job_id} cancelled")
+            self.update(job_id, status='cancelled', stage='cancelled', finished_at=time.time())
+        except Exception as e:
+            logger.exception(f"Render job {job_id} failed")
+            self.update(job_id, status='failed', error=str(e), finished_at=time.time())
+        else:
+            self.update(job_id, status='succeeded', stage='done', progress=100,
+                        result=result, finished_at=time.time())
+
+    def update(self, job_id, **changes):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(changes)
+            job['updated_at'] = time.time()
+            job['version'] += 1
+            self._changed.notify_all()
+
+    def cancel(self, job_id):
+        """Ask a queued or running job to stop; returns False if it already finished"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINISHED_STATUSES:
+                return False
+        self.update(job_id, cancel_requested=True)
+        return True
+
+    def cancel_requested(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return job is not None and job['cancel_requested']
+
+    def get(self, job_id):
+        """Snapshot of a job, or None when unknown (or already pruned)"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait_for_change(self, job_id, version, timeout=15.0):
+        """Block until the job's version moves past ``version`` (or timeout); returns the snapshot"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job['version'] != version:
+                    return dict(job) if job is not None else None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return dict(job)
+                self._changed.wait(remaining)
+
+    def _prune(self, now):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] and now - job['finished_at'] > self.keep_finished_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def process_pool(self):
+        """Worker processes for CPU-bound job steps, created on first use"""
+        with self._processes_lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+            return self._processes
+
+    def manager(self):
+        """Manager serving the WorkerProgress channels, started on first use"""
+        with self._processes_lock:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+            return self._manager
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        with self._processes_lock:
+            if self._processes is not None:
+                if sys.version_info >= (3, 9):
+                    self._processes.shutdown(wait=wait, cancel_futures=True)
+                else:
+                    self._processes.shutdown(wait=wait)
+                self._processes = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+
+class JobHandle:
+    """What a running job sees: a way to report its stage and progress"""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.id = job_id
+
+    @property
+    def cancelled(self):
+        return self.queue.cancel_requested(self.id)
+
+    def progress(self, stage, percent, **changes):
+        """Report progress; raises JobCancelled if the job was cancelled meanwhile"""
+        if self.cancelled:
+            raise JobCancelled(self.id)
+        self.queue.update(self.id, stage=stage, progress=percent, **changes)
+
+    def run_in_process(self, func, *args, progress=None):
+        """Run ``func(*args)`` in the queue's process pool and return its result
+
+        ``func`` and its arguments must be picklable. With ``progress``, a
+        callable(done, total) run on this thread, ``func`` also gets a
+        WorkerProgress as its ``progress`` keyword: what the worker reports
+        there is passed on to ``progress``, and a cancel reaches the worker
+        at its next report. A cancel raises JobCancelled here right away;
+        a call that never reports progress runs to completion in its worker
+        and the result is dropped. Metrics recorded by ``func`` are merged
+        into this process's registry.
+        """
+        channel = WorkerProgress(self.queue.manager()) if progress else None
+        kwargs = {'progress': channel} if channel else {}
+        future = self.queue.process_pool().submit(run_collecting, func, *args, **kwargs)
+        reported = None
+        try:
+            while True:
+                try:
+                    result, changes = future.result(timeout=CANCEL_POLL_SECONDS)
+                    merge_changes(changes)
+                    return result
+                except FutureTimeoutError:
+                    if channel is not None:
+                        state = channel.read()
+                        if state != reported:
+                            reported = state
+                            progress(*state)
+                    if self.cancelled:
+                        raise JobCancelled(self.id) from None
+        except JobCancelled:
+            future.cancel()
+            if channel is not None:
+                channel.cancel()
+            raise
+
+
+class WorkerProgress:
+    """Progress and cancel channel between a job and its worker process
+
+    Holds ``multiprocessing.Manager`` proxies, so it survives pickling into
+    the pool. The worker calls it like ``InvoiceGenerator.render_progress``;
+    once the job is cancelled that call raises JobCancelled, which stops
+    the render in the worker too.
+    """
+
+    def __init__(self, manager):
+        self._state = manager.Value('O', (0, 0))
+        self._cancelled = manager.Event()
+
+    def __call__(self, done, total):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        self._state.value = (done, total)
+
+    def read(self):
+        """Last ``(done, total)`` reported by the worker"""
+        return self._state.value
+
+    def cancel(self):
+        self._cancelled.set()
+
+
+def render_pdf_bytes_from_dict(data, use_cache=True, progress=None):
+    """Render stored invoice data to PDF bytes (runs inside a worker process)"""
+    from invoice_generator import InvoiceGenerator
+
+    invoice = InvoiceGenerator.from_dict(data)
+    invoice.render_progress = progress
+    return invoice.render_pdf_bytes(use_cache=use_cache)
+
+
+def render_invoice_job(job, invoice, in_process=False):
+    """Job body for /api/create-invoice and the GUI: render the PDF, then save the JSON
+
+    Progress moves from 10% to 80% while the item table is laid out, which is
+    also where a cancel takes effect for large invoices. A job cancelled
+    before the data is saved leaves no JSON and no index entry behind.
+
+    With ``in_process`` the layout runs in a worker process (see
+    ``JobHandle.run_in_process``), which reports its rows back the same way,
+    and only the finished bytes are written here.
+    """
+    def report_rows(done, total):
+        job.progress('rendering_pdf', 10 + 70 * done // max(total, 1))
+
+    job.progress('rendering_pdf', 10)
+    if in_process:
+        pdf_bytes = job.run_in_process(render_pdf_bytes_from_dict, invoice.to_dict(), invoice.pdf_cache is not None,
+                                       progress=report_rows)
+        pdf_filename = invoice.write_pdf(pdf_bytes)
+    else:
+        invoice.render_progress = report_rows
+        try:
+            pdf_filename = invoice.generate_pdf()
+        finally:
+            invoice.render_progress = None
+    job.progress('saving_data', 80)
+    json_filename = invoice.save_invoice_data()
+    return {
+        'message': 'Invoice created successfully!',
+        'invoice_number': invoice.invoice_number,
+        'pdf_filename': pdf_filename,
+        'json_filename': json_filename,
+        'totals': invoice.calculate_totals()
+    }
+
+
+def render_batch_job(job, payloads, workers=None):
+    """Job body for batch runs: render and save every payload with a BatchRenderer
+
+    ``payloads`` is a list of /api/create-invoice style dicts, rendered in
+    ``workers`` processes (one per CPU by default) so the job's own process
+    stays responsive. Failures are collected per invoice (see
+    ``batch_renderer.render_invoice_payload``); a cancel drops the renders
+    not yet started and the partial report is lost.
+    """
+    from batch_renderer import BatchRenderer
+
+    total = len(payloads)
+
+    def report_progress(result, report):
+        job.progress(f'rendered {report.total}/{total}', 100 * report.total // max(total, 1))
+
+    job.progress(f'rendered 0/{total}', 0)
+    return BatchRenderer(max_workers=workers).render(payloads, progress_callback=report_progress).to_dict()
@@ -0,0 +1,164 @@
+"""
+Minimal local SMTP server for tests and benchmarks.
+
+Speaks just enough SMTP (EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET,
+NOOP, QUIT) for smtplib and EmailSender, records every message it receives and
+counts connections and logins so connection reuse can be asserted. No TLS, so
+use ``EmailSender(use_tls=False)`` against it.
+"""
+
+import base64
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        stub = self.server.stub
+        stub._record("connections")
+        self.reply("220 localhost SMTP stub ready")
+
+        mail_from = None
+        recipients = []
+        messages_on_connection = 0
+
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            command = line[:4].upper()
+
+            if command in ("EHLO", "HELO"):
+                if command == "EHLO":
+                    self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                else:
+                    self.reply("250 localhost")
+            elif command == "AUTH":
+                parts = line.split()
+                if parts[1].upper() == "PLAIN":
+                    if len(parts) > 2:
+                        credentials = parts[2]
+                    else:
+                        self.reply("334 ")
+                        credentials = self.rfile.readline().decode("ascii").strip()
+                    _, user, password = base64.b64decode(credentials).decode("utf-8").split("\0")
+                else:
+                    self.reply("334 VXNlcm5hbWU6")
+                    user = base64.b64decode(self.rfile.readline().strip()).decode("utf-8")
+                    self.reply("334 UGFzc3dvcmQ6")
+                    password = base64.b64decode(self.rfile.readline().strip()).decode("utf-8")
+
+                if stub.password is not None and password != stub.password:
+                    self.reply("535 5.7.8 Authentication credentials invalid")
+                else:
+                    stub._record("logins")
+                    self.reply("235 2.7.0 Authentication successful")
+            elif command == "MAIL":
+                mail_from = line.split(":", 1)[1].strip().strip("<>")
+                recipients = []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipient = line.split(":", 1)[1].strip().strip("<>")
+                if recipient in stub.reject_recipients:
+                    self.reply("550 5.1.1 Recipient rejected")
+                else:
+                    recipients.append(recipient)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                chunks = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line == b".\r\n":
+                        break
+                    if data_line.startswith(b".."):
+                        data_line = data_line[1:]
+                    chunks.append(data_line)
+                stub._deliver(mail_from, recipients, b"".join(chunks))
+                messages_on_connection += 1
+                self.reply("250 OK queued")
+
+                if stub.drop_after and messages_on_connection >= stub.drop_after:
+                    # Simulate a provider closing idle/long-lived sessions
+                    return
+            elif command == "RSET":
+                mail_from, recipients = None, []
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPStub:
+    """Threaded in-process SMTP server bound to 127.0.0.1 on a free port"""
+
+    def __init__(self, password=None, drop_after=None, reject_recipients=()):
+        self.password = password
+        self.drop_after = drop_after
+        self.reject_recipients = set(reject_recipients)
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _record(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _deliver(self, mail_from, recipients, data):
+        with self._lock:
+            self.messages.append({"from": mail_from, "to": list(recipients), "data": data})
+
+    def start(self):
+        self._server = _ThreadedServer(("127.0.0.1", 0), _SMTPHandler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import time
+
+    with LocalSMTPStub() as stub:
+        print(f"SMTP stub listening on {stub.host}:{stub.port} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"\nReceived {len(stub.messages)} messages over {stub.connections} connections")
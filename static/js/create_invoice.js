@@ -274,13 +274,28 @@ async function generateInvoice() {
         console.log('✅ Invoice data prepared successfully');
         console.log('🌐 Making API request to /api/create-invoice...');
         
-        const response = await InvoiceGenerator.apiRequest('/api/create-invoice', {
+        let response = await InvoiceGenerator.apiRequest('/api/create-invoice', {
             method: 'POST',
             body: JSON.stringify(invoiceData)
         });
         
         console.log('✅ API response received:', response);
         
+        // Large invoices are rendered by a background job
+        if (response.job_id) {
+            const subtext = document.getElementById('loadingSubtext');
+            const job = await InvoiceGenerator.waitForJob(response, state => {
+                if (subtext) {
+                    subtext.textContent = `${state.stage.replace(/_/g, ' ')} (${state.progress}%)`;
+                }
+            });
+            
+            if (job.status !== 'succeeded') {
+                throw new Error(job.error || 'Invoice is still rendering; check the invoice list shortly');
+            }
+            response = { success: true, ...job.result };
+        }
+        
         currentInvoiceData = {
             ...invoiceData,
             ...response
@@ -680,6 +695,8 @@ marketerrobi@gmail.com`;
     document.getElementById('emailMessage').value = message;
 }
 
+let emailIdempotencyKey = null;
+
 async function sendInvoiceEmail() {
     console.log('📤 Starting email send process...');
     
@@ -728,12 +745,26 @@ async function sendInvoiceEmail() {
             sender_password: '[HIDDEN]' // Don't log password
         });
         
+        // Reuse the key on retries so a resubmitted form cannot send twice
+        emailIdempotencyKey = emailIdempotencyKey || InvoiceGenerator.newIdempotencyKey();
+        
         const response = await InvoiceGenerator.apiRequest('/api/send-email', {
             method: 'POST',
+            headers: { 'Idempotency-Key': emailIdempotencyKey },
             body: JSON.stringify(emailData)
         });
         
-        console.log('✅ Email sent successfully:', response);
+        console.log('📬 Email queued:', response);
+        
+        // The server answers immediately; wait for the outbox to deliver it
+        const delivery = await InvoiceGenerator.waitForEmailDelivery(response.email_id);
+        if (delivery.status === 'failed') {
+            emailIdempotencyKey = null;
+            throw new Error(delivery.last_error || 'Email delivery failed');
+        }
+        emailIdempotencyKey = null;
+        
+        console.log('✅ Email delivery status:', delivery.status);
         
         // Hide loading modal
         InvoiceGenerator.hideLoadingModal();
@@ -745,7 +776,11 @@ async function sendInvoiceEmail() {
         }
         
         // Show success message
-        InvoiceGenerator.showToast('📧 Invoice sent successfully via email!', 'success');
+        if (delivery.status === 'sent') {
+            InvoiceGenerator.showToast('📧 Invoice sent successfully via email!', 'success');
+        } else {
+            InvoiceGenerator.showToast('📧 Invoice queued; it will be sent shortly.', 'info');
+        }
         
         // Clear sensitive data
         document.getElementById('senderPassword').value = '';
@@ -197,6 +197,84 @@ async function apiRequest(url, options = {}) {
     }
 }
 
+// Poll a queued email until the outbox reports it sent or failed
+async function waitForEmailDelivery(emailId, timeoutMs = 60000) {
+    const deadline = Date.now() + timeoutMs;
+    let delay = 500;
+    
+    while (Date.now() < deadline) {
+        const status = await apiRequest(`/api/email-status/${emailId}`);
+        if (status.status === 'sent' || status.status === 'failed') {
+            return status;
+        }
+        await new Promise(resolve => setTimeout(resolve, delay));
+        delay = Math.min(delay * 2, 5000);
+    }
+    
+    return { status: 'pending' };
+}
+
+// Follow a background render job until it finishes; resolves with the final job state
+function waitForJob(job, onProgress = null, timeoutMs = 600000) {
+    const finished = status => status === 'succeeded' || status === 'failed';
+    
+    const poll = async () => {
+        const deadline = Date.now() + timeoutMs;
+        let delay = 500;
+        while (Date.now() < deadline) {
+            const state = await apiRequest(job.status_url);
+            if (onProgress) {
+                onProgress(state);
+            }
+            if (finished(state.status)) {
+                return state;
+            }
+            await new Promise(resolve => setTimeout(resolve, delay));
+            delay = Math.min(delay * 2, 5000);
+        }
+        return { status: 'pending' };
+    };
+    
+    if (!window.EventSource || !job.events_url) {
+        return poll();
+    }
+    
+    return new Promise(resolve => {
+        const source = new EventSource(job.events_url);
+        const timer = setTimeout(() => {
+            source.close();
+            resolve({ status: 'pending' });
+        }, timeoutMs);
+        
+        const handle = event => {
+            const state = JSON.parse(event.data);
+            if (onProgress) {
+                onProgress(state);
+            }
+            if (finished(state.status)) {
+                clearTimeout(timer);
+                source.close();
+                resolve(state);
+            }
+        };
+        source.addEventListener('progress', handle);
+        source.addEventListener('done', handle);
+        source.onerror = () => {
+            // Fall back to polling if the stream cannot be kept open
+            clearTimeout(timer);
+            source.close();
+            poll().then(resolve);
+        };
+    });
+}
+
+function newIdempotencyKey() {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+}
+
 // Download helper functions
 function downloadFile(url, filename) {
     const link = document.createElement('a');
@@ -340,6 +418,9 @@ window.InvoiceGenerator = {
     showLoadingModal,
     hideLoadingModal,
     apiRequest,
+    waitForEmailDelivery,
+    waitForJob,
+    newIdempotencyKey,
     downloadFile,
     validateRequired,
     parseNumber,
@@ -1,12 +1,18 @@
 // View Invoices JavaScript
 
-let allInvoices = [];
-let filteredInvoices = [];
+const PAGE_SIZE = 50;
+
+let allInvoices = [];      // Invoices loaded so far for the current filters
+let nextCursor = null;     // Cursor for the next page, null when exhausted
+let totalCount = 0;
+let isLoadingPage = false;
+let pageRequestId = 0;     // Discards responses for superseded filter changes
 
 // Initialize page
 document.addEventListener('DOMContentLoaded', function() {
     loadInvoices();
     setupEventListeners();
+    setupInfiniteScroll();
 });
 
 function setupEventListeners() {
@@ -16,39 +22,116 @@ function setupEventListeners() {
     // Date filters
     document.getElementById('dateFromFilter').addEventListener('change', applyFilters);
     document.getElementById('dateToFilter').addEventListener('change', applyFilters);
+    
+    // Total range and sorting
+    document.getElementById('minTotalFilter').addEventListener('input', debounce(applyFilters, 300));
+    document.getElementById('maxTotalFilter').addEventListener('input', debounce(applyFilters, 300));
+    document.getElementById('sortFilter').addEventListener('change', applyFilters);
+}
+
+function setupInfiniteScroll() {
+    const sentinel = document.getElementById('invoicesSentinel');
+    if (!sentinel || !('IntersectionObserver' in window)) {
+        return;
+    }
+    
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    }, { rootMargin: '200px' });
+    observer.observe(sentinel);
+}
+
+function buildQueryParams() {
+    const params = new URLSearchParams();
+    const [sort, order] = document.getElementById('sortFilter').value.split(':');
+    const filters = {
+        q: document.getElementById('searchFilter').value.trim(),
+        date_from: document.getElementById('dateFromFilter').value,
+        date_to: document.getElementById('dateToFilter').value,
+        min_total: document.getElementById('minTotalFilter').value,
+        max_total: document.getElementById('maxTotalFilter').value,
+        sort: sort,
+        order: order
+    };
+    
+    Object.entries(filters).forEach(([key, value]) => {
+        if (value) {
+            params.set(key, value);
+        }
+    });
+    return params;
+}
+
+async function fetchInvoicePage(cursor = null, limit = PAGE_SIZE) {
+    const params = buildQueryParams();
+    params.set('limit', limit);
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    return InvoiceGenerator.apiRequest(`/api/get-all-invoices?${params.toString()}`);
 }
 
 async function loadInvoices() {
+    const requestId = ++pageRequestId;
+    isLoadingPage = true;
+    
     try {
-        const response = await InvoiceGenerator.apiRequest('/api/get-all-invoices');
+        const response = await fetchInvoicePage();
+        if (requestId !== pageRequestId) {
+            return;
+        }
+        
         allInvoices = response.invoices || [];
-        filteredInvoices = [...allInvoices];
+        nextCursor = response.next_cursor || null;
+        totalCount = response.total || 0;
         
         updateInvoicesTable();
         updateInvoiceCount();
         
     } catch (error) {
         InvoiceGenerator.showToast(`Error loading invoices: ${error.message}`, 'danger');
+    } finally {
+        if (requestId === pageRequestId) {
+            isLoadingPage = false;
+            updateLoadMore();
+        }
     }
 }
 
-function updateInvoicesTable() {
-    const tbody = document.getElementById('invoicesTableBody');
-    
-    if (filteredInvoices.length === 0) {
-        tbody.innerHTML = `
-            <tr>
-                <td colspan="6" class="text-center py-4">
-                    <i class="fas fa-file-invoice fa-3x text-muted mb-3"></i>
-                    <h5 class="text-muted">No invoices found</h5>
-                    <p class="text-muted">Try adjusting your filters or create a new invoice.</p>
-                </td>
-            </tr>
-        `;
+async function loadNextPage() {
+    if (isLoadingPage || !nextCursor) {
         return;
     }
     
-    tbody.innerHTML = filteredInvoices.map(invoice => `
+    const requestId = pageRequestId;
+    isLoadingPage = true;
+    
+    try {
+        const response = await fetchInvoicePage(nextCursor);
+        if (requestId !== pageRequestId) {
+            return;
+        }
+        
+        const page = response.invoices || [];
+        allInvoices = allInvoices.concat(page);
+        nextCursor = response.next_cursor || null;
+        
+        appendInvoiceRows(page);
+        
+    } catch (error) {
+        InvoiceGenerator.showToast(`Error loading more invoices: ${error.message}`, 'danger');
+    } finally {
+        if (requestId === pageRequestId) {
+            isLoadingPage = false;
+            updateLoadMore();
+        }
+    }
+}
+
+function renderInvoiceRow(invoice) {
+    return `
         <tr data-invoice="${invoice.number}">
             <td>
                 <strong class="text-primary">${invoice.number}</strong>
@@ -78,34 +161,50 @@ function updateInvoicesTable() {
                 </div>
             </td>
         </tr>
-    `).join('');
+    `;
+}
+
+function updateInvoicesTable() {
+    const tbody = document.getElementById('invoicesTableBody');
+    
+    if (allInvoices.length === 0) {
+        tbody.innerHTML = `
+            <tr>
+                <td colspan="6" class="text-center py-4">
+                    <i class="fas fa-file-invoice fa-3x text-muted mb-3"></i>
+                    <h5 class="text-muted">No invoices found</h5>
+                    <p class="text-muted">Try adjusting your filters or create a new invoice.</p>
+                </td>
+            </tr>
+        `;
+        return;
+    }
+    
+    tbody.innerHTML = allInvoices.map(renderInvoiceRow).join('');
+}
+
+function appendInvoiceRows(invoices) {
+    if (invoices.length === 0) {
+        return;
+    }
+    document.getElementById('invoicesTableBody').insertAdjacentHTML('beforeend', invoices.map(renderInvoiceRow).join(''));
 }
 
 function updateInvoiceCount() {
-    document.getElementById('invoiceCount').textContent = filteredInvoices.length;
+    document.getElementById('invoiceCount').textContent = totalCount;
+}
+
+function updateLoadMore() {
+    const sentinel = document.getElementById('invoicesSentinel');
+    if (sentinel) {
+        sentinel.classList.toggle('d-none', !nextCursor);
+    }
 }
 
 function applyFilters() {
-    const searchTerm = document.getElementById('searchFilter').value.toLowerCase();
-    const dateFrom = document.getElementById('dateFromFilter').value;
-    const dateTo = document.getElementById('dateToFilter').value;
-    
-    filteredInvoices = allInvoices.filter(invoice => {
-        // Search filter
-        const matchesSearch = !searchTerm || 
-            invoice.number.toLowerCase().includes(searchTerm) ||
-            invoice.client.toLowerCase().includes(searchTerm);
-        
-        // Date filters
-        const invoiceDate = new Date(invoice.date);
-        const matchesDateFrom = !dateFrom || invoiceDate >= new Date(dateFrom);
-        const matchesDateTo = !dateTo || invoiceDate <= new Date(dateTo);
-        
-        return matchesSearch && matchesDateFrom && matchesDateTo;
-    });
-    
-    updateInvoicesTable();
-    updateInvoiceCount();
+    // Filtering and sorting happen on the server; restart from the first page
+    nextCursor = null;
+    loadInvoices();
 }
 
 async function viewInvoice(invoiceNumber) {
@@ -452,6 +551,8 @@ marketerrobi@gmail.com`;
     modal.show();
 }
 
+let emailIdempotencyKey = null;
+
 async function sendInvoiceEmail() {
     console.log('📤 Starting invoice email send...');
     
@@ -497,12 +598,26 @@ async function sendInvoiceEmail() {
             sender_password: '[HIDDEN]'
         });
         
+        // Reuse the key on retries so a resubmitted form cannot send twice
+        emailIdempotencyKey = emailIdempotencyKey || InvoiceGenerator.newIdempotencyKey();
+        
         const response = await InvoiceGenerator.apiRequest('/api/send-email', {
             method: 'POST',
+            headers: { 'Idempotency-Key': emailIdempotencyKey },
             body: JSON.stringify(emailData)
         });
         
-        console.log('✅ Email sent successfully:', response);
+        console.log('📬 Email queued:', response);
+        
+        // The server answers immediately; wait for the outbox to deliver it
+        const delivery = await InvoiceGenerator.waitForEmailDelivery(response.email_id);
+        if (delivery.status === 'failed') {
+            emailIdempotencyKey = null;
+            throw new Error(delivery.last_error || 'Email delivery failed');
+        }
+        emailIdempotencyKey = null;
+        
+        console.log('✅ Email delivery status:', delivery.status);
         
         InvoiceGenerator.hideLoadingModal();
         
@@ -512,7 +627,11 @@ async function sendInvoiceEmail() {
             emailModal.hide();
         }
         
-        InvoiceGenerator.showToast('📧 Invoice sent successfully via email!', 'success');
+        if (delivery.status === 'sent') {
+            InvoiceGenerator.showToast('📧 Invoice sent successfully via email!', 'success');
+        } else {
+            InvoiceGenerator.showToast('📧 Invoice queued; it will be sent shortly.', 'info');
+        }
         
         // Clear sensitive data
         document.getElementById('senderPassword').value = '';
@@ -524,44 +643,26 @@ async function sendInvoiceEmail() {
     }
 }
 
-function exportAllInvoices() {
-    if (allInvoices.length === 0) {
+function exportAllInvoices(format = 'csv') {
+    if (totalCount === 0) {
         InvoiceGenerator.showToast('No invoices to export', 'warning');
         return;
     }
     
-    const loadingModal = InvoiceGenerator.showLoadingModal('Exporting All Invoices...', 'Preparing summary CSV file.');
-    
-    // Create CSV content
-    const headers = ['Invoice Number', 'Date', 'Client', 'Items', 'Total'];
-    const csvContent = [
-        headers.join(','),
-        ...allInvoices.map(invoice => [
-            invoice.number,
-            invoice.date,
-            `"${invoice.client}"`,
-            invoice.items_count,
-            invoice.total
-        ].join(','))
-    ].join('\n');
+    // The server streams the export, so let the browser download it directly
+    // instead of assembling it in memory here
+    const params = buildQueryParams();
+    params.set('format', format);
     
-    // Create and download file
-    const blob = new Blob([csvContent], { type: 'text/csv' });
-    const url = window.URL.createObjectURL(blob);
     const link = document.createElement('a');
-    link.href = url;
-    link.download = `all_invoices_${new Date().toISOString().split('T')[0]}.csv`;
+    link.href = `/api/export-all?${params.toString()}`;
+    link.download = '';
     
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
     
-    window.URL.revokeObjectURL(url);
-    
-    setTimeout(() => {
-        InvoiceGenerator.hideLoadingModal();
-        InvoiceGenerator.showToast('Export completed successfully');
-    }, 1000);
+    InvoiceGenerator.showToast(format === 'zip' ? 'ZIP export started' : 'Export started');
 }
 
 // Debounce function for search
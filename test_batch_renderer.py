@@ -0,0 +1,119 @@
+# Test file for the batch PDF rendering engine
+# Run this to test batch rendering, error isolation and reporting
+
+import os
+import tempfile
+
+from batch_renderer import BatchRenderer, render_invoice_payload
+from invoice_paths import InvoicePaths
+
+
+def make_payload(invoice_number, items=3):
+    """Build a minimal /api/create-invoice style payload"""
+    return {
+        "business_name": "Batch Test Business",
+        "business_address": "1 Batch Street",
+        "business_phone": "(555) 000-0000",
+        "client_name": f"Client {invoice_number}",
+        "client_address": "2 Client Road",
+        "invoice_number": invoice_number,
+        "invoice_date": "2025-06-01",
+        "tax_rate": 10.0,
+        "discount": 0,
+        "items": [
+            {"description": f"Service {i}", "quantity": 1, "unit_price": 100.0}
+            for i in range(items)
+        ]
+    }
+
+
+def test_batch_render_with_pool():
+    """Render a batch across worker processes and check the report"""
+    print("Testing batch rendering with a process pool...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            payloads = (make_payload(f"BATCH-{n:03d}") for n in range(12))
+            renderer = BatchRenderer(max_workers=2, max_in_flight=3)
+            report = renderer.render(payloads)
+
+            print(report.summary())
+            assert report.succeeded == 12
+            assert report.failed == 0
+            assert report.throughput > 0
+            assert os.path.exists(InvoicePaths().pdf_path("BATCH-007"))
+            assert os.path.exists(InvoicePaths().json_path("BATCH-007"))
+        finally:
+            os.chdir(cwd)
+
+    print("✅ Batch rendering test PASSED!")
+
+
+def test_batch_error_isolation():
+    """A broken payload must not stop the rest of the batch"""
+    print("\nTesting per-invoice error isolation...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            broken = make_payload("BATCH-BAD")
+            del broken["client_name"]
+            payloads = [make_payload("BATCH-OK-1"), broken, make_payload("BATCH-OK-2")]
+
+            results = []
+            report = BatchRenderer(max_workers=1).render(
+                payloads, progress_callback=lambda result, _: results.append(result)
+            )
+
+            assert report.succeeded == 2
+            assert report.failed == 1
+            assert report.failures[0]["invoice_number"] == "BATCH-BAD"
+            assert "KeyError" in report.failures[0]["error"]
+            assert len(results) == 3
+        finally:
+            os.chdir(cwd)
+
+    print("✅ Error isolation test PASSED!")
+
+
+def test_render_single_payload():
+    """The worker function returns a result dict instead of raising"""
+    print("\nTesting single payload rendering...")
+
+    result = render_invoice_payload("not a payload")
+    assert result["success"] is False
+    assert result["invoice_number"] == ""
+
+    print("✅ Single payload test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Batch Renderer Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Batch Rendering", test_batch_render_with_pool),
+        ("Error Isolation", test_batch_error_isolation),
+        ("Single Payload", test_render_single_payload)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,67 @@
+# Test file for the benchmark suite runner
+# Runs a tiny ledger through a couple of benchmarks and checks the comparison
+
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+import run_benchmarks
+
+
+def test_suite_and_compare():
+    """Results are recorded per benchmark and slowdowns past the threshold are flagged"""
+    print("Testing benchmark suite...")
+
+    cwd = os.getcwd()
+    results = run_benchmarks.run_suite(invoices=3, items=2, repeat=2,
+                                       only=['calculate_totals', 'web_get_invoice'], log=print)
+    assert os.getcwd() == cwd
+    assert set(results['results']) == {'calculate_totals', 'web_get_invoice'}
+    assert results['meta']['invoices'] == 3
+    for result in results['results'].values():
+        assert len(result['runs_ms']) == 2
+        assert 0 < result['min_ms'] <= result['median_ms']
+
+    baseline = copy.deepcopy(results)
+    baseline['results']['calculate_totals']['min_ms'] /= 2
+    del baseline['results']['web_get_invoice']
+    rows = run_benchmarks.compare(results, baseline, threshold=0.35)
+    assert [(name, regressed) for name, _, _, _, regressed in rows] == [('calculate_totals', True)]
+    assert not run_benchmarks.compare(results, results)[0][4]
+
+    try:
+        run_benchmarks.run_suite(only=['no_such_benchmark'])
+        assert False, "unknown benchmark accepted"
+    except ValueError:
+        pass
+
+    print("✅ Benchmark suite test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Benchmark Suite Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Suite and Compare", test_suite_and_compare)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
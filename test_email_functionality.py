@@ -95,14 +95,24 @@ def test_email_functionality():
             headers={'Content-Type': 'application/json'}
         )
         
-        # This should fail due to fake credentials, but the API should handle it gracefully
-        if email_response.status_code == 500:
-            response_data = email_response.json()
-            if 'error' in response_data:
+        # The email is queued and the API answers immediately with an id
+        if email_response.status_code == 202:
+            email_id = email_response.json()['email_id']
+            print(f"✅ Email queued with id {email_id}")
+            
+            # Delivery should fail due to fake credentials, reported via the status endpoint
+            status = {}
+            for _ in range(30):
+                status = requests.get(f"{base_url}/api/email-status/{email_id}").json()
+                if status.get('status') in ('sent', 'failed'):
+                    break
+                time.sleep(1)
+            
+            if status.get('status') == 'failed' and status.get('last_error'):
                 print("✅ API handles invalid email credentials gracefully")
-                print(f"   Expected error: {response_data['error']}")
+                print(f"   Expected error: {status['last_error']}")
             else:
-                print("⚠️ API error handling might need improvement")
+                print(f"⚠️ Unexpected delivery status: {status.get('status')}")
         else:
             print(f"⚠️ Unexpected response: {email_response.status_code}")
         
@@ -110,7 +120,7 @@ def test_email_functionality():
         print("✅ Invoice creation works")
         print("✅ Email API endpoint exists")
         print("✅ Email API validates required fields")
-        print("✅ Email API handles errors gracefully")
+        print("✅ Email API queues sends and reports failures via /api/email-status")
         print("\n🎯 To test actual email sending:")
         print("1. Use the web interface at http://localhost:5000")
         print("2. Create an invoice")
@@ -0,0 +1,222 @@
+# Test file for the asynchronous email outbox
+# Runs against the in-process SMTP stub, no real mail server needed
+
+import os
+import sqlite3
+import tempfile
+import time
+
+from email_outbox import EmailOutbox
+from email_sender import EmailSender
+from smtp_stub import LocalSMTPStub
+
+
+def make_message(workdir, invoice_number="OUTBOX-001", recipient="client@example.com"):
+    pdf_path = os.path.join(workdir, f"invoice_{invoice_number}.pdf")
+    with open(pdf_path, 'wb') as f:
+        f.write(b"%PDF-1.4\n% stub invoice\n")
+    return {
+        'sender_email': "billing@example.com",
+        'recipient_email': recipient,
+        'invoice_pdf_path': pdf_path,
+        'invoice_number': invoice_number,
+        'client_name': "Outbox Client",
+        'business_name': "Outbox Business"
+    }
+
+
+def wait_for(outbox, email_id, statuses=('sent', 'failed'), timeout=10):
+    deadline = time.time() + timeout
+    status = outbox.get_status(email_id)
+    while status['status'] not in statuses and time.time() < deadline:
+        time.sleep(0.05)
+        status = outbox.get_status(email_id)
+    return status
+
+
+def test_outbox_delivers_in_background():
+    """enqueue returns at once and a worker delivers the message"""
+    print("Testing background delivery...")
+
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPStub(password="secret") as stub:
+        sender = EmailSender(stub.host, stub.port, use_tls=False)
+        outbox = EmailOutbox(os.path.join(workdir, "outbox.sqlite3"), sender, poll_interval=0.05).start()
+        try:
+            status, created = outbox.enqueue(make_message(workdir), "secret", idempotency_key="key-1")
+            assert created and status['status'] == 'queued'
+            assert 'secret' not in str(status)
+
+            status = wait_for(outbox, status['id'])
+            print(f"Final status: {status['status']} after {status['attempts']} attempt(s)")
+            assert status['status'] == 'sent'
+            assert len(stub.messages) == 1
+
+            # Resubmitting with the same key must not send again
+            again, created = outbox.enqueue(make_message(workdir), "secret", idempotency_key="key-1")
+            assert not created and again['id'] == status['id']
+            time.sleep(0.2)
+            assert len(stub.messages) == 1
+        finally:
+            outbox.stop()
+
+    print("✅ Background delivery test PASSED!")
+
+
+def test_outbox_retries_with_backoff():
+    """Transient failures are retried until the server comes back"""
+    print("\nTesting retry with backoff...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = LocalSMTPStub()
+        stub.start()
+        port = stub.port
+        stub.stop()  # nothing listening: connection refused
+
+        sender = EmailSender("127.0.0.1", port, use_tls=False, timeout=2)
+        outbox = EmailOutbox(os.path.join(workdir, "outbox.sqlite3"), sender,
+                             max_attempts=3, base_backoff=0.05, poll_interval=0.02).start()
+        try:
+            status, _ = outbox.enqueue(make_message(workdir), "any")
+            status = wait_for(outbox, status['id'], statuses=('failed',))
+            print(f"Final status: {status['status']} after {status['attempts']} attempts: {status['last_error']}")
+            assert status['status'] == 'failed'
+            assert status['attempts'] == 3
+        finally:
+            outbox.stop()
+
+    print("✅ Retry test PASSED!")
+
+
+def test_outbox_permanent_failure():
+    """Rejected recipients fail immediately without retrying"""
+    print("\nTesting permanent failures...")
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            LocalSMTPStub(reject_recipients={"bounce@example.com"}) as stub:
+        sender = EmailSender(stub.host, stub.port, use_tls=False)
+        outbox = EmailOutbox(os.path.join(workdir, "outbox.sqlite3"), sender, poll_interval=0.05).start()
+        try:
+            status, _ = outbox.enqueue(make_message(workdir, recipient="bounce@example.com"), "any")
+            status = wait_for(outbox, status['id'])
+            assert status['status'] == 'failed'
+            assert status['attempts'] == 1
+            assert "rejected" in status['last_error']
+        finally:
+            outbox.stop()
+
+    print("✅ Permanent failure test PASSED!")
+
+
+def test_worker_survives_unexpected_errors():
+    """Errors outside the SMTP send are logged and the worker keeps going"""
+    print("\nTesting worker resilience...")
+
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPStub(password="secret") as stub:
+        sender = EmailSender(stub.host, stub.port, use_tls=False)
+        outbox = EmailOutbox(os.path.join(workdir, "outbox.sqlite3"), sender, workers=1,
+                             base_backoff=0.01, poll_interval=0.02)
+
+        claim_next, process = outbox._claim_next, outbox._process
+        failures = {'claim': 2, 'process': 1}
+
+        def flaky_claim():
+            if failures['claim']:
+                failures['claim'] -= 1
+                raise sqlite3.OperationalError("database is locked")
+            return claim_next()
+
+        def flaky_process(job, sessions):
+            if failures['process']:
+                failures['process'] -= 1
+                raise RuntimeError("unexpected bug")
+            return process(job, sessions)
+
+        outbox._claim_next, outbox._process = flaky_claim, flaky_process
+        outbox.start()
+        try:
+            status, _ = outbox.enqueue(make_message(workdir), "secret")
+            status = wait_for(outbox, status['id'])
+            print(f"Final status: {status['status']} after {status['attempts']} attempts")
+            assert status['status'] == 'sent' and status['attempts'] == 2
+            assert failures == {'claim': 0, 'process': 0}
+            assert all(thread.is_alive() for thread in outbox._threads)
+            assert len(stub.messages) == 1
+        finally:
+            outbox.stop()
+
+    print("✅ Worker resilience test PASSED!")
+
+
+def test_outboxes_sharing_a_database():
+    """Each process only sends its own jobs, leases stop double sends, orphans fail"""
+    print("\nTesting outboxes sharing one database...")
+
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPStub(password="secret") as stub:
+        db_path = os.path.join(workdir, "outbox.sqlite3")
+        sender = EmailSender(stub.host, stub.port, use_tls=False)
+        owner = EmailOutbox(db_path, sender, poll_interval=0.05)
+        other = EmailOutbox(db_path, sender, poll_interval=0.05).start()
+        try:
+            status, _ = owner.enqueue(make_message(workdir), "secret")
+            time.sleep(0.3)
+            assert owner.get_status(status['id'])['status'] == 'queued'
+
+            # Mid-send in the owner: opening another outbox must not requeue it
+            assert owner._claim_next()['id'] == status['id']
+            EmailOutbox(db_path, sender)
+            time.sleep(0.3)
+            assert owner.get_status(status['id'])['status'] == 'sending' and not stub.messages
+
+            # The owner's worker died mid-send: once the lease runs out it is sent again, once
+            conn = sqlite3.connect(db_path)
+            with conn:
+                conn.execute("UPDATE outbox SET claimed_until = 0 WHERE id = ?", (status['id'],))
+            conn.close()
+            owner.start()
+            assert wait_for(owner, status['id'])['status'] == 'sent'
+            owner.stop()
+            assert len(stub.messages) == 1
+
+            # Queued by an outbox that has since stopped: nobody has the password
+            gone = EmailOutbox(db_path, sender)
+            orphan, _ = gone.enqueue(make_message(workdir, "OUTBOX-ORPHAN"), "secret")
+            gone.stop()
+            orphan = wait_for(other, orphan['id'])
+            print(f"Orphaned job: {orphan['status']} ({orphan['last_error']})")
+            assert orphan['status'] == 'failed' and "no longer available" in orphan['last_error']
+            assert len(stub.messages) == 1
+        finally:
+            other.stop()
+
+    print("✅ Shared database test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Email Outbox Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Background Delivery", test_outbox_delivers_in_background),
+        ("Retry With Backoff", test_outbox_retries_with_backoff),
+        ("Permanent Failure", test_outbox_permanent_failure),
+        ("Worker Resilience", test_worker_survives_unexpected_errors),
+        ("Shared Database", test_outboxes_sharing_a_database)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
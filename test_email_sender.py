@@ -0,0 +1,127 @@
+# Test file for EmailSender connection reuse and bulk sending
+# Runs against the in-process SMTP stub, no real mail server needed
+
+import os
+import tempfile
+import time
+
+from email_sender import EmailSender
+from smtp_stub import LocalSMTPStub
+
+
+def make_pdf(directory, name="invoice_BULK.pdf"):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n% stub invoice\n")
+    return path
+
+
+def make_messages(pdf_path, count, reject=()):
+    return [{
+        'recipient_email': f"client{n}@example.com" if n not in reject else "bounce@example.com",
+        'invoice_pdf_path': pdf_path,
+        'invoice_number': f"BULK-{n:03d}",
+        'client_name': f"Client {n}",
+        'business_name': "Bulk Test Business"
+    } for n in range(count)]
+
+
+def test_send_many_reuses_connection():
+    """Many messages share one connection and one login"""
+    print("Testing bulk send over a single connection...")
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            LocalSMTPStub(password="secret", reject_recipients={"bounce@example.com"}) as stub:
+        sender = EmailSender(stub.host, stub.port, use_tls=False, debug_level=0)
+        results = sender.send_many("billing@example.com", "secret",
+                                   make_messages(make_pdf(workdir), 20, reject={3}))
+
+        print(f"Connections: {stub.connections}, logins: {stub.logins}, messages: {len(stub.messages)}")
+        assert stub.connections == 1
+        assert stub.logins == 1
+        assert len(stub.messages) == 19
+        assert [r['success'] for r in results].count(False) == 1
+        assert results[3]['success'] is False and "rejected" in results[3]['message']
+        assert results[4]['invoice_number'] == "BULK-004" and results[4]['success']
+
+    print("✅ Connection reuse test PASSED!")
+
+
+def test_reconnect_after_disconnect():
+    """A server that drops the connection is reconnected transparently"""
+    print("\nTesting reconnect on SMTPServerDisconnected...")
+
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPStub(drop_after=4) as stub:
+        sender = EmailSender(stub.host, stub.port, use_tls=False, debug_level=0)
+        results = sender.send_many("billing@example.com", "any", make_messages(make_pdf(workdir), 10))
+
+        assert all(r['success'] for r in results)
+        assert len(stub.messages) == 10
+        assert stub.connections == 3
+
+    print("✅ Reconnect test PASSED!")
+
+
+def test_rate_limit_and_pool():
+    """A pooled send honours the configured rate limit"""
+    print("\nTesting rate-limited pooled send...")
+
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPStub() as stub:
+        sender = EmailSender(stub.host, stub.port, use_tls=False, debug_level=0)
+        started = time.perf_counter()
+        results = sender.send_many("billing@example.com", "any", make_messages(make_pdf(workdir), 10),
+                                   rate_limit=50, pool_size=2)
+        elapsed = time.perf_counter() - started
+
+        print(f"Elapsed: {elapsed:.3f}s over {stub.connections} connections")
+        assert all(r['success'] for r in results)
+        assert elapsed >= 9 / 50
+        assert stub.connections <= 2
+
+    print("✅ Rate limit test PASSED!")
+
+
+def test_auth_failure_aborts_run():
+    """Bad credentials fail every message without retrying the login each time"""
+    print("\nTesting authentication failure handling...")
+
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPStub(password="secret") as stub:
+        sender = EmailSender(stub.host, stub.port, use_tls=False, debug_level=0)
+        results = sender.send_many("billing@example.com", "wrong", make_messages(make_pdf(workdir), 5))
+
+        assert not any(r['success'] for r in results)
+        assert "Authentication Failed" in results[-1]['message']
+        assert stub.connections == 1
+        assert stub.messages == []
+
+    print("✅ Authentication failure test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Email Sender Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Connection Reuse", test_send_many_reuses_connection),
+        ("Reconnect", test_reconnect_after_disconnect),
+        ("Rate Limit", test_rate_limit_and_pool),
+        ("Auth Failure", test_auth_failure_aborts_run)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,76 @@
+# Test file for CLI start-up cost
+# Fails when an entry point goes over its import budget or loads a heavy module eagerly
+
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+import bench_import_time
+
+
+def test_import_budgets():
+    """main.py and the modules it loads lazily stay within their -X importtime budgets"""
+    print("Testing import-time budgets...")
+
+    for module in bench_import_time.BUDGETS:
+        ms, budget_ms, loaded = bench_import_time.check(module, runs=3)
+        print(f"{module}: {ms:.1f} ms (budget {budget_ms} ms), heavy imports: {loaded or 'none'}")
+        assert not loaded, f"{module} imports {', '.join(loaded)} at load time"
+        assert ms <= budget_ms, f"{module} took {ms:.1f} ms to import (budget {budget_ms} ms)"
+
+    print("✅ Import budget test PASSED!")
+
+
+def test_cli_loads_subcommands_lazily():
+    """run_cli only imports the module behind the subcommand that runs"""
+    print("\nTesting lazy subcommand imports...")
+
+    script = (
+        "import sys, main\n"
+        "try:\n"
+        "    main.run_cli(['batch', '--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "assert 'invoice_import' not in sys.modules, 'batch loaded invoice_import'\n"
+        "try:\n"
+        "    main.run_cli(['import', '--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "assert 'invoice_import' in sys.modules\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "--checkpoint" in result.stdout
+
+    print("✅ Lazy subcommand import test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Import Time Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Import Budgets", test_import_budgets),
+        ("Lazy Subcommand Imports", test_cli_loads_subcommands_lazily)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
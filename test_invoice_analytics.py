@@ -0,0 +1,153 @@
+# Test file for the revenue analytics aggregates
+# Run this to test incremental updates, backfill and the reports API
+
+import json
+import os
+import tempfile
+
+from invoice_index import InvoiceIndex
+
+
+def make_data(number, client, invoice_date, total, tax_rate=0.0, payment_terms="", paid_date=None):
+    data = {
+        'invoice_number': number,
+        'invoice_date': invoice_date,
+        'business_info': {'name': "Analytics Co"},
+        'client_info': {'name': client, 'address': ""},
+        'items': [],
+        'tax_rate': tax_rate,
+        'discount': 0.0,
+        'payment_terms': payment_terms,
+        'totals': {'subtotal': total, 'discount_amount': 0.0,
+                   'tax_amount': round(total * tax_rate / 100, 2), 'total': round(total * (1 + tax_rate / 100), 2)}
+    }
+    if paid_date:
+        data['paid_date'] = paid_date
+    return data
+
+
+def save(index, data):
+    """Write the invoice JSON like save_invoice_data and upsert it"""
+    path = os.path.join(index.invoices_dir, f"invoice_{data['invoice_number']}.json")
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    index.upsert(data, os.path.getmtime(path))
+
+
+def test_incremental_aggregates():
+    """Saving, re-saving and removing invoices keeps every aggregate exact"""
+    print("Testing incremental aggregates...")
+
+    with tempfile.TemporaryDirectory() as invoices_dir:
+        index = InvoiceIndex(invoices_dir)
+        save(index, make_data("A-1", "Acme", "2025-01-10", 100.10, 10, "Net 30"))
+        save(index, make_data("A-2", "Acme", "2025-02-03", 50.05, 10))
+        save(index, make_data("G-1", "Globex", "2025-02-20", 0.1, 0, "Net 15", paid_date="2025-03-01"))
+        save(index, make_data("I-1", "Initech", "2025-03-01", 999.99, 5, "Net 60"))
+
+        # Re-save moves the invoice to another client and month; remove drops it entirely
+        save(index, make_data("A-2", "Globex", "2025-03-15", 20.00, 5))
+        os.remove(os.path.join(invoices_dir, "invoice_I-1.json"))
+        index.remove("I-1")
+
+        clients = {row['client_name']: row for row in index.report('by_client')}
+        assert set(clients) == {"Acme", "Globex"}
+        assert clients["Acme"]['invoices'] == 1 and clients["Acme"]['total'] == 110.11
+        assert clients["Globex"]['total'] == 21.1
+        assert clients["Globex"]['outstanding'] == 21.0
+
+        months = [(row['month'], row['invoices'], row['total']) for row in index.report('by_month')]
+        assert months == [("2025-01", 1, 110.11), ("2025-02", 1, 0.1), ("2025-03", 1, 21.0)]
+        assert [row['month'] for row in index.report('by_month', month_from="2025-02")] == ["2025-02", "2025-03"]
+
+        tax_rates = {row['tax_rate']: row['tax'] for row in index.report('by_tax_rate')}
+        assert tax_rates == {0.0: 0.0, 5.0: 1.0, 10.0: 10.01}
+
+        summary = index.report('summary')
+        assert summary['invoices'] == 3 and summary['total'] == 131.21 and summary['outstanding'] == 131.11
+
+        # A-1 is due 2025-02-09 (Net 30), A-2 is due on its date, 2025-03-15
+        outstanding = index.report('outstanding', as_of="2025-03-20")
+        buckets = {bucket['bucket']: (bucket['invoices'], bucket['total']) for bucket in outstanding['buckets']}
+        assert outstanding['total'] == 131.11
+        assert buckets['1-30'] == (1, 21.0)
+        assert buckets['31-60'] == (1, 110.11)
+        assert buckets['current'] == (0, 0.0)
+
+    print("✅ Incremental aggregates test PASSED!")
+
+
+def test_backfill_and_reports_api():
+    """An index without aggregates is backfilled, and /api/reports serves them"""
+    print("\nTesting backfill and reports API...")
+
+    from web_app import app
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            client = app.test_client()
+            for n, name in enumerate(["Acme", "Acme", "Globex"]):
+                response = client.post('/api/create-invoice', json={
+                    'business_name': "Reports Co", 'business_address': "1 Ledger Row", 'business_phone': "1",
+                    'client_name': name, 'client_address': "2 Client Way",
+                    'invoice_number': f"REP-{n}", 'invoice_date': f"2025-0{n + 4}-01",
+                    'payment_terms': "Net 30",
+                    'items': [{'description': "Work", 'quantity': 2, 'unit_price': 25}]
+                })
+                assert response.status_code == 200
+
+            # Simulate an index built before the analytics tables existed
+            index = InvoiceIndex()
+            conn = index._connect()
+            with conn:
+                index.analytics.clear(conn)
+            assert index.analytics.summary(conn)['invoices'] == 0
+            conn.close()
+            assert index.sync() == 0
+            assert index.report('summary')['invoices'] == 3
+
+            body = client.get('/api/reports/by-client?limit=1').get_json()
+            assert body['success'] and body['data'][0]['client_name'] == "Acme"
+            assert body['data'][0]['total'] == 100.0
+
+            body = client.get('/api/reports/outstanding?as_of=2025-06-15').get_json()
+            assert body['data']['total'] == 150.0
+            assert client.get('/api/reports/by-month?from=2025-05').get_json()['data'][0]['month'] == "2025-05"
+
+            assert client.get('/api/reports/nope').status_code == 404
+            assert client.get('/api/reports/by-client?sort=bogus').status_code == 400
+            assert client.get('/api/reports/outstanding?as_of=June').status_code == 400
+        finally:
+            os.chdir(cwd)
+
+    print("✅ Backfill and reports API test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Analytics Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Incremental Aggregates", test_incremental_aggregates),
+        ("Backfill and Reports API", test_backfill_and_reports_api)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,179 @@
+# Test file for InvoiceExporter bulk exports
+# Run this to test the streaming all-invoices summary export
+
+import csv
+import gzip
+import json
+import os
+import tempfile
+import tracemalloc
+import zipfile
+
+from invoice_exporter import InvoiceExporter, SUMMARY_HEADER
+from invoice_index import InvoiceIndex
+
+
+def write_invoices(invoices_dir, count, items_per_invoice=20):
+    """Write synthetic invoice JSON files straight to disk"""
+    os.makedirs(invoices_dir, exist_ok=True)
+    for n in range(count):
+        data = {
+            'business_info': {'name': 'Export Test Business', 'address': '1 Export St', 'phone': '', 'email': ''},
+            'client_info': {'name': f'Client {n}', 'address': f'{n} Client Road', 'phone': '', 'email': ''},
+            'invoice_number': f'EXP-{n:05d}',
+            'invoice_date': '2025-03-01',
+            'items': [
+                {'description': f'Line {i}', 'quantity': 1, 'unit_price': 10.0, 'total_price': 10.0}
+                for i in range(items_per_invoice)
+            ],
+            'tax_rate': 0.0,
+            'discount': 0.0,
+            'payment_terms': 'Net 30',
+            'totals': {'subtotal': 10.0 * items_per_invoice, 'discount_amount': 0.0,
+                       'tax_amount': 0.0, 'total': 10.0 * items_per_invoice}
+        }
+        with open(os.path.join(invoices_dir, f"invoice_EXP-{n:05d}.json"), 'w') as f:
+            json.dump(data, f)
+
+
+def make_exporter(workdir):
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        exporter = InvoiceExporter()
+    finally:
+        os.chdir(cwd)
+    exporter.exports_dir = os.path.join(workdir, exporter.exports_dir)
+    return exporter
+
+
+def export_peak_memory(workdir, count):
+    """Peak traced memory while exporting ``count`` invoices"""
+    exporter = make_exporter(workdir)
+    exporter.invoices_dir = os.path.join(workdir, f"invoices_{count}")
+    write_invoices(exporter.invoices_dir, count)
+
+    tracemalloc.start()
+    path = exporter.export_all_invoices_to_csv(chunk_size=100)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return path, peak
+
+
+def test_streaming_export():
+    """Every invoice is exported and peak memory does not grow with the ledger"""
+    print("Testing streaming summary export...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Both sizes are larger than the loader's read-ahead window
+        small_path, small_peak = export_peak_memory(workdir, 1000)
+        large_path, large_peak = export_peak_memory(workdir, 4000)
+
+        with open(large_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+
+        print(f"Peak memory: {small_peak / 1024:.0f} KiB for 1000 invoices, "
+              f"{large_peak / 1024:.0f} KiB for 4000 invoices")
+        assert rows[0] == SUMMARY_HEADER
+        assert len(rows) == 4001
+        assert large_peak < small_peak * 2
+
+    print("✅ Streaming export test PASSED!")
+
+
+def test_gzip_export():
+    """compress=True writes a readable .csv.gz"""
+    print("\nTesting gzip summary export...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        exporter = make_exporter(workdir)
+        exporter.invoices_dir = os.path.join(workdir, "invoices")
+        write_invoices(exporter.invoices_dir, 25)
+
+        path = exporter.export_all_invoices_to_csv(compress=True)
+        assert path.endswith('.csv.gz')
+        with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        assert len(rows) == 26
+        assert rows[1][7] == "$200.00"
+
+    print("✅ Gzip export test PASSED!")
+
+
+def test_empty_export():
+    """No file is created when there are no invoices"""
+    print("\nTesting export with no invoices...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        exporter = make_exporter(workdir)
+        exporter.invoices_dir = os.path.join(workdir, "missing")
+        assert exporter.export_all_invoices_to_csv() is None
+        assert os.listdir(os.path.join(workdir, "exports")) == []
+
+    print("✅ Empty export test PASSED!")
+
+
+def test_streamed_zip_export():
+    """stream_zip yields a valid archive in chunks without touching exports/"""
+    print("\nTesting streamed ZIP export...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        exporter = make_exporter(workdir)
+        exporter.invoices_dir = os.path.join(workdir, "invoices")
+        exporter.index = InvoiceIndex(exporter.invoices_dir)
+        write_invoices(exporter.invoices_dir, 30)
+        for number in ("EXP-00003", "EXP-00012"):
+            with open(os.path.join(exporter.invoices_dir, f"invoice_{number}.pdf"), 'wb') as f:
+                f.write(b"%PDF-1.4\n" + os.urandom(200 * 1024))
+
+        # Only invoices for clients starting with "Client 1" (1, 10-19)
+        source = lambda: exporter.iter_selected_invoices(client="Client 1", sort='number', order='asc')
+        chunks = list(exporter.stream_zip(source, chunk_size=16 * 1024))
+        print(f"Streamed {sum(map(len, chunks))} bytes in {len(chunks)} chunks")
+        assert len(chunks) > 1
+
+        with open(os.path.join(workdir, "out.zip"), 'wb') as f:
+            f.writelines(chunks)
+        with zipfile.ZipFile(os.path.join(workdir, "out.zip")) as archive:
+            assert archive.testzip() is None
+            names = archive.namelist()
+            summary = archive.read('all_invoices_summary.csv').decode('utf-8').splitlines()
+
+        assert len(summary) == 12
+        assert summary[1].startswith('EXP-00001,')
+        assert 'csv/invoice_EXP-00019.csv' in names
+        assert 'pdf/invoice_EXP-00012.pdf' in names
+        assert 'pdf/invoice_EXP-00003.pdf' not in names
+        assert os.listdir(exporter.exports_dir) == []
+
+    print("✅ Streamed ZIP export test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Exporter Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Streaming Export", test_streaming_export),
+        ("Gzip Export", test_gzip_export),
+        ("Empty Export", test_empty_export),
+        ("Streamed ZIP Export", test_streamed_zip_export)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
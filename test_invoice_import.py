@@ -0,0 +1,170 @@
+# Test file for the streaming bulk import pipeline
+# Imports CSV and NDJSON order exports, checks rejects and resuming from a checkpoint
+
+import csv
+import json
+import os
+import tempfile
+
+from invoice_import import InvoiceImporter
+from invoice_paths import InvoicePaths
+
+DEFAULTS = {'business_name': "Import Co", 'business_address': "1 Pipeline Rd"}
+
+
+def order_rows(invoice_number, client, items, **extra):
+    return [{'invoice_number': invoice_number, 'invoice_date': "2025-07-01", 'client_name': client,
+             'tax_rate': "10", 'description': f"Item {n}", 'quantity': str(n + 1), 'unit_price': "2.50",
+             **extra} for n in range(items)]
+
+
+def test_csv_import_with_rejects():
+    """Rows are grouped per invoice, bad invoices go to the reject file, re-runs are no-ops"""
+    print("Testing CSV import...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            rows = (order_rows("IMP-1", "Acme", 3)
+                    + order_rows("IMP-2", "Globex", 2)
+                    + order_rows("IMP-3", "Initech", 2)[:1] + [{**order_rows("IMP-3", "Initech", 1)[0],
+                                                                'quantity': "many"}]
+                    + order_rows("IMP-4", "", 1)
+                    + order_rows("IMP-1", "Acme", 1)
+                    + order_rows("IMP-5", "Umbrella", 4))
+            with open("orders.csv", 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+
+            importer = InvoiceImporter("orders.csv", defaults=DEFAULTS, workers=1, batch_size=2)
+            summary = importer.run()
+            print(json.dumps({key: value for key, value in summary.items() if key != 'render'}))
+
+            assert summary['invoices_imported'] == 3
+            assert summary['invoices_rejected'] == 3 and summary['rows_rejected'] == 4
+            assert summary['rows_done'] == len(rows)
+
+            paths = InvoicePaths()
+            for number in ("IMP-1", "IMP-2", "IMP-5"):
+                assert paths.find_pdf(number)
+            with open(paths.find_json("IMP-1")) as f:
+                data = json.load(f)
+            assert len(data['items']) == 3 and data['business_info']['name'] == "Import Co"
+            assert data['totals']['total'] == 16.5
+
+            with open(summary['reject_path'], newline='') as f:
+                rejects = list(csv.DictReader(f))
+            assert [row['reject_row'] for row in rejects] == ['6', '7', '8', '9']
+            assert "Invalid" in rejects[0]['reject_error'] and rejects[0]['invoice_number'] == "IMP-3"
+            assert rejects[2]['reject_error'] == "client_name is required"
+            assert "adjacent" in rejects[3]['reject_error']
+
+            again = InvoiceImporter("orders.csv", defaults=DEFAULTS, workers=1).run()
+            assert again['resumed_from_row'] == len(rows) and again['render']['total'] == 0
+            assert again['invoices_imported'] == 3
+            with open(summary['reject_path'], newline='') as f:
+                assert len(list(csv.DictReader(f))) == 4
+        finally:
+            os.chdir(cwd)
+
+    print("✅ CSV import test PASSED!")
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resume_from_checkpoint():
+    """An interrupted NDJSON import resumes after the checkpoint without duplicate rejects
+
+    RES-00 shows up again near the end of the file, after the checkpoint; the
+    repeat must still be rejected rather than overwrite the first RES-00.
+    """
+    print("\nTesting resume from checkpoint...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            with open("orders.ndjson", 'w') as f:
+                for n in range(30):
+                    if n in (3, 25):
+                        f.write("{not json\n")
+                    if n == 12:
+                        # A whole invoice on one line is accepted too
+                        f.write(json.dumps({'invoice_number': "RES-WHOLE", 'client_name': "Whole",
+                                            'items': [{'description': "Bundle", 'quantity': 1,
+                                                       'unit_price': 99}]}) + "\n")
+                    for row in order_rows(f"RES-{n:02d}", f"Client {n}", n % 3 + 1):
+                        f.write(json.dumps(row) + "\n")
+                    if n == 28:
+                        f.write(json.dumps(order_rows("RES-00", "Impostor", 1)[0]) + "\n")
+
+            checkpoints = []
+
+            def crash_after_two(state):
+                checkpoints.append(state)
+                if len(checkpoints) == 2:
+                    raise Interrupted()
+
+            importer = InvoiceImporter("orders.ndjson", defaults=DEFAULTS, workers=1, batch_size=4,
+                                       checkpoint_every=5)
+            try:
+                importer.run(progress_callback=crash_after_two)
+                assert False, "import was not interrupted"
+            except Interrupted:
+                pass
+            saved = checkpoints[-1]
+            print(f"Interrupted at row {saved['rows_done']} ({saved['invoices_imported']} imported)")
+            assert 0 < saved['rows_done'] and not saved['complete']
+
+            summary = InvoiceImporter("orders.ndjson", defaults=DEFAULTS, workers=1, batch_size=4,
+                                      checkpoint_every=5).run()
+            assert summary['resumed_from_row'] == saved['rows_done']
+            assert summary['invoices_imported'] == 31
+            assert summary['invoices_rejected'] == 3
+            assert InvoicePaths().find_pdf("RES-WHOLE") and InvoicePaths().find_pdf("RES-29")
+            with open(InvoicePaths().find_json("RES-00")) as f:
+                assert json.load(f)['client_info']['name'] == "Client 0"
+
+            with open(summary['reject_path']) as f:
+                rejects = [json.loads(line) for line in f]
+            assert len(rejects) == 3
+            assert [reject['error'].startswith("Invalid JSON") for reject in rejects] == [True, True, False]
+            assert rejects[2]['data']['invoice_number'] == "RES-00" and "adjacent" in rejects[2]['error']
+            with open(summary['checkpoint_path']) as f:
+                assert json.load(f)['complete'] is True
+        finally:
+            os.chdir(cwd)
+
+    print("✅ Resume test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Import Tests")
+    print("=" * 50)
+
+    tests = [
+        ("CSV Import with Rejects", test_csv_import_with_rejects),
+        ("Resume from Checkpoint", test_resume_from_checkpoint)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,160 @@
+# Test file for the SQLite invoice summary index
+# Run this to test that list views are served from the index
+
+import json
+import os
+import tempfile
+
+from invoice_generator import InvoiceGenerator
+from invoice_exporter import InvoiceExporter
+from invoice_index import InvoiceIndex
+
+
+def make_invoice(invoice_number, client_name, unit_price):
+    invoice = InvoiceGenerator()
+    invoice.set_business_info("Index Test Business", "1 Index Way", "(555) 111-2222")
+    invoice.set_client_info(client_name, "2 Client Road")
+    invoice.set_invoice_details(invoice_number, "2025-05-01", tax_rate=10.0)
+    invoice.add_item("Consulting", 2, unit_price)
+    return invoice
+
+
+def test_save_updates_index():
+    """save_invoice_data must keep the index current"""
+    print("Testing index updates on save...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs("invoices")
+            make_invoice("IDX-002", "Beta Ltd", 50.0).save_invoice_data()
+            make_invoice("IDX-001", "Alpha Inc", 100.0).save_invoice_data()
+
+            summaries = InvoiceExporter().get_invoice_summaries()
+            print(f"Summaries: {summaries}")
+
+            assert [s['number'] for s in summaries] == ["IDX-001", "IDX-002"]
+            assert summaries[0]['client'] == "Alpha Inc"
+            assert abs(summaries[0]['total'] - 220.0) < 0.01
+            assert summaries[0]['items_count'] == 1
+        finally:
+            os.chdir(cwd)
+
+    print("✅ Index update test PASSED!")
+
+
+def test_sync_picks_up_external_changes():
+    """Files added or removed outside save_invoice_data are picked up by sync"""
+    print("\nTesting index sync with the invoices directory...")
+
+    with tempfile.TemporaryDirectory() as invoices_dir:
+        index = InvoiceIndex(invoices_dir)
+
+        data = {
+            'business_info': {'name': 'B', 'address': '', 'phone': '', 'email': ''},
+            'client_info': {'name': 'External Client', 'address': '', 'phone': '', 'email': ''},
+            'invoice_number': 'EXT-1',
+            'invoice_date': '2025-01-15',
+            'items': [],
+            'tax_rate': 0.0,
+            'discount': 0.0,
+            'payment_terms': '',
+            'totals': {'subtotal': 10.0, 'discount_amount': 0.0, 'tax_amount': 0.0, 'total': 10.0}
+        }
+        with open(os.path.join(invoices_dir, "invoice_EXT-1.json"), 'w') as f:
+            json.dump(data, f)
+
+        assert index.sync() == 1
+        assert index.sync() == 0  # unchanged files are not re-parsed
+        assert index.get_invoice_numbers() == ["EXT-1"]
+
+        os.remove(os.path.join(invoices_dir, "invoice_EXT-1.json"))
+        index.sync()
+        assert index.get_invoice_numbers() == []
+
+    print("✅ Index sync test PASSED!")
+
+
+def test_paginated_queries():
+    """Filtered, sorted pages walk the whole result set exactly once"""
+    print("\nTesting paginated summary queries...")
+
+    with tempfile.TemporaryDirectory() as invoices_dir:
+        index = InvoiceIndex(invoices_dir)
+        # Sync the (empty) directory first, as a running app would, so the
+        # rows below are not dropped for lacking JSON files
+        index.ensure_synced()
+        index.upsert_many([
+            InvoiceIndex.summary_from_data({
+                'invoice_number': f"PG-{n:03d}",
+                'invoice_date': f"2025-{(n % 12) + 1:02d}-01",
+                'client_info': {'name': "Acme Corp" if n % 2 else "Globex"},
+                'items': [],
+                'totals': {'total': float(n * 10)}
+            }, json_mtime=0.0)
+            for n in range(25)
+        ])
+
+        # The schema was created by the first connection; pages don't run it again
+        schema_runs = []
+        index.analytics.create_schema = schema_runs.append
+
+        seen = []
+        cursor = None
+        while True:
+            page = index.query_summaries(sort='total', order='desc', limit=10, cursor=cursor)
+            seen.extend(invoice['number'] for invoice in page['invoices'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        assert len(seen) == 25 and len(set(seen)) == 25
+        assert schema_runs == []
+        assert seen[0] == "PG-024"
+
+        page = index.query_summaries(client="acme", min_total=50, max_total=150, sort='number', order='asc')
+        numbers = [invoice['number'] for invoice in page['invoices']]
+        print(f"Filtered: {numbers}")
+        assert numbers == ["PG-005", "PG-007", "PG-009", "PG-011", "PG-013", "PG-015"]
+        assert page['total'] == 6
+
+        page = index.query_summaries(date_from="2025-03-01", date_to="2025-03-31", search="PG-0")
+        assert sorted(invoice['number'] for invoice in page['invoices']) == ["PG-002", "PG-014"]
+
+        try:
+            index.query_summaries(sort="password")
+            assert False, "invalid sort field accepted"
+        except ValueError:
+            pass
+
+    print("✅ Paginated query test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Index Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Index Updates On Save", test_save_updates_index),
+        ("Index Sync", test_sync_picks_up_external_changes),
+        ("Paginated Queries", test_paginated_queries)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
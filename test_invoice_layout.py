@@ -0,0 +1,84 @@
+# Test file for the compiled invoice layout
+# Run this to test field filling and optional rows
+
+from invoice_generator import InvoiceGenerator
+from invoice_layout import CompiledLayout, Cell, Gap, Row, REGULAR, get_default_layout
+
+
+def make_invoice(**details):
+    invoice = InvoiceGenerator()
+    invoice.pdf_cache = None
+    invoice.set_business_info("Layout Studio", "5 Grid Lane", "(555) 444-5555")
+    invoice.set_client_info("Layout Client", "6 Column Court", email="client@example.com")
+    invoice.set_invoice_details("LAYOUT-001", "2025-07-01", **details)
+    invoice.add_item("Typesetting", 2, 40)
+    return invoice
+
+
+def pdf_text(pdf):
+    pdf.compress = False
+    return bytes(pdf.output()).decode('latin-1')
+
+
+def test_fields_and_optional_rows():
+    """Placeholders are filled and rows are skipped when their field is empty"""
+    print("Testing compiled layout output...")
+
+    text = pdf_text(make_invoice(tax_rate=10.0)._build_pdf())
+    assert "(Layout Studio)" in text
+    assert "(Invoice Number: LAYOUT-001)" in text
+    assert "(Email: client@example.com)" in text
+    assert "(Tax \\(10.0%\\):)" in text
+    assert "($88.00)" in text
+    # No business email, client phone, discount or payment terms
+    assert "Discount" not in text
+    assert "Phone: )" not in text
+    assert "Payment Terms" not in text
+
+    with_terms = pdf_text(make_invoice(discount=5, payment_terms="Net 15")._build_pdf())
+    assert "(-$4.00)" in with_terms
+    assert "(Net 15)" in with_terms
+
+    print("✅ Compiled layout test PASSED!")
+
+
+def test_layout_is_reused():
+    """The default layout is compiled once; custom layouts break pages as they flow"""
+    print("\nTesting layout reuse and page breaks...")
+
+    assert get_default_layout() is get_default_layout()
+
+    layout = CompiledLayout([Gap(10)] + [Row(10, [Cell(0, 'Line {n}', REGULAR)])] * 40)
+    pdf = layout.render({'n': 7}, iter(()))
+    assert len(pdf.pages) == 2
+    assert pdf_text(pdf).count("(Line 7)") == 40
+
+    print("✅ Layout reuse test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Layout Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Compiled Layout", test_fields_and_optional_rows),
+        ("Layout Reuse", test_layout_is_reused)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,183 @@
+# Test file for the append-only invoice ledger
+# Run this to test lookups, reopening, compaction and exporter integration
+
+import os
+import tempfile
+import threading
+
+from invoice_generator import InvoiceGenerator
+from invoice_ledger import COMPACT_LOCK_NAME, InvoiceLedger, try_file_lock
+
+
+def make_data(number, client="Ledger Client", total=10.0):
+    return {
+        'invoice_number': number,
+        'invoice_date': "2025-09-01",
+        'business_info': {'name': "Ledger Co", 'address': "1 Log Lane", 'phone': "", 'email': ""},
+        'client_info': {'name': client, 'address': "2 Tail Road", 'phone': "", 'email': ""},
+        'items': [{'description': "Entry", 'quantity': 1, 'unit_price': total, 'total_price': total}],
+        'tax_rate': 0.0,
+        'discount': 0.0,
+        'payment_terms': "",
+        'totals': {'subtotal': total, 'discount_amount': 0.0, 'tax_amount': 0.0, 'total': total}
+    }
+
+
+def test_put_get_and_reopen():
+    """Latest record wins, deletes stick, and a fresh instance sees the same state"""
+    print("Testing ledger lookups and reopening...")
+
+    with tempfile.TemporaryDirectory() as ledger_dir:
+        # Tiny segments so records spread over several sealed segments with hints
+        ledger = InvoiceLedger(ledger_dir, segment_max_bytes=600)
+        for n in range(20):
+            ledger.put(make_data(f"L-{n:03d}", total=n))
+        ledger.put(make_data("L-005", client="Renamed"))
+        assert ledger.delete("L-007")
+        assert not ledger.delete("L-999")
+
+        assert ledger.get("L-005")['client_info']['name'] == "Renamed"
+        assert ledger.get("L-007") is None
+        assert len(ledger) == 19
+        segments = ledger.stats()['segments']
+        assert segments > 3
+        assert any(name.endswith('.hint') for name in os.listdir(ledger_dir))
+
+        # Another instance (e.g. another worker process) sees the same data
+        reopened = InvoiceLedger(ledger_dir, segment_max_bytes=600)
+        assert reopened.get("L-005")['client_info']['name'] == "Renamed"
+        assert reopened.get("L-007") is None
+        assert reopened.get("L-012")['totals']['total'] == 12
+        assert reopened.stamps() == ledger.stamps()
+
+        # Appends from the other instance are picked up on the next lookup
+        reopened.put(make_data("L-100"))
+        assert ledger.get("L-100") is not None
+        print(f"{len(ledger)} invoices in {segments} segments")
+
+    print("✅ Ledger lookup test PASSED!")
+
+
+def test_compaction():
+    """Compaction keeps only live records and reclaims the rest"""
+    print("\nTesting ledger compaction...")
+
+    with tempfile.TemporaryDirectory() as ledger_dir:
+        ledger = InvoiceLedger(ledger_dir, segment_max_bytes=2000, compact_every=0)
+        for round_number in range(5):
+            for n in range(10):
+                ledger.put(make_data(f"C-{n}", total=round_number * 100 + n))
+        ledger.delete("C-3")
+        ledger.seal()
+
+        ratio = ledger.garbage_ratio()
+        segments = ledger.stats()['segments']
+
+        # Another process compacting: this one skips instead of racing it
+        with try_file_lock(os.path.join(ledger_dir, COMPACT_LOCK_NAME)) as locked:
+            assert locked
+            assert ledger.compact() == 0
+            assert ledger.stats()['segments'] == segments and ledger.compactions == 0
+
+            # ...and appends from another process wait until the merge is done
+            writer = threading.Thread(target=InvoiceLedger(ledger_dir).put, args=(make_data("LEDGER-WAIT"),))
+            writer.start()
+            writer.join(0.3)
+            assert writer.is_alive() and "LEDGER-WAIT" not in InvoiceLedger(ledger_dir)
+        writer.join(5)
+        assert not writer.is_alive() and "LEDGER-WAIT" in ledger
+        ledger.delete("LEDGER-WAIT")
+
+        reclaimed = ledger.compact()
+        assert ratio > 0.7
+        assert reclaimed > 0
+        assert ledger.garbage_ratio(sealed_only=True) == 0
+        assert ledger.stats()['segments'] == 2
+        print(f"Garbage ratio {ratio:.2f}, reclaimed {reclaimed} bytes")
+
+        for opened in (ledger, InvoiceLedger(ledger_dir)):
+            assert opened.get("C-4")['totals']['total'] == 404
+            assert opened.get("C-3") is None
+            assert len(opened) == 9
+            assert sorted(data['invoice_number'] for data in opened.iter_invoices()) == \
+                [f"C-{n}" for n in range(10) if n != 3]
+
+        # Periodic compaction runs on its own once enough garbage builds up
+        auto = InvoiceLedger(ledger_dir, segment_max_bytes=2000, compact_every=20)
+        for n in range(60):
+            auto.put(make_data("C-0", total=n))
+        assert auto.compactions > 0
+        assert auto.get("C-0")['totals']['total'] == 59
+
+    print("✅ Ledger compaction test PASSED!")
+
+
+def test_exporter_on_ledger():
+    """Saving, listing, loading and exporting work the same on ledger storage"""
+    print("\nTesting exporter on ledger storage...")
+
+    from invoice_exporter import InvoiceExporter
+
+    cwd = os.getcwd()
+    previous = os.environ.get('INVOICE_STORAGE')
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.environ['INVOICE_STORAGE'] = 'ledger'
+        try:
+            for n, client in enumerate(["Acme", "Globex", "Initech"]):
+                invoice = InvoiceGenerator()
+                invoice.set_business_info("Ledger Co", "1 Log Lane", "(555) 000-0000")
+                invoice.set_client_info(client, "Somewhere")
+                invoice.set_invoice_details(f"LEDGER-{n}", "2025-09-0" + str(n + 1))
+                invoice.add_item("Work", 1, 100 + n)
+                saved = invoice.save_invoice_data()
+                assert saved.endswith('.jsonl')
+
+            assert not [name for name in os.listdir('invoices') if name.endswith('.json')]
+
+            exporter = InvoiceExporter()
+            assert exporter.get_all_invoices() == ["LEDGER-0", "LEDGER-1", "LEDGER-2"]
+            assert exporter.load_invoice_from_json("LEDGER-1")['client_info']['name'] == "Globex"
+            assert exporter.load_invoice_from_json("LEDGER-9") is None
+
+            csv_text = b''.join(exporter.stream_summary_csv()).decode('utf-8')
+            assert "Initech" in csv_text and "$102.00" in csv_text
+            selected = [data['invoice_number'] for data in exporter.iter_selected_invoices(client="glo")]
+            assert selected == ["LEDGER-1"]
+        finally:
+            if previous is None:
+                os.environ.pop('INVOICE_STORAGE', None)
+            else:
+                os.environ['INVOICE_STORAGE'] = previous
+            os.chdir(cwd)
+
+    print("✅ Ledger exporter test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Ledger Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Lookups and Reopening", test_put_get_and_reopen),
+        ("Compaction", test_compaction),
+        ("Exporter on Ledger", test_exporter_on_ledger)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
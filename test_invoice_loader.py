@@ -0,0 +1,85 @@
+# Test file for the threaded invoice JSON loader
+# Run this to test ordering, field extraction and error handling
+
+import json
+import os
+import tempfile
+
+import invoice_loader
+from invoice_index import InvoiceIndex
+
+
+def write_files(workdir, count):
+    paths = []
+    for n in range(count):
+        path = os.path.join(workdir, f"invoice_L-{n:04d}.json")
+        with open(path, 'w') as f:
+            json.dump({'invoice_number': f'L-{n:04d}', 'client_info': {'name': f'Client {n}'},
+                       'items': [{}] * (n % 3), 'totals': {'total': float(n)}}, f)
+        paths.append(path)
+    return paths
+
+
+def test_results_keep_input_order():
+    """Results come back in input order across many batches and threads"""
+    print("Testing ordered parallel loading...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = write_files(workdir, 300)
+        summaries = invoice_loader.load_many(iter(paths), extract=InvoiceIndex.summary_from_data,
+                                             workers=4, batch_size=7, max_in_flight=3)
+        assert [s['invoice_number'] for s in summaries] == [f'L-{n:04d}' for n in range(300)]
+        assert summaries[5]['items_count'] == 2
+        assert summaries[5]['total'] == 5.0
+
+    print(f"✅ Ordered loading test PASSED! (backend: {invoice_loader.JSON_BACKEND})")
+
+
+def test_unreadable_files_are_skipped():
+    """Corrupt or missing files are skipped, or raised with skip_errors=False"""
+    print("\nTesting unreadable files...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = write_files(workdir, 3)
+        with open(paths[1], 'w') as f:
+            f.write("{not json")
+        paths.append(os.path.join(workdir, "missing.json"))
+
+        loaded = invoice_loader.load_many(paths, workers=2, batch_size=1, with_paths=True)
+        assert [path for path, _ in loaded] == [paths[0], paths[2]]
+
+        try:
+            invoice_loader.load_many(paths, workers=1, skip_errors=False)
+            assert False, "expected a decode error"
+        except ValueError:
+            pass
+
+    print("✅ Unreadable files test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Loader Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Ordered Loading", test_results_keep_input_order),
+        ("Unreadable Files", test_unreadable_files_are_skipped)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
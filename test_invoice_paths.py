@@ -0,0 +1,157 @@
+# Test file for the sharded invoice directory layout
+# Run this to test path resolution and the resumable migration
+
+import json
+import os
+import tempfile
+
+from invoice_exporter import InvoiceExporter
+from invoice_generator import InvoiceGenerator
+from invoice_index import InvoiceIndex
+from invoice_paths import InvoicePaths, shard_for
+
+
+def write_flat(invoices_dir, number):
+    with open(os.path.join(invoices_dir, f"invoice_{number}.json"), 'w') as f:
+        json.dump({'invoice_number': number, 'invoice_date': "2025-10-01",
+                   'client_info': {'name': "Shard Client", 'address': ""}, 'items': [],
+                   'payment_terms': "", 'totals': {'subtotal': 1.0, 'tax_amount': 0.0,
+                                                   'discount_amount': 0.0, 'total': 1.0}}, f)
+    with open(os.path.join(invoices_dir, f"invoice_{number}.pdf"), 'wb') as f:
+        f.write(b"%PDF-1.4 " + number.encode())
+
+
+def test_resolution():
+    """New files are sharded; old flat files are still found"""
+    print("Testing path resolution...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = InvoicePaths(os.path.join(workdir, "invoices"), os.path.join(workdir, "exports"), layout='hash')
+        pdf_path = paths.pdf_path("INV-42")
+        assert pdf_path == os.path.join(workdir, "invoices", shard_for("INV-42"), "invoice_INV-42.pdf")
+        assert paths.find_pdf("INV-42") is None
+
+        os.makedirs(paths.invoices_dir)
+        write_flat(paths.invoices_dir, "OLD-1")
+        assert paths.find_pdf("OLD-1") == os.path.join(paths.invoices_dir, "invoice_OLD-1.pdf")
+
+        with open(InvoicePaths.ensure_parent(pdf_path), 'wb') as f:
+            f.write(b"%PDF")
+        assert paths.find_pdf("INV-42") == pdf_path
+        assert paths.csv_export_path("INV-42").startswith(os.path.join(paths.exports_dir, shard_for("INV-42")))
+
+        flat = InvoicePaths(paths.invoices_dir, layout='flat')
+        assert flat.pdf_path("INV-42") == os.path.join(paths.invoices_dir, "invoice_INV-42.pdf")
+        assert flat.find_pdf("INV-42") == pdf_path
+
+    print("✅ Path resolution test PASSED!")
+
+
+def test_no_duplicates_after_resave():
+    """A re-saved invoice with a leftover flat copy is listed and exported once"""
+    print("\nTesting duplicate flat and sharded copies...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            os.makedirs("invoices")
+            write_flat("invoices", "DUP-1")
+            write_flat("invoices", "FLAT-ONLY")
+
+            invoice = InvoiceGenerator()
+            invoice.set_business_info("Shard Co", "1 Hash Way", "")
+            invoice.set_client_info("Re-saved Client", "2 Shard St")
+            invoice.set_invoice_details("DUP-1", "2025-10-02")
+            invoice.add_item("Service", 1, 20)
+            invoice.save_invoice_data()
+            assert os.path.exists(os.path.join("invoices", "invoice_DUP-1.json"))
+
+            for layout, expected_client in (('hash', "Re-saved Client"), ('flat', "Shard Client")):
+                listed = [number for number, _ in InvoicePaths(layout=layout).iter_invoice_files('json')]
+                assert sorted(listed) == ["DUP-1", "FLAT-ONLY"], (layout, listed)
+                path = dict(InvoicePaths(layout=layout).iter_invoice_files('json'))["DUP-1"].path
+                with open(path) as f:
+                    assert json.load(f)['client_info']['name'] == expected_client
+
+            rows = list(InvoiceExporter().iter_summary_rows())
+            assert sorted(row[0] for row in rows) == ["DUP-1", "FLAT-ONLY"]
+            assert [row[2] for row in rows if row[0] == "DUP-1"] == ["Re-saved Client"]
+        finally:
+            os.chdir(cwd)
+
+    print("✅ Duplicate copies test PASSED!")
+
+
+def test_migration_resumes():
+    """Migrating a flat directory moves everything once, even after an interruption"""
+    print("\nTesting resumable migration...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        invoices_dir = os.path.join(workdir, "invoices")
+        exports_dir = os.path.join(workdir, "exports")
+        os.makedirs(invoices_dir)
+        os.makedirs(exports_dir)
+        numbers = [f"MIG-{n:03d}" for n in range(40)]
+        for number in numbers:
+            write_flat(invoices_dir, number)
+        with open(os.path.join(exports_dir, "all_invoices_summary_20250914_101500.csv"), 'w') as f:
+            f.write("header\n")
+
+        paths = InvoicePaths(invoices_dir, exports_dir, layout='hash')
+
+        # Simulate a run that stopped part way: a few files already moved,
+        # and one left behind as a stale duplicate
+        for number in numbers[:5]:
+            paths._move(os.path.join(invoices_dir, f"invoice_{number}.pdf"), paths.pdf_path(number))
+        with open(os.path.join(invoices_dir, "invoice_MIG-000.pdf"), 'wb') as f:
+            f.write(b"stale")
+        os.utime(os.path.join(invoices_dir, "invoice_MIG-000.pdf"), (0, 0))
+
+        moved = paths.migrate()
+        assert moved == 40 * 2 - 5 + 1
+        assert paths.migrate() == 0
+        assert not [name for name in os.listdir(invoices_dir) if name.startswith("invoice_")]
+        with open(paths.find_pdf("MIG-000"), 'rb') as f:
+            assert f.read() == b"%PDF-1.4 MIG-000"
+        assert os.path.exists(os.path.join(exports_dir, "summary", "2025-09", "all_invoices_summary_20250914_101500.csv"))
+
+        index = InvoiceIndex(invoices_dir)
+        assert index.sync() == 40
+        assert index.get_invoice_numbers() == numbers
+
+        # And back again
+        assert InvoicePaths(invoices_dir, exports_dir, layout='flat').migrate() == 80
+        assert os.path.exists(os.path.join(invoices_dir, "invoice_MIG-017.json"))
+        print(f"Moved {moved} files into {len(os.listdir(invoices_dir))} entries")
+
+    print("✅ Migration test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Path Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Path Resolution", test_resolution),
+        ("No Duplicates After Re-save", test_no_duplicates_after_resave),
+        ("Resumable Migration", test_migration_resumes)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
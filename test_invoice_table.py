@@ -0,0 +1,89 @@
+# Test file for the paged line-item table
+# Run this to test page breaks, repeated headers and page subtotals
+
+from fpdf import FPDF
+
+from invoice_generator import InvoiceGenerator
+from invoice_table import PagedTable, format_cents
+
+
+def page_text(pdf):
+    """Uncompressed content of every page, for simple text assertions"""
+    pdf.compress = False
+    return bytes(pdf.output()).decode('latin-1')
+
+
+def test_long_table_pages():
+    """A long table repeats its header and balances page subtotals"""
+    print("Testing multi-page table...")
+
+    invoice = InvoiceGenerator()
+    invoice.pdf_cache = None
+    invoice.set_business_info("Table Test Telecom", "1 Cable Road", "(555) 000-1111")
+    invoice.set_client_info("Table Client", "2 Client Road")
+    invoice.set_invoice_details("TABLE-001", "2025-05-01")
+    for n in range(2000):
+        invoice.add_item(f"Call {n:05d}", 1, "0.37")
+
+    pdf = invoice._build_pdf()
+    text = page_text(pdf)
+    # The totals block may spill onto one more page after the table
+    pages = text.count("(Description)")
+    print(f"Rendered 2000 rows on {pages} table pages ({len(pdf.pages)} pages in total)")
+
+    assert pages > 50
+    assert len(pdf.pages) in (pages, pages + 1)
+    assert text.count("Brought forward:") == pages - 1
+    # Every page closes with its own subtotal, including the last one
+    assert text.count(" subtotal:)") == pages
+    assert f"({format_cents(2000 * 37)})" in text
+
+    print("✅ Multi-page table test PASSED!")
+
+
+def test_wrapping_and_totals():
+    """Long descriptions wrap and render() returns the grand total in cents"""
+    print("\nTesting wrapped rows...")
+
+    pdf = FPDF()
+    pdf.add_page()
+    table = PagedTable(pdf)
+    description = "Unlimited international roaming data bundle, billed daily " * 3
+    rows = ((("Short", "1", "$1.00", "$1.00"), 100), ((description, "2", "$0.50", "$1.00"), 100))
+
+    start = pdf.get_y()
+    assert table.render(iter(rows)) == 200
+    assert table.rows == 2 and table.pages == 1
+    # The wrapped row is taller than two single-line rows
+    assert pdf.get_y() - start > 3 * table.row_height
+    assert format_cents(-1234) == "-$12.34"
+
+    print("✅ Wrapped rows test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Invoice Table Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Multi-page Table", test_long_table_pages),
+        ("Wrapped Rows", test_wrapping_and_totals)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
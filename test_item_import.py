@@ -0,0 +1,88 @@
+# Test file for bulk item import (CSV / pasted text) and bulk table edits
+# These back the GUI's paste, import and multi-select remove
+
+import os
+import tempfile
+import time
+
+from item_import import parse_pasted_items, read_items_csv
+from money import LineItemTable
+
+
+def test_parse_pasted_and_csv():
+    """Spreadsheet paste, CSV with a header and bad lines are all handled"""
+    print("Testing item parsing...")
+
+    pasted = "Design\t2\t$1,250.00\nHosting\t1\t19.99\n\nBroken\tlots\t5\nShort\t1\n"
+    items, errors = parse_pasted_items(pasted)
+    assert [item['description'] for item in items] == ["Design", "Hosting"]
+    assert items[0]['unit_price'] == "1250.00"
+    assert [line for line, _ in errors] == [4, 5]
+    print(f"Errors: {errors}")
+
+    items, errors = parse_pasted_items('"Support, monthly",3,40\nTravel,1,12.5\n')
+    assert items[0]['description'] == "Support, monthly" and len(items) == 2 and not errors
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "items.csv")
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write("Qty,Item,Total,Unit Price\n4,Widgets,40.00,10\n2,,0,1\n")
+        items, errors = read_items_csv(path)
+    assert items == [{'description': "Widgets", 'quantity': "4", 'unit_price': "10"}]
+    assert errors == [(3, "missing description")]
+
+    print("✅ Item parsing test PASSED!")
+
+
+def test_bulk_table_edits():
+    """Bulk extend, multi-row remove and snapshots keep the subtotal exact"""
+    print("\nTesting bulk table edits...")
+
+    items, errors = parse_pasted_items("\n".join(f"Line {n}\t1\t{n % 7}.25" for n in range(20000)))
+    assert not errors
+
+    started = time.perf_counter()
+    table = LineItemTable()
+    table.extend(items)
+    snapshot = table.snapshot()
+    removed = table.remove_many(range(0, 20000, 2))
+    print(f"Extend + snapshot + remove 10k of 20k lines: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    assert removed == 10000 and len(table) == 10000
+    assert table[0]['description'] == "Line 1"
+    assert table.subtotal_cents == sum(table.line_totals)
+    assert len(snapshot) == 20000 and snapshot.subtotal_cents == sum(snapshot.line_totals)
+    assert table.remove_many([-1, 10000]) == 0
+
+    snapshot.append("Extra", 1, 1)
+    assert len(table) == 10000
+
+    print("✅ Bulk table edits test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Item Import Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Parse Pasted and CSV", test_parse_pasted_and_csv),
+        ("Bulk Table Edits", test_bulk_table_edits)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
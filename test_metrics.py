@@ -0,0 +1,209 @@
+# Test file for the metrics subsystem and the /metrics endpoint
+# Checks the text exposition format and that each instrumented stage is recorded
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import metrics
+from email_sender import EmailSender
+from smtp_stub import LocalSMTPStub
+
+
+def sample(text, line_prefix):
+    """Value of the first exposition line starting with ``line_prefix``"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_exposition_format():
+    """Counters and histograms render HELP/TYPE, cumulative buckets, _sum and _count"""
+    print("Testing text exposition format...")
+
+    registry = metrics.Registry()
+    requests = registry.counter('demo_requests_total', "Demo requests", ['route'])
+    latency = registry.histogram('demo_seconds', "Demo latency", buckets=(0.1, 1.0))
+
+    requests.labels(route='/a').inc()
+    requests.labels(route='/a').inc(2)
+    requests.labels(route='say "hi"\n').inc()
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    print(text)
+    assert "# HELP demo_requests_total Demo requests\n# TYPE demo_requests_total counter" in text
+    assert "# TYPE demo_seconds histogram" in text
+    assert sample(text, 'demo_requests_total{route="/a"}') == 3
+    assert 'demo_requests_total{route="say \\"hi\\"\\n"} 1' in text
+    assert sample(text, 'demo_seconds_bucket{le="0.1"}') == 1
+    assert sample(text, 'demo_seconds_bucket{le="1"}') == 3
+    assert sample(text, 'demo_seconds_bucket{le="+Inf"}') == 4
+    assert sample(text, 'demo_seconds_sum') == 4.05
+    assert sample(text, 'demo_seconds_count') == 4
+
+    # Registering the same name again returns the same metric; a different shape is an error
+    assert registry.counter('demo_requests_total', "Demo requests", ['route']) is requests
+    try:
+        registry.histogram('demo_requests_total', "Clash")
+        assert False, "conflicting registration accepted"
+    except ValueError:
+        pass
+
+    disabled = metrics.Registry(enabled=False)
+    noop = disabled.histogram('demo_seconds', "Demo latency", ['route'])
+    assert noop is metrics.NOOP
+    with noop.labels(route='/a').time():
+        pass
+    assert disabled.render() == ''
+
+    print("✅ Exposition format test PASSED!")
+
+
+def test_instrumented_stages():
+    """Routes, PDF renders, JSON writes, scans, cache lookups and SMTP stages show up in /metrics"""
+    print("\nTesting instrumented stages and /metrics...")
+
+    from web_app import app
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            client = app.test_client()
+            payload = {
+                'business_name': "Metrics Co", 'business_address': "1 Gauge St", 'business_phone': "1",
+                'client_name': "Client", 'client_address': "2 Counter Rd",
+                'invoice_number': "MET-001",
+                'items': [{'description': "Work", 'quantity': 1, 'unit_price': 10}]
+            }
+            for _ in range(2):
+                assert client.post('/api/create-invoice', json=payload).status_code == 200
+            assert client.get('/api/get-all-invoices').status_code == 200
+            assert client.get('/api/get-invoice/MET-001').status_code == 200
+
+            with LocalSMTPStub() as stub:
+                sender = EmailSender(stub.host, stub.port, use_tls=False, debug_level=0)
+                pdf_path = os.path.join(workdir, "invoice.pdf")
+                with open(pdf_path, 'wb') as f:
+                    f.write(b"%PDF-1.4\n")
+                results = sender.send_many("billing@example.com", "secret", [{
+                    'recipient_email': "client@example.com", 'invoice_pdf_path': pdf_path,
+                    'invoice_number': "MET-001", 'client_name': "Client", 'business_name': "Metrics Co"
+                }])
+                assert results[0]['success']
+
+            response = client.get('/metrics')
+            assert response.status_code == 200
+            assert response.content_type.startswith('text/plain; version=0.0.4')
+            text = response.get_data(as_text=True)
+        finally:
+            os.chdir(cwd)
+
+    route = 'invoice_http_request_seconds_count{method="POST",route="/api/create-invoice",status="200"}'
+    assert sample(text, route) >= 2
+    assert sample(text, 'invoice_http_requests_total{method="GET",route="/api/get-invoice/<invoice_number>",'
+                        'status="200"}') >= 1
+    assert sample(text, 'invoice_pdf_render_seconds_count') >= 1
+    assert sample(text, 'invoice_json_write_seconds_count{storage="files"}') >= 2
+    assert sample(text, 'invoice_directory_scan_seconds_count') >= 1
+    assert sample(text, 'invoice_pdf_cache_lookups_total{result="hit"}') >= 1
+    assert sample(text, 'invoice_pdf_cache_lookups_total{result="miss"}') >= 1
+    for operation in ('connect', 'login', 'send'):
+        assert sample(text, f'invoice_smtp_seconds_count{{operation="{operation}"}}') >= 1
+
+    print("✅ Instrumented stages test PASSED!")
+
+
+def test_worker_process_metrics():
+    """Renders in BatchRenderer and render job worker processes are counted in the parent"""
+    print("\nTesting metrics from worker processes...")
+
+    from batch_renderer import BatchRenderer
+    from invoice_generator import InvoiceGenerator
+    from render_jobs import FINISHED_STATUSES, RenderJobQueue, render_invoice_job
+
+    def payload(number):
+        return {'business_name': "Pool Co", 'client_name': "Client", 'invoice_number': number,
+                'items': [{'description': "Work", 'quantity': 1, 'unit_price': 10}]}
+
+    def renders():
+        return sample(metrics.REGISTRY.render(), 'invoice_pdf_render_seconds_count')
+
+    cwd = os.getcwd()
+    queue = RenderJobQueue(max_workers=1, process_workers=1)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            before = renders()
+            report = BatchRenderer(max_workers=2).render([payload(f"POOL-{n}") for n in range(3)])
+            assert report.succeeded == 3
+            assert renders() == before + 3
+
+            invoice = InvoiceGenerator.from_payload(payload("POOL-JOB"))
+            invoice.pdf_cache = None
+            job = queue.submit(render_invoice_job, invoice, in_process=True)
+            state = queue.get(job['id'])
+            while state['status'] not in FINISHED_STATUSES:
+                state = queue.wait_for_change(job['id'], state['version'], timeout=5)
+            assert state['status'] == 'succeeded', state
+            assert renders() == before + 4
+            assert sample(metrics.REGISTRY.render(), 'invoice_json_write_seconds_count{storage="files"}') >= 4
+        finally:
+            queue.shutdown()
+            os.chdir(cwd)
+
+    print("✅ Worker process metrics test PASSED!")
+
+
+def test_noop_mode():
+    """INVOICE_METRICS=0 hands out no-op metrics and hides /metrics"""
+    print("\nTesting no-op mode...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        script = (
+            "import metrics, web_app\n"
+            "assert web_app.REQUEST_SECONDS is metrics.NOOP\n"
+            "assert metrics.REGISTRY.render() == ''\n"
+            "assert web_app.app.test_client().get('/metrics').status_code == 404\n"
+        )
+        env = dict(os.environ, INVOICE_METRICS='0',
+                   PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', script], cwd=workdir, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+
+    print("✅ No-op mode test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Metrics Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Exposition Format", test_exposition_format),
+        ("Instrumented Stages", test_instrumented_stages),
+        ("Worker Process Metrics", test_worker_process_metrics),
+        ("No-op Mode", test_noop_mode)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,144 @@
+# Test file for streamed MIME construction and SMTP transmission
+# Large attachments are encoded block by block while they are sent
+
+import email
+import os
+import tempfile
+import tracemalloc
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from email_sender import EmailSender
+from mime_stream import BLOCK_SIZE, StreamedMessage
+from smtp_stub import LocalSMTPStub
+
+
+def make_attachment(directory, size):
+    path = os.path.join(directory, "statement.pdf")
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        f.write(os.urandom(size - 9))
+    return path
+
+
+def skeleton(body):
+    msg = MIMEMultipart()
+    msg['From'] = "billing@stream.example"
+    msg['To'] = "client@stream.example"
+    msg['Subject'] = "Statement"
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def test_streamed_message_matches_email_package():
+    """The streamed message decodes exactly like the fully built one, in bounded chunks"""
+    print("Testing streamed MIME construction...")
+
+    body = "Dear client,\n.\n..leading dots survive\nThanks"
+    with tempfile.TemporaryDirectory() as workdir:
+        path = make_attachment(workdir, BLOCK_SIZE * 3 + 1000)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        legacy = skeleton(body)
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(data)
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', 'attachment; filename=statement.pdf')
+        legacy.attach(part)
+
+        for source in (path, data, bytearray(data)):
+            streamed = StreamedMessage(skeleton(body))
+            streamed.attach(source, "statement.pdf")
+            chunks = list(streamed.iter_chunks())
+            assert max(len(chunk) for chunk in chunks) < BLOCK_SIZE * 2
+            assert all(b"\r\n" in chunk or not chunk for chunk in chunks)
+
+            raw = b"".join(chunks)
+            assert b"\n.\r\n" not in raw and b"\r\n..\r\n" in raw and b"\r\n...leading" in raw
+            # Undo the dot-stuffing like the receiving server does before parsing
+            parsed = email.message_from_bytes(raw.replace(b"\r\n..", b"\r\n."))
+            parts = [p for p in parsed.walk() if not p.is_multipart()]
+            expected = [p for p in legacy.walk() if not p.is_multipart()]
+            assert [p.get_content_type() for p in parts] == [p.get_content_type() for p in expected]
+            assert parts[0].get_payload(decode=True).splitlines() == body.encode().splitlines()
+            assert parts[1].get_filename() == "statement.pdf"
+            assert parts[1].get_payload(decode=True) == data
+            assert [line for line in parts[1].get_payload().splitlines() if len(line) != 76][:-1] == []
+            assert streamed['Subject'] == "Statement"
+
+        empty = StreamedMessage(skeleton("No attachment data"))
+        empty.attach(b"", "empty.pdf")
+        parsed = email.message_from_bytes(empty.as_bytes())
+        assert [p for p in parsed.walk()][-1].get_payload(decode=True) == b""
+
+    print("✅ Streamed MIME construction test PASSED!")
+
+
+def test_send_large_attachment_bounded_memory():
+    """A 12 MB statement is sent intact while peak memory stays a small fraction of it"""
+    print("\nTesting streamed send of a large attachment...")
+
+    size = 12 * 1024 * 1024
+    with tempfile.TemporaryDirectory() as workdir:
+        path = make_attachment(workdir, size)
+
+        message = EmailSender().build_invoice_message(
+            "billing@stream.example", "client@stream.example", path, "BIG-1", "Client", "Stream Co")
+        tracemalloc.start()
+        try:
+            for _ in message.iter_chunks():
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        print(f"Peak memory while encoding {size // 1024 // 1024} MB: {peak / 1024:.0f} KB")
+        assert peak < 1024 * 1024
+
+        with LocalSMTPStub(password="secret", drop_after=1) as stub:
+            sender = EmailSender(stub.host, stub.port, use_tls=False, debug_level=0)
+            results = sender.send_many("billing@stream.example", "secret", [{
+                'recipient_email': f"client{n}@stream.example", 'invoice_pdf_path': path,
+                'invoice_number': f"BIG-{n}", 'client_name': "Client", 'business_name': "Stream Co"
+            } for n in range(2)])
+            assert all(result['success'] for result in results), results
+            assert stub.connections == 2
+
+            with open(path, 'rb') as f:
+                data = f.read()
+            for delivered in stub.messages:
+                parsed = email.message_from_bytes(delivered['data'])
+                attachment = [part for part in parsed.walk() if part.get_filename()][0]
+                assert attachment.get_payload(decode=True) == data
+
+    print("✅ Large attachment send test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running MIME Stream Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Streamed MIME Construction", test_streamed_message_matches_email_package),
+        ("Large Attachment Send", test_send_large_attachment_bounded_memory)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
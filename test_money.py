@@ -0,0 +1,124 @@
+# Test file for the exact money engine
+# Run this to test cent-exact totals, incremental updates and batch totals
+
+from decimal import Decimal
+
+import money
+from invoice_generator import InvoiceGenerator
+
+
+def test_no_float_drift():
+    """Many small line items add up exactly"""
+    print("Testing exact totals on a large invoice...")
+
+    invoice = InvoiceGenerator()
+    invoice.set_invoice_details("MONEY-001", tax_rate=8.875, discount=2.5)
+    for n in range(50000):
+        invoice.add_item(f"Meter read {n}", 3, 0.1)
+
+    float_subtotal = sum(3 * 0.1 for _ in range(50000))
+    totals = invoice.calculate_totals_cents()
+    print(f"Float subtotal: {float_subtotal!r}, exact subtotal: {totals['subtotal']} cents")
+
+    assert totals['subtotal'] == 1500000
+    assert totals['discount_amount'] == 37500                 # 2.5% of 15000.00
+    assert totals['tax_amount'] == 129797                     # 8.875% of 14625.00 = 1297.96875
+    assert totals['total'] == 1500000 - 37500 + 129797
+    assert invoice.calculate_totals()['total'] == 15922.97
+    assert len(invoice.items) == 50000
+
+    print("✅ Exact totals test PASSED!")
+
+
+def test_incremental_totals():
+    """Adding and removing items keeps the running subtotal exact"""
+    print("\nTesting incremental add/remove...")
+
+    invoice = InvoiceGenerator()
+    invoice.add_item("Consulting", "2.5", "19.99")     # 49.975 -> 49.98
+    invoice.add_item("Hosting", 1, Decimal("10.005"))  # 10.005 -> 10.01
+    invoice.add_item("Refund", 1, -5)
+    assert invoice.calculate_totals_cents()['subtotal'] == 4998 + 1001 - 500
+
+    removed = invoice.remove_item(0)
+    assert removed['total_price'] == 49.98
+    assert invoice.calculate_totals_cents()['subtotal'] == 501
+
+    # Assigning a list of item dicts (as the GUI does) rebuilds the table
+    invoice.items = [{'description': 'A', 'quantity': 2, 'unit_price': 1.25, 'total_price': 999}]
+    assert invoice.to_dict()['items'] == [
+        {'description': 'A', 'quantity': 2, 'unit_price': 1.25, 'total_price': 2.5}
+    ]
+    assert invoice.calculate_totals()['subtotal'] == 2.5
+
+    print("✅ Incremental totals test PASSED!")
+
+
+def test_sub_cent_unit_price():
+    """Sub-cent unit prices are multiplied exactly; only the line total is rounded"""
+    print("\nTesting sub-cent unit prices...")
+
+    invoice = InvoiceGenerator()
+    invoice.add_item("kWh", 1000, 0.1234)             # 123.40, not 1000 x 0.12
+    invoice.add_item("API calls", 250000, "0.00045")  # 112.50
+    invoice.add_item("Minutes", 3, "0.3333")          # 0.9999 -> 1.00
+    assert [item['total_price'] for item in invoice.items] == [123.4, 112.5, 1.0]
+    assert invoice.calculate_totals_cents()['subtotal'] == 12340 + 11250 + 100
+    assert invoice.items[0]['unit_price'] == 0.1234
+    assert money.format_price(money.to_price_units("0.1234")) == "$0.1234"
+    assert money.format_price(money.to_price_units(12.5)) == "$12.50"
+
+    stored = InvoiceGenerator.from_dict(invoice.to_dict())
+    assert stored.calculate_totals_cents() == invoice.calculate_totals_cents()
+    assert money.batch_invoice_totals([invoice.to_dict()])['subtotal'] == [23690]
+
+    print("✅ Sub-cent unit price test PASSED!")
+
+
+def test_batch_totals_match_scalar():
+    """batch_totals agrees with compute_totals for every invoice"""
+    print(f"\nTesting batch totals (NumPy: {money._numpy() is not None})...")
+
+    subtotals = [0, 1, 99, 12345, 1500000, -2500, 7777777]
+    tax_rates = [0, 8.875, 20, 7.25, 8.875, 10, 0.5]
+    discounts = [0, 0, 12.5, 5, 2.5, 0, 33.3333]
+
+    batch = money.batch_totals(subtotals, tax_rates, discounts)
+    for i, args in enumerate(zip(subtotals, tax_rates, discounts)):
+        expected = money.compute_totals(*args)
+        assert {key: column[i] for key, column in batch.items()} == expected, args
+
+    invoices = [{'items': [{'quantity': 3, 'unit_price': 0.1}], 'tax_rate': 10, 'discount': 0}]
+    assert money.batch_invoice_totals(invoices)['total'] == [33]
+
+    print("✅ Batch totals test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Money Engine Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Exact Totals", test_no_float_drift),
+        ("Incremental Totals", test_incremental_totals),
+        ("Sub-cent Unit Price", test_sub_cent_unit_price),
+        ("Batch Totals", test_batch_totals_match_scalar)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
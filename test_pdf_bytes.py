@@ -0,0 +1,155 @@
+# Test file for in-memory PDF rendering
+# Renders to bytes, emails them and serves previews without touching invoices/
+
+import email
+import os
+import tempfile
+import time
+
+from email_sender import EmailSender
+from invoice_generator import InvoiceGenerator
+from smtp_stub import LocalSMTPStub
+
+
+def invoice_payload(invoice_number):
+    return {
+        'business_name': "Memory Works", 'business_email': "billing@memory.example",
+        'client_name': "Buffer Client", 'client_email': "client@memory.example",
+        'invoice_number': invoice_number, 'invoice_date': "2025-08-01", 'tax_rate': 5,
+        'items': [{'description': f"Service {n}", 'quantity': n + 1, 'unit_price': "12.50"} for n in range(5)]
+    }
+
+
+def stored_files(directory):
+    return [name for _, _, files in os.walk(directory) for name in files]
+
+
+def test_render_and_email_bytes():
+    """render_pdf_bytes leaves invoices/ alone and its bytes can be mailed or stored as-is"""
+    print("Testing in-memory render and email...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPStub(password="secret") as stub:
+        os.chdir(workdir)
+        try:
+            invoice = InvoiceGenerator.from_payload(invoice_payload("MEM-001"))
+            pdf_bytes = invoice.render_pdf_bytes(use_cache=False)
+            assert pdf_bytes.startswith(b"%PDF") and len(pdf_bytes) > 1000
+            assert not os.path.exists("invoices") and not os.path.exists("cache")
+            print(f"Rendered {len(pdf_bytes)} bytes in memory")
+
+            sender = EmailSender(stub.host, stub.port, use_tls=False, debug_level=0)
+            success, message = sender.send_invoice_email(
+                "billing@memory.example", "secret", "client@memory.example", None, "MEM-001",
+                "Buffer Client", "Memory Works", pdf_bytes=pdf_bytes)
+            assert success, message
+
+            results = sender.send_many("billing@memory.example", "secret", [{
+                'recipient_email': "other@memory.example", 'pdf_bytes': pdf_bytes, 'invoice_number': "MEM-001",
+                'client_name': "Buffer Client", 'business_name': "Memory Works"}])
+            assert results[0]['success'], results[0]['message']
+
+            for delivered in stub.messages:
+                parsed = email.message_from_bytes(delivered['data'])
+                attachment = [part for part in parsed.walk() if part.get_filename()][0]
+                assert attachment.get_filename() == "invoice_MEM-001.pdf"
+                assert attachment.get_payload(decode=True) == pdf_bytes
+            assert len(stub.messages) == 2 and not os.path.exists("invoices")
+
+            # Persisting is a separate step and stores exactly the rendered bytes
+            path = invoice.write_pdf(pdf_bytes)
+            with open(path, 'rb') as f:
+                assert f.read() == pdf_bytes
+
+            stored = InvoiceGenerator.from_dict(invoice.to_dict())
+            assert stored.to_dict() == invoice.to_dict()
+        finally:
+            os.chdir(cwd)
+
+    print("✅ In-memory render and email test PASSED!")
+
+
+def test_web_preview_and_download_fallback():
+    """Previews are not stored; downloads and emails render from the data when the PDF is gone"""
+    print("\nTesting web preview and download...")
+
+    import web_app
+    from email_outbox import EmailOutbox
+    app = web_app.app
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, LocalSMTPStub(password="secret") as stub:
+        os.chdir(workdir)
+        previous_outbox = web_app._outbox
+        try:
+            client = app.test_client()
+
+            preview = client.post('/api/preview-pdf', json=invoice_payload("MEM-PREVIEW"))
+            assert preview.status_code == 200 and preview.mimetype == 'application/pdf'
+            assert preview.data.startswith(b"%PDF")
+            assert "attachment" not in preview.headers.get('Content-Disposition', '')
+            assert not stored_files(workdir)
+
+            bad = client.post('/api/preview-pdf', json={**invoice_payload("MEM-BAD"), 'client_name': ""})
+            assert bad.status_code == 400
+
+            created = client.post('/api/create-invoice?async=0', json=invoice_payload("MEM-002"))
+            assert created.status_code == 200
+            os.remove(created.get_json()['pdf_filename'])
+
+            download = client.get('/api/download-pdf/MEM-002')
+            assert download.status_code == 200 and download.data.startswith(b"%PDF")
+            assert "invoice_MEM-002.pdf" in download.headers['Content-Disposition']
+            assert client.get('/api/download-pdf/MEM-MISSING').status_code == 404
+            print(f"Preview {len(preview.data)} bytes, re-rendered download {len(download.data)} bytes")
+
+            # Emailing re-renders the missing PDF and keeps it for the outbox
+            assert not os.path.exists(created.get_json()['pdf_filename'])
+            web_app._outbox = EmailOutbox(os.path.join(workdir, "outbox.sqlite3"),
+                                          EmailSender(stub.host, stub.port, use_tls=False), poll_interval=0.05)
+            queued = client.post('/api/send-email', json={
+                'invoice_number': "MEM-002", 'sender_email': "billing@memory.example",
+                'sender_password': "secret", 'recipient_email': "client@memory.example"})
+            assert queued.status_code == 202, queued.get_json()
+            assert os.path.exists(created.get_json()['pdf_filename'])
+            deadline = time.time() + 10
+            while not stub.messages and time.time() < deadline:
+                time.sleep(0.05)
+            parsed = email.message_from_bytes(stub.messages[0]['data'])
+            attachment = [part for part in parsed.walk() if part.get_filename()][0]
+            assert attachment.get_payload(decode=True).startswith(b"%PDF")
+        finally:
+            if web_app._outbox is not previous_outbox:
+                web_app._outbox.stop()
+            web_app._outbox = previous_outbox
+            os.chdir(cwd)
+
+    print("✅ Web preview and download test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running In-Memory PDF Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Render and Email Bytes", test_render_and_email_bytes),
+        ("Web Preview and Download", test_web_preview_and_download_fallback)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
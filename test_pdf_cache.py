@@ -0,0 +1,151 @@
+# Test file for the content-addressed PDF render cache
+# Run this to test cache hits, misses and eviction
+
+import os
+import tempfile
+import time
+
+from invoice_generator import InvoiceGenerator
+from pdf_cache import PDFRenderCache
+
+
+def make_invoice(cache, unit_price=100.0):
+    invoice = InvoiceGenerator()
+    invoice.pdf_cache = cache
+    invoice.set_business_info("Cache Test Business", "1 Cache Lane", "(555) 222-3333")
+    invoice.set_client_info("Cache Client", "2 Client Road")
+    invoice.set_invoice_details("CACHE-001", "2025-04-01", tax_rate=5.0)
+    invoice.add_item("Design work", 3, unit_price)
+    return invoice
+
+
+def test_cache_hits_and_misses():
+    """Unchanged invoices are served from the cache, changed ones re-render"""
+    print("Testing cache hits and misses...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            cache = PDFRenderCache(cache_dir=os.path.join(workdir, "cache"))
+
+            first = make_invoice(cache).generate_pdf()
+            with open(first, 'rb') as f:
+                first_bytes = f.read()
+            os.remove(first)
+
+            second = make_invoice(cache).generate_pdf()
+            with open(second, 'rb') as f:
+                assert f.read() == first_bytes
+
+            # The PDF is written once, to the cache, and linked from there
+            cached = [os.path.join(root, name) for root, _, files in os.walk(cache.cache_dir) for name in files]
+            assert len(cached) == 1 and os.path.samefile(cached[0], second)
+
+            make_invoice(cache, unit_price=120.0).generate_pdf()
+
+            stats = cache.stats()
+            print(f"Cache stats: {stats}")
+            assert stats['hits'] == 1
+            assert stats['misses'] == 2
+            assert abs(stats['hit_rate'] - 1 / 3) < 1e-9
+        finally:
+            os.chdir(cwd)
+
+    print("✅ Cache hit/miss test PASSED!")
+
+
+def test_cache_eviction():
+    """Eviction enforces the age bound first, then the size bound (LRU)"""
+    print("\nTesting cache eviction...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PDFRenderCache(cache_dir=cache_dir, max_bytes=2500, max_age_seconds=3600, auto_evict=False)
+
+        keys = [PDFRenderCache.make_key({'n': n}, "1") for n in range(4)]
+        for n, key in enumerate(keys):
+            path = cache.put(key, b"x" * 1000)
+            # Spread last-used times out: key 0 is expired, key 1 is the oldest live entry
+            age = 7200 if n == 0 else 100 - n
+            os.utime(path, (time.time() - age, time.time() - age))
+
+        removed = cache.evict()
+        print(f"Removed {removed} entries")
+        assert removed == 2
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[2]) is not None
+        assert cache.get(keys[3]) is not None
+
+    print("✅ Cache eviction test PASSED!")
+
+
+def test_eviction_follows_running_size():
+    """Stores only scan the cache once the running size passes max_bytes"""
+    print("\nTesting size-triggered eviction...")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PDFRenderCache(cache_dir=cache_dir, max_bytes=5000, max_age_seconds=3600)
+        scans = []
+        entries = cache._entries
+        cache._entries = lambda: scans.append(1) or entries()
+
+        keys = [PDFRenderCache.make_key({'n': n}, "1") for n in range(6)]
+        for n, key in enumerate(keys[:5]):
+            path = cache.put(key, b"x" * 1000)
+            os.utime(path, (time.time() - 100 + n, time.time() - 100 + n))
+        cache.put(keys[4], b"x" * 1000)
+        assert len(scans) == 1, "only the first store reads the size from disk"
+        assert cache.evictions == 0
+
+        cache.put(keys[5], b"x" * 1000)
+        assert len(scans) == 2 and cache.evictions == 2
+        assert cache.get(keys[0]) is None and cache.get(keys[1]) is None
+        assert cache.get(keys[5]) is not None
+        cache.put(PDFRenderCache.make_key({'n': 6}, "1"), b"x" * 1000)
+        assert len(scans) == 2
+
+    print("✅ Size-triggered eviction test PASSED!")
+
+
+def test_cache_key_is_canonical():
+    """Key order in the invoice data does not change the cache key"""
+    print("\nTesting canonical cache keys...")
+
+    a = PDFRenderCache.make_key({'a': 1, 'b': [1, 2]}, "1")
+    b = PDFRenderCache.make_key({'b': [1, 2], 'a': 1}, "1")
+    c = PDFRenderCache.make_key({'a': 1, 'b': [1, 2]}, "2")
+    assert a == b
+    assert a != c
+
+    print("✅ Canonical key test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running PDF Cache Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Cache Hits And Misses", test_cache_hits_and_misses),
+        ("Cache Eviction", test_cache_eviction),
+        ("Size-triggered Eviction", test_eviction_follows_running_size),
+        ("Canonical Keys", test_cache_key_is_canonical)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
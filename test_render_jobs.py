@@ -0,0 +1,254 @@
+# Test file for background invoice render jobs
+# Runs against the Flask test client, no server needed
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from invoice_generator import InvoiceGenerator
+from invoice_paths import InvoicePaths
+from render_jobs import FINISHED_STATUSES, RenderJobQueue, render_batch_job, render_invoice_job
+from web_app import app
+
+
+def invoice_payload(invoice_number, items):
+    return {
+        'business_name': "Jobs Test Business",
+        'business_address': "1 Queue Street",
+        'business_phone': "(555) 101-2020",
+        'client_name': "Jobs Client",
+        'client_address': "2 Worker Way",
+        'invoice_number': invoice_number,
+        'invoice_date': "2025-08-01",
+        'tax_rate': 5,
+        'items': [{'description': f"Line {n}", 'quantity': 1, 'unit_price': 2.5} for n in range(items)]
+    }
+
+
+def test_async_create_invoice():
+    """Large invoices get a 202 + job id; the job can be polled and streamed"""
+    print("Testing asynchronous invoice creation...")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            client = app.test_client()
+            app.config['ASYNC_ITEM_THRESHOLD'] = 50
+
+            small = client.post('/api/create-invoice', json=invoice_payload("JOB-SMALL", 3))
+            assert small.status_code == 200
+            assert small.get_json()['totals']['total'] == 7.88
+
+            response = client.post('/api/create-invoice', json=invoice_payload("JOB-LARGE", 120))
+            assert response.status_code == 202
+            body = response.get_json()
+            assert response.headers['Location'] == body['status_url']
+            print(f"Queued job {body['job_id']}")
+
+            # The event stream ends with a 'done' event once the job finishes
+            stream = client.get(body['events_url']).get_data(as_text=True)
+            events = [block for block in stream.split("\n\n") if block.startswith("event:")]
+            assert events[-1].startswith("event: done")
+            final = json.loads(events[-1].split("data: ", 1)[1])
+            assert final['status'] == 'succeeded', final
+
+            job = client.get(body['status_url']).get_json()
+            assert job['status'] == 'succeeded'
+            assert job['result']['totals']['total'] == 315.0
+            assert os.path.exists(job['result']['pdf_filename'])
+
+            bad = client.post('/api/create-invoice?async=1',
+                              json={**invoice_payload("JOB-BAD", 1), 'tax_rate': 'lots'})
+            assert bad.status_code == 400
+            assert client.get('/api/jobs/missing').status_code == 404
+        finally:
+            app.config['ASYNC_ITEM_THRESHOLD'] = 200
+            os.chdir(cwd)
+
+    print("✅ Asynchronous creation test PASSED!")
+
+
+def test_failed_job_reports_error():
+    """Exceptions in a job mark it failed with the error message"""
+    print("\nTesting failing job...")
+
+    queue = RenderJobQueue(max_workers=1)
+    try:
+        def explode(job):
+            job.progress('working', 50)
+            raise RuntimeError("disk full")
+
+        job = queue.submit(explode)
+        deadline = time.time() + 5
+        state = queue.get(job['id'])
+        while state['status'] not in ('succeeded', 'failed') and time.time() < deadline:
+            state = queue.wait_for_change(job['id'], state['version'], timeout=1)
+        assert state['status'] == 'failed'
+        assert state['error'] == "disk full"
+    finally:
+        queue.shutdown()
+
+    print("✅ Failing job test PASSED!")
+
+
+def wait_until_finished(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    state = queue.get(job_id)
+    while state['status'] not in FINISHED_STATUSES and time.time() < deadline:
+        state = queue.wait_for_change(job_id, state['version'], timeout=1)
+    return state
+
+
+def test_cancel_jobs():
+    """Queued jobs never start; a large render stops mid-table and saves nothing"""
+    print("\nTesting job cancellation...")
+
+    cwd = os.getcwd()
+    queue = RenderJobQueue(max_workers=1)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            release = threading.Event()
+            ran = []
+            blocker = queue.submit(lambda job: release.wait(5))
+            queued = queue.submit(lambda job: ran.append(job.id))
+            assert queue.cancel(queued['id'])
+            release.set()
+            assert wait_until_finished(queue, blocker['id'])['status'] == 'succeeded'
+            assert wait_until_finished(queue, queued['id'])['status'] == 'cancelled'
+            assert ran == [] and not queue.cancel(queued['id'])
+
+            invoice = InvoiceGenerator.from_payload(invoice_payload("JOB-CANCEL", 3000))
+            invoice.pdf_cache = None
+            job = queue.submit(render_invoice_job, invoice)
+            state = queue.get(job['id'])
+            while state['status'] not in FINISHED_STATUSES and state['progress'] <= 10:
+                state = queue.wait_for_change(job['id'], state['version'], timeout=5)
+            print(f"Cancelling at {state['stage']} {state['progress']}%")
+            assert queue.cancel(job['id'])
+
+            state = wait_until_finished(queue, job['id'])
+            assert state['status'] == 'cancelled', state
+            assert invoice.render_progress is None
+            assert InvoicePaths().find_json("JOB-CANCEL") is None
+        finally:
+            queue.shutdown()
+            os.chdir(cwd)
+
+    print("✅ Job cancellation test PASSED!")
+
+
+def test_render_in_worker_process():
+    """in_process jobs lay out the PDF in a worker process that reports rows and stops on cancel"""
+    print("\nTesting rendering in a worker process...")
+
+    cwd = os.getcwd()
+    queue = RenderJobQueue(max_workers=2, process_workers=1)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            worker_pid = queue.submit(lambda job: job.run_in_process(os.getpid))
+            assert wait_until_finished(queue, worker_pid['id'])['result'] not in (None, os.getpid())
+
+            invoice = InvoiceGenerator.from_payload(invoice_payload("JOB-PROCESS", 300))
+            job = queue.submit(render_invoice_job, invoice, in_process=True)
+            state = wait_until_finished(queue, job['id'])
+            assert state['status'] == 'succeeded', state
+            with open(state['result']['pdf_filename'], 'rb') as f:
+                assert f.read() == invoice.render_pdf_bytes()
+            assert InvoicePaths().find_json("JOB-PROCESS")
+
+            # Row progress comes back from the worker, and a cancel stops its layout
+            large = InvoiceGenerator.from_payload(invoice_payload("JOB-PROCESS-CANCEL", 40000))
+            large.pdf_cache = None
+            job = queue.submit(render_invoice_job, large, in_process=True)
+            state = queue.get(job['id'])
+            while state['status'] not in FINISHED_STATUSES and state['progress'] <= 10:
+                state = queue.wait_for_change(job['id'], state['version'], timeout=5)
+            assert 10 < state['progress'] < 80, state
+            print(f"Cancelling in-process render at {state['progress']}%")
+            assert queue.cancel(job['id'])
+            assert wait_until_finished(queue, job['id'])['status'] == 'cancelled'
+            started = time.time()
+            follow_up = queue.submit(lambda job: job.run_in_process(os.getpid))
+            assert wait_until_finished(queue, follow_up['id'])['status'] == 'succeeded'
+            assert time.time() - started < 1, "worker kept rendering after the cancel"
+            assert not InvoicePaths().find_pdf("JOB-PROCESS-CANCEL")
+
+            slow = queue.submit(lambda job: job.run_in_process(time.sleep, 3))
+            while queue.get(slow['id'])['status'] == 'queued':
+                time.sleep(0.01)
+            started = time.time()
+            assert queue.cancel(slow['id'])
+            assert wait_until_finished(queue, slow['id'])['status'] == 'cancelled'
+            assert time.time() - started < 2
+        finally:
+            queue.shutdown(wait=False)
+            os.chdir(cwd)
+
+    print("✅ Worker process rendering test PASSED!")
+
+
+def test_batch_job():
+    """render_batch_job reports progress per invoice and collects failures"""
+    print("\nTesting batch job...")
+
+    cwd = os.getcwd()
+    queue = RenderJobQueue(max_workers=1)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            payloads = [invoice_payload(f"JOB-BATCH-{n}", 2) for n in range(3)]
+            payloads.append({**invoice_payload("JOB-BATCH-BAD", 1), 'tax_rate': 'lots'})
+            job = queue.submit(render_batch_job, payloads, workers=2)
+            stages = set()
+            state = queue.get(job['id'])
+            while state['status'] not in FINISHED_STATUSES:
+                stages.add(state['stage'])
+                state = queue.wait_for_change(job['id'], state['version'], timeout=5)
+
+            assert state['status'] == 'succeeded', state
+            report = state['result']
+            assert report['succeeded'] == 3 and report['failed'] == 1
+            assert report['failures'][0]['invoice_number'] == "JOB-BATCH-BAD"
+            assert all(InvoicePaths().find_pdf(f"JOB-BATCH-{n}") for n in range(3))
+            print(f"Stages seen: {sorted(stages)}")
+        finally:
+            queue.shutdown()
+            os.chdir(cwd)
+
+    print("✅ Batch job test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Render Job Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Asynchronous Creation", test_async_create_invoice),
+        ("Failing Job", test_failed_job_reports_error),
+        ("Cancel Jobs", test_cancel_jobs),
+        ("Worker Process Rendering", test_render_in_worker_process),
+        ("Batch Job", test_batch_job)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
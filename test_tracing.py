@@ -0,0 +1,140 @@
+# Test file for the tracing spans and the batch --profile mode
+# Checks the span tree of generate_pdf / save_invoice_data and the profile report
+
+import contextlib
+import io
+import json
+import os
+import pstats
+import tempfile
+
+import tracing
+from invoice_generator import InvoiceGenerator
+
+
+def make_invoice(number="TRACE-001"):
+    invoice = InvoiceGenerator()
+    invoice.set_business_info("Trace Co", "1 Span St", "555-0100")
+    invoice.set_client_info("Client", "2 Hook Ave")
+    invoice.set_invoice_details(number)
+    invoice.add_item("Work", 2, 50)
+    return invoice
+
+
+class FailingHook(tracing.SpanHook):
+    def on_start(self, span):
+        raise RuntimeError("broken sink")
+
+
+def test_span_tree():
+    """Each phase of generate_pdf and save_invoice_data is a child span; hooks can fail safely"""
+    print("Testing span instrumentation...")
+
+    assert tracing.span('idle') is tracing._NULL_SPAN
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            with tracing.hooked(tracing.SpanRecorder()) as recorder, tracing.hooked(FailingHook()):
+                invoice = make_invoice()
+                invoice.generate_pdf()
+                invoice.generate_pdf()
+                invoice.save_invoice_data()
+        finally:
+            os.chdir(cwd)
+
+    paths = [span.path for span in recorder.spans]
+    print(paths)
+    roots = [span for span in recorder.spans if span.parent is None]
+    assert [span.name for span in roots] == ['generate_pdf', 'generate_pdf', 'save_invoice_data']
+    assert roots[0].attributes == {'invoice_number': "TRACE-001", 'items': 1, 'cache_hit': False}
+    assert roots[1].attributes['cache_hit'] is True
+
+    first_render = [span.name for span in recorder.spans if span.parent is roots[0]]
+    assert first_render == ['mkdir', 'cache_lookup', 'layout', 'serialize', 'cache_store', 'write']
+    cached_render = [span for span in recorder.spans if span.parent is roots[1]]
+    assert cached_render[-1].name == 'write' and cached_render[-1].attributes == {'source': 'cache'}
+    assert [span.name for span in recorder.spans if span.parent is roots[2]] == [
+        'to_dict', 'mkdir', 'serialize', 'write', 'index_upsert']
+
+    for span in recorder.spans:
+        assert span.duration >= 0
+        if span.parent is not None:
+            assert span.parent.start <= span.start and span.end <= span.parent.end
+
+    # Hooks are detached again and errors inside spans are recorded
+    assert tracing._hooks == ()
+    with tracing.hooked(tracing.SpanRecorder()) as recorder:
+        try:
+            with tracing.span('boom'):
+                raise ValueError("bad data")
+        except ValueError:
+            pass
+    assert recorder.spans[0].error == "ValueError: bad data"
+
+    print("✅ Span tree test PASSED!")
+
+
+def test_batch_profile():
+    """main.py batch --profile prints phase and pstats reports and saves the raw profile"""
+    print("\nTesting batch --profile...")
+
+    import main
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            payloads = [{'business_name': "Trace Co", 'client_name': f"Client {n}",
+                         'invoice_number': f"PROF-{n}",
+                         'items': [{'description': "Work", 'quantity': 1, 'unit_price': 10}]}
+                        for n in range(3)]
+            with open("payloads.json", 'w') as f:
+                json.dump(payloads, f)
+
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                status = main.run_cli(['batch', 'payloads.json', '--workers', '4', '--profile',
+                                       '--profile-output', 'batch.pstats', '--profile-limit', '5'])
+            text = output.getvalue()
+            print(text[-1500:])
+
+            assert status == 0
+            assert "ignoring --workers" in text
+            assert "generate_pdf/layout" in text and "save_invoice_data/write" in text
+            assert "cumulative" in text
+            assert pstats.Stats('batch.pstats').total_calls > 0
+            assert tracing._hooks == ()
+        finally:
+            os.chdir(cwd)
+
+    print("✅ Batch profile test PASSED!")
+
+
+def run_all_tests():
+    """Run all tests"""
+    print("🧪 Running Tracing Tests")
+    print("=" * 50)
+
+    tests = [
+        ("Span Tree", test_span_tree),
+        ("Batch Profile", test_batch_profile)
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        print(f"\n🔍 {test_name}")
+        print("-" * 30)
+        try:
+            test_func()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test_name} FAILED: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    run_all_tests()
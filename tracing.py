@@ -0,0 +1,225 @@
+import contextvars
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_hooks = ()
+_hooks_lock = threading.Lock()
+_current_span = contextvars.ContextVar('invoice_current_span', default=None)
+
+
+class Span:
+    """One timed phase; spans opened inside it become its children"""
+
+    __slots__ = ('name', 'attributes', 'parent', 'start', 'end', 'error', 'context')
+
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.start = None
+        self.end = None
+        self.error = None
+        # Free slot for hooks to keep their own per-span state (e.g. an OpenTelemetry span)
+        self.context = {}
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    @property
+    def path(self):
+        """Dotted names from the root span, e.g. ``generate_pdf/layout``"""
+        names = []
+        span = self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        return '/'.join(reversed(names))
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __repr__(self):
+        return f"Span({self.path!r}, duration={self.duration!r})"
+
+
+class SpanHook:
+    """Base class for span sinks; override either method
+
+    Hooks are called synchronously in the thread that runs the span, so they
+    should be cheap. An exception raised by a hook is logged and ignored.
+    """
+
+    def on_start(self, span):
+        pass
+
+    def on_end(self, span):
+        pass
+
+
+class _ActiveSpan:
+    __slots__ = ('span', '_token')
+
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        span = self.span
+        self._token = _current_span.set(span)
+        _notify('on_start', span)
+        span.start = time.perf_counter()
+        return span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end = time.perf_counter()
+        if exc is not None:
+            span.error = f"{type(exc).__name__}: {exc}"
+        _current_span.reset(self._token)
+        _notify('on_end', span)
+
+
+class _NullSpan:
+    """Returned when no hooks are registered, so untraced runs only pay for a tuple check"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _notify(method, span):
+    for hook in _hooks:
+        try:
+            getattr(hook, method)(span)
+        except Exception:
+            logger.exception("Span hook %r failed in %s", hook, method)
+
+
+def span(name, **attributes):
+    """Context manager timing one phase, e.g. ``with span('layout', items=n):``"""
+    if not _hooks:
+        return _NULL_SPAN
+    return _ActiveSpan(Span(name, attributes, _current_span.get()))
+
+
+def add_hook(hook):
+    """Attach a hook to every span in the process; returns the hook"""
+    global _hooks
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook,)
+    return hook
+
+
+def remove_hook(hook):
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(existing for existing in _hooks if existing is not hook)
+
+
+class hooked:
+    """``with hooked(SpanRecorder()) as recorder:`` attaches a hook for one block"""
+
+    def __init__(self, hook):
+        self.hook = hook
+
+    def __enter__(self):
+        return add_hook(self.hook)
+
+    def __exit__(self, exc_type, exc, tb):
+        remove_hook(self.hook)
+
+
+class SpanRecorder(SpanHook):
+    """Keeps every finished span (for tests and ad-hoc inspection)"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def on_end(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def names(self):
+        return [span.name for span in self.spans]
+
+
+class SpanStats(SpanHook):
+    """Aggregates count / total / max seconds per span path"""
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def on_end(self, span):
+        duration = span.duration
+        path = span.path
+        with self._lock:
+            count, total, longest = self.stats.get(path, (0, 0.0, 0.0))
+            self.stats[path] = (count + 1, total + duration, max(longest, duration))
+
+    def report(self):
+        """Table of phases sorted by total time"""
+        lines = [f"{'phase':<40} {'count':>7} {'total ms':>10} {'avg ms':>9} {'max ms':>9}"]
+        for path, (count, total, longest) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{path:<40} {count:>7} {total * 1000:>10.1f} "
+                         f"{total / count * 1000:>9.2f} {longest * 1000:>9.2f}")
+        return '\n'.join(lines)
+
+
+class LoggingHook(SpanHook):
+    """Logs each finished span, optionally only those slower than ``min_seconds``"""
+
+    def __init__(self, log=None, level=logging.DEBUG, min_seconds=0.0):
+        self.log = log or logger
+        self.level = level
+        self.min_seconds = min_seconds
+
+    def on_end(self, span):
+        if span.duration >= self.min_seconds:
+            attributes = ' '.join(f"{key}={value}" for key, value in span.attributes.items())
+            status = f" error={span.error}" if span.error else ''
+            self.log.log(self.level, "span %s %.2f ms %s%s", span.path, span.duration * 1000, attributes, status)
+
+
+class OpenTelemetryHook(SpanHook):
+    """Mirrors spans into an OpenTelemetry tracer
+
+    Pass ``opentelemetry.trace.get_tracer(...)``; this module does not import
+    OpenTelemetry itself. Parent/child links follow the span nesting here.
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def on_start(self, span):
+        from opentelemetry import trace
+
+        parent = span.parent.context.get('otel') if span.parent is not None else None
+        context = trace.set_span_in_context(parent) if parent is not None else None
+        span.context['otel'] = self.tracer.start_span(span.name, context=context,
+                                                      attributes=dict(span.attributes))
+
+    def on_end(self, span):
+        otel_span = span.context.pop('otel', None)
+        if otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            otel_span.set_attribute(key, value)
+        if span.error:
+            otel_span.set_attribute('error', span.error)
+        otel_span.end()
@@ -1,20 +1,85 @@
-from flask import Flask, request, jsonify, render_template, send_file, flash, redirect, url_for
+from flask import Flask, request, jsonify, render_template, send_file, flash, redirect, url_for, Response, stream_with_context, g
 from flask_cors import CORS
+import io
 import os
 import json
+import time
 from datetime import datetime
 from invoice_generator import InvoiceGenerator
 from invoice_exporter import InvoiceExporter
+from invoice_analytics import REPORTS
+from invoice_paths import InvoicePaths
 from email_sender import EmailSender
+from email_outbox import EmailOutbox
+from render_jobs import RenderJobQueue, render_invoice_job, FINISHED_STATUSES
+import metrics
 
 app = Flask(__name__)
 app.secret_key = 'invoice_generator_secret_key_2025'
 CORS(app)
 
+DEFAULT_PAGE_SIZE = 50
+
+# Invoices with at least this many items are rendered by a background job
+app.config['ASYNC_ITEM_THRESHOLD'] = int(os.environ.get('INVOICE_ASYNC_THRESHOLD', 200))
+app.config['RENDER_WORKERS'] = int(os.environ.get('INVOICE_RENDER_WORKERS', 2))
+
 # Ensure required directories exist
 os.makedirs('invoices', exist_ok=True)
 os.makedirs('exports', exist_ok=True)
 
+_outbox = None
+
+def get_outbox():
+    """Email outbox, created and started on first use"""
+    global _outbox
+    if _outbox is None:
+        _outbox = EmailOutbox()
+    return _outbox.start()
+
+_render_jobs = None
+
+def get_render_jobs():
+    """Background render job queue, created on first use"""
+    global _render_jobs
+    if _render_jobs is None:
+        _render_jobs = RenderJobQueue(max_workers=app.config['RENDER_WORKERS'],
+                                      process_workers=app.config['RENDER_WORKERS'])
+    return _render_jobs
+
+REQUEST_SECONDS = metrics.histogram('invoice_http_request_seconds', "HTTP request latency by route",
+                                    ['method', 'route', 'status'])
+REQUESTS = metrics.counter('invoice_http_requests_total', "HTTP requests by route", ['method', 'route', 'status'])
+
+if metrics.ENABLED:
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        """Record latency per route rule (not per URL, to keep label cardinality bounded)
+
+        Streamed responses are timed until the response object is returned.
+        """
+        started = g.pop('request_started', None)
+        if started is not None:
+            labels = {
+                'method': request.method,
+                'route': request.url_rule.rule if request.url_rule else 'unmatched',
+                'status': response.status_code
+            }
+            REQUEST_SECONDS.labels(**labels).observe(time.perf_counter() - started)
+            REQUESTS.labels(**labels).inc()
+        return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of the request and stage metrics"""
+    if not metrics.ENABLED:
+        return jsonify({'success': False, 'error': 'Metrics are disabled (INVOICE_METRICS=0)'}), 404
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/')
 def index():
     """Main page"""
@@ -30,74 +95,79 @@ def view_invoices_page():
     """View invoices page"""
     exporter = InvoiceExporter()
     invoices = []
+    total_count = 0
     
     try:
-        invoice_numbers = exporter.get_all_invoices()
-        for invoice_number in invoice_numbers:
-            invoice_data = exporter.load_invoice_from_json(invoice_number)
-            if invoice_data:
-                invoices.append({
-                    'number': invoice_number,
-                    'date': invoice_data['invoice_date'],
-                    'client': invoice_data['client_info']['name'],
-                    'total': invoice_data['totals']['total'],
-                    'items_count': len(invoice_data['items'])
-                })
+        # Only the first page is rendered; the page script fetches the rest lazily
+        page = exporter.query_invoice_summaries(limit=DEFAULT_PAGE_SIZE)
+        invoices = page['invoices']
+        total_count = page['total']
     except Exception as e:
         flash(f'Error loading invoices: {str(e)}', 'error')
     
-    return render_template('view_invoices.html', invoices=invoices)
+    return render_template('view_invoices.html', invoices=invoices, total_count=total_count)
+
+def invoice_from_request(data):
+    """Validate a create/preview payload; returns ``(invoice, None)`` or ``(None, error response)``"""
+    # Validate required fields
+    required_fields = ['business_name', 'client_name', 'invoice_number', 'items']
+    for field in required_fields:
+        if not data.get(field):
+            return None, (jsonify({'success': False, 'error': f'{field} is required'}), 400)
+    
+    if not data['items']:
+        return None, (jsonify({'success': False, 'error': 'At least one item is required'}), 400)
+    
+    # Create invoice (parses and validates every amount)
+    try:
+        return InvoiceGenerator.from_payload(data), None
+    except (ValueError, KeyError, TypeError) as e:
+        return None, (jsonify({'success': False, 'error': f'Invalid invoice data: {str(e)}'}), 400)
+
+def send_pdf_bytes(pdf_bytes, invoice_number, as_attachment):
+    """Response serving an in-memory PDF"""
+    return send_file(io.BytesIO(pdf_bytes), mimetype='application/pdf', as_attachment=as_attachment,
+                     download_name=f'invoice_{invoice_number}.pdf')
 
 @app.route('/api/create-invoice', methods=['POST'])
 def api_create_invoice():
-    """API endpoint to create invoice"""
+    """API endpoint to create invoice
+    
+    Small invoices are rendered inside the request. Invoices with at least
+    ASYNC_ITEM_THRESHOLD items (or any invoice with ``?async=1``) are queued
+    as a render job instead: the response is ``202`` with a job id, and the
+    job can be followed via /api/jobs/<id> or its event stream. ``?async=0``
+    forces the synchronous path.
+    """
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['business_name', 'client_name', 'invoice_number', 'items']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'success': False, 'error': f'{field} is required'}), 400
-        
-        if not data['items']:
-            return jsonify({'success': False, 'error': 'At least one item is required'}), 400
-        
-        # Create invoice
-        invoice = InvoiceGenerator()
-        
-        # Set business info
-        invoice.set_business_info(
-            name=data['business_name'],
-            address=data.get('business_address', ''),
-            phone=data.get('business_phone', ''),
-            email=data.get('business_email', '')
-        )
-        
-        # Set client info
-        invoice.set_client_info(
-            name=data['client_name'],
-            address=data.get('client_address', ''),
-            phone=data.get('client_phone', ''),
-            email=data.get('client_email', '')
-        )
-        
-        # Set invoice details
-        invoice.set_invoice_details(
-            invoice_number=data['invoice_number'],
-            invoice_date=data.get('invoice_date', datetime.now().strftime('%Y-%m-%d')),
-            tax_rate=float(data.get('tax_rate', 0)),
-            discount=float(data.get('discount', 0)),
-            payment_terms=data.get('payment_terms', '')
-        )
-        
-        # Add items
-        for item in data['items']:
-            invoice.add_item(
-                description=item['description'],
-                quantity=float(item['quantity']),
-                unit_price=float(item['unit_price'])
-            )
+        invoice, error = invoice_from_request(request.get_json())
+        if error:
+            return error
+        
+        mode = request.args.get('async', '').lower()
+        if mode in ('1', 'true'):
+            run_async = True
+        elif mode in ('0', 'false'):
+            run_async = False
+        else:
+            run_async = len(invoice.items) >= app.config['ASYNC_ITEM_THRESHOLD']
+        
+        if run_async:
+            # Laid out in a worker process so a large invoice doesn't hold
+            # the GIL while other requests are being served
+            job = get_render_jobs().submit(render_invoice_job, invoice, in_process=True,
+                                           description=f"Invoice {invoice.invoice_number}")
+            status_url = url_for('api_job_status', job_id=job['id'])
+            response = jsonify({
+                'success': True,
+                'message': 'Invoice queued for rendering',
+                'job_id': job['id'],
+                'status': job['status'],
+                'status_url': status_url,
+                'events_url': url_for('api_job_events', job_id=job['id'])
+            })
+            response.headers['Location'] = status_url
+            return response, 202
         
         # Generate PDF and JSON
         pdf_filename = invoice.generate_pdf()
@@ -117,6 +187,68 @@ def api_create_invoice():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/preview-pdf', methods=['POST'])
+def api_preview_pdf():
+    """API endpoint to preview an invoice PDF without saving it
+    
+    Takes the same payload as /api/create-invoice and returns the PDF inline.
+    The PDF is rendered in memory: nothing is written to invoices/ and
+    drafts are kept out of the render cache.
+    """
+    try:
+        invoice, error = invoice_from_request(request.get_json())
+        if error:
+            return error
+        return send_pdf_bytes(invoice.render_pdf_bytes(use_cache=False), invoice.invoice_number, False)
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """API endpoint to poll a render job"""
+    job = get_render_jobs().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **job})
+
+@app.route('/api/jobs/<job_id>/events')
+def api_job_events(job_id):
+    """Server-Sent Events stream of a render job's progress
+    
+    Sends a ``progress`` event on every change and a final ``done`` event
+    when the job succeeds or fails; idle periods are kept alive with comments.
+    """
+    jobs = get_render_jobs()
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    def events():
+        current = job
+        while True:
+            finished = current['status'] in FINISHED_STATUSES
+            event = 'done' if finished else 'progress'
+            yield f"event: {event}\ndata: {json.dumps(current)}\n\n"
+            if finished:
+                return
+            
+            version = current['version']
+            while True:
+                current = jobs.wait_for_change(job_id, version)
+                if current is None:
+                    yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                    return
+                if current['version'] != version:
+                    break
+                yield ": keep-alive\n\n"
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/get-invoice/<invoice_number>')
 def api_get_invoice(invoice_number):
     """API endpoint to get invoice data"""
@@ -150,25 +282,37 @@ def api_export_csv(invoice_number):
 
 @app.route('/api/download-pdf/<invoice_number>')
 def api_download_pdf(invoice_number):
-    """API endpoint to download PDF"""
+    """API endpoint to download PDF
+    
+    Serves the stored PDF; if there is none (deleted, or only the data was
+    kept) it is rendered in memory from the invoice data instead.
+    """
     try:
-        pdf_path = f'invoices/invoice_{invoice_number}.pdf'
-        if os.path.exists(pdf_path):
+        pdf_path = InvoicePaths().find_pdf(invoice_number)
+        if pdf_path:
             return send_file(pdf_path, as_attachment=True)
-        else:
+        
+        invoice_data = InvoiceExporter().load_invoice_from_json(invoice_number)
+        if not invoice_data:
             return jsonify({'success': False, 'error': 'PDF not found'}), 404
+        pdf_bytes = InvoiceGenerator.from_dict(invoice_data).render_pdf_bytes()
+        return send_pdf_bytes(pdf_bytes, invoice_number, True)
             
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/send-email', methods=['POST'])
 def api_send_email():
-    """API endpoint to send invoice via email"""
+    """API endpoint to queue an invoice email
+    
+    Returns 202 with an email id immediately; delivery happens in the
+    background and can be followed via /api/email-status/<id>. Send an
+    ``Idempotency-Key`` header (or ``idempotency_key`` field) to make
+    resubmissions safe.
+    """
     try:
         data = request.get_json()
         
-        print(f"📧 Email API called with data: {data}")
-        
         required_fields = ['invoice_number', 'sender_email', 'sender_password', 'recipient_email']
         for field in required_fields:
             if not data.get(field):
@@ -177,7 +321,6 @@ def api_send_email():
                 return jsonify({'success': False, 'error': error_msg}), 400
         
         # Load invoice data
-        print(f"📄 Loading invoice data for: {data['invoice_number']}")
         exporter = InvoiceExporter()
         invoice_data = exporter.load_invoice_from_json(data['invoice_number'])
         
@@ -186,71 +329,190 @@ def api_send_email():
             print(f"❌ {error_msg}")
             return jsonify({'success': False, 'error': error_msg}), 404
         
-        # Prepare email data
-        email_sender = EmailSender()
-        pdf_path = f"invoices/invoice_{data['invoice_number']}.pdf"
-        
-        print(f"📁 PDF path: {pdf_path}")
-        print(f"📁 PDF exists: {os.path.exists(pdf_path)}")
+        pdf_path = InvoicePaths().find_pdf(data['invoice_number'])
+        if not pdf_path:
+            # No stored PDF: render it from the data and keep it, since queued
+            # mail must survive a restart and the outbox stores a file path
+            invoice = InvoiceGenerator.from_dict(invoice_data)
+            pdf_path = invoice.write_pdf(invoice.render_pdf_bytes())
+        
+        message = {
+            'sender_email': data['sender_email'],
+            'recipient_email': data['recipient_email'],
+            'invoice_pdf_path': pdf_path,
+            'invoice_number': data['invoice_number'],
+            'client_name': invoice_data['client_info']['name'],
+            'business_name': invoice_data['business_info']['name'],
+            'email_subject': data.get('email_subject', None),
+            'email_message': data.get('email_message', None)
+        }
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        
+        status, created = get_outbox().enqueue(message, data['sender_password'], idempotency_key)
+        print(f"📧 Email {status['id']} {'queued' if created else 'already submitted'} "
+              f"for invoice {data['invoice_number']} to {data['recipient_email']}")
         
-        # Get optional fields
-        email_subject = data.get('email_subject', None)
-        email_message = data.get('email_message', None)
-        
-        print(f"📧 Sending email...")
-        print(f"   From: {data['sender_email']}")
-        print(f"   To: {data['recipient_email']}")
-        print(f"   Subject: {email_subject}")
-        
-        # Send email
-        success, message = email_sender.send_invoice_email(
-            sender_email=data['sender_email'],
-            sender_password=data['sender_password'],
-            recipient_email=data['recipient_email'],
-            invoice_pdf_path=pdf_path,
-            invoice_number=data['invoice_number'],
-            client_name=invoice_data['client_info']['name'],
-            business_name=invoice_data['business_info']['name'],
-            email_subject=email_subject,
-            email_message=email_message
-        )
-        
-        if success:
-            print(f"✅ Email sent successfully!")
-        else:
-            print(f"❌ Email failed: {message}")
-        
-        return jsonify({'success': success, 'message': message})
+        return jsonify({
+            'success': True,
+            'message': 'Email queued for delivery' if created else 'Email already submitted',
+            'email_id': status['id'],
+            'status': status['status'],
+            'duplicate': not created,
+            'status_url': url_for('api_email_status', email_id=status['id'])
+        }), 202
         
     except Exception as e:
         error_msg = str(e)
         print(f"❌ Email API error: {error_msg}")
         return jsonify({'success': False, 'error': error_msg}), 500
 
+@app.route('/api/email-status/<email_id>')
+def api_email_status(email_id):
+    """API endpoint to check the delivery status of a queued email"""
+    try:
+        status = get_outbox().get_status(email_id)
+        if status is None:
+            return jsonify({'success': False, 'error': 'Email not found'}), 404
+        return jsonify({'success': True, **status})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def _optional_float(args, name):
+    value = args.get(name, '').strip()
+    return float(value) if value else None
+
+def _invoice_filters(args):
+    """Filter and sort arguments for InvoiceIndex.query_summaries from query parameters"""
+    return {
+        'search': args.get('q', '').strip() or None,
+        'client': args.get('client', '').strip() or None,
+        'date_from': args.get('date_from') or None,
+        'date_to': args.get('date_to') or None,
+        'min_total': _optional_float(args, 'min_total'),
+        'max_total': _optional_float(args, 'max_total'),
+        'sort': args.get('sort', 'date'),
+        'order': args.get('order', 'desc')
+    }
+
 @app.route('/api/get-all-invoices')
 def api_get_all_invoices():
-    """API endpoint to get all invoices summary"""
+    """API endpoint to get a page of invoice summaries
+    
+    Query parameters: limit, cursor (or offset), q, client, date_from, date_to,
+    min_total, max_total, sort (number|date|client|total), order (asc|desc).
+    """
+    try:
+        args = request.args
+        cursor = args.get('cursor') or None
+        filters = _invoice_filters(args)
+        filters.update({
+            'limit': int(args.get('limit', DEFAULT_PAGE_SIZE)),
+            'offset': int(args.get('offset', 0)),
+            'cursor': cursor,
+            # Counting is only needed for the first page
+            'include_total': cursor is None
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid query parameter: {str(e)}'}), 400
+    
     try:
         exporter = InvoiceExporter()
-        invoices = []
+        page = exporter.query_invoice_summaries(**filters)
         
-        invoice_numbers = exporter.get_all_invoices()
-        for invoice_number in invoice_numbers:
-            invoice_data = exporter.load_invoice_from_json(invoice_number)
-            if invoice_data:
-                invoices.append({
-                    'number': invoice_number,
-                    'date': invoice_data['invoice_date'],
-                    'client': invoice_data['client_info']['name'],
-                    'total': invoice_data['totals']['total'],
-                    'items_count': len(invoice_data['items'])
-                })
+        return jsonify({'success': True, **page})
         
-        return jsonify({'success': True, 'invoices': invoices})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def _report_params(report, args):
+    """Keyword arguments for one report from query parameters"""
+    if report == 'by_client':
+        return {'limit': int(args.get('limit', DEFAULT_PAGE_SIZE)), 'sort': args.get('sort', 'total')}
+    if report == 'by_month':
+        return {'month_from': args.get('from') or None, 'month_to': args.get('to') or None}
+    if report == 'outstanding':
+        return {'as_of': args.get('as_of') or None}
+    return {}
+
+@app.route('/api/reports/<report>')
+def api_reports(report):
+    """API endpoint for revenue reports
+    
+    Reports: summary, by-client (limit, sort=total|outstanding|invoices|client),
+    by-month (from, to as YYYY-MM), by-tax-rate and outstanding (as_of as
+    YYYY-MM-DD). They are read from aggregates that are updated whenever an
+    invoice is saved, so they answer without touching invoice files.
+    """
+    report = report.replace('-', '_')
+    if report not in REPORTS:
+        return jsonify({'success': False, 'error': f'Unknown report: {report}'}), 404
+    
+    try:
+        params = _report_params(report, request.args)
+        exporter = InvoiceExporter()
+        return jsonify({'success': True, 'report': report, 'data': exporter.get_report(report, **params)})
         
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/export-all')
+def api_export_all():
+    """API endpoint to stream a bulk export of every matching invoice
+    
+    ``format=csv`` (default) streams the summary CSV; ``format=zip`` streams a
+    ZIP with the summary plus each invoice's PDF and CSV (``include_pdf=0`` or
+    ``include_csv=0`` to leave either out). Accepts the same filters as
+    /api/get-all-invoices. The response is produced while it is sent, so
+    nothing is staged in exports/ and memory use does not grow with the export.
+    """
+    args = request.args
+    export_format = args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'zip'):
+        return jsonify({'success': False, 'error': f'Invalid export format: {export_format}'}), 400
+    
+    try:
+        filters = _invoice_filters(args)
+        exporter = InvoiceExporter()
+        # Validate the filters now; errors inside the stream can no longer become a 400
+        exporter.query_invoice_summaries(limit=1, include_total=False, **filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid query parameter: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    def invoice_source():
+        return exporter.iter_selected_invoices(**filters)
+    
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if export_format == 'zip':
+        body = exporter.stream_zip(
+            invoice_source,
+            include_pdf=args.get('include_pdf', '1') != '0',
+            include_csv=args.get('include_csv', '1') != '0'
+        )
+        mimetype = 'application/zip'
+        filename = f"invoices_{stamp}.zip"
+    else:
+        body = exporter.stream_summary_csv(invoice_source())
+        mimetype = 'text/csv'
+        filename = f"all_invoices_summary_{stamp}.csv"
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            # Ask reverse proxies not to buffer the stream
+            'X-Accel-Buffering': 'no',
+            'Cache-Control': 'no-store'
+        }
+    )
+
 @app.route('/api/test-email', methods=['POST'])
 def api_test_email():
     """API endpoint to test email connection"""